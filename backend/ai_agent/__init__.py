@@ -1 +1,8 @@
-from .openai_assistants import create_assistant, get_or_create_thread, comment_reply_assistant
\ No newline at end of file
+from .openai_assistants import create_assistant, get_or_create_thread, comment_reply_assistant, thread_store, run_context, assistant_tools, rag
+from .runner import run_assistant, stream_assistant, record_exchange, RunResult
+from .thread_store import ThreadStore, MemoryThreadStore, SQLiteThreadStore, create_thread_store
+from .assistant_cache import get_or_update_assistant, forget_assistant, definition_hash
+from .answer_cache import SemanticAnswerCache, normalize_question, is_cacheable
+from .comment_filter import CommentFilter, FilterDecision, IGNORE, CANNED, NEEDS_LLM
+from .fast_path import FastPathAnswerer
+from .thread_compaction import ThreadCompactor
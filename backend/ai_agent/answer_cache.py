@@ -0,0 +1,237 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+
+from vector_database import HashingEmbedder
+
+logger = logging.getLogger(__name__)
+
+GREETING_PATTERN = re.compile(r"^(hi|hello|hey|hiya|good (morning|afternoon|evening))\b[\s,!.]*")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s£:]")
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normalize a question for cache lookups: lowercase, drop greetings and
+    punctuation, and collapse whitespace.
+    """
+    text = " ".join(text.lower().split())
+    text = GREETING_PATTERN.sub("", text)
+    text = PUNCTUATION_PATTERN.sub(" ", text)
+    return " ".join(text.split())
+
+
+QUESTION_WORDS = {"what", "when", "where", "how", "do", "does", "are", "is", "can", "which", "who", "whats"}
+CONTEXT_WORDS = {"it", "that", "this", "those", "them", "they", "same", "yes", "no", "ok", "okay"}
+# Questions about the customer's own booking, order or party are never shared
+PERSONAL_WORDS = {"i", "me", "my", "mine", "myself", "we", "us", "our", "ours", "your", "yours"}
+
+
+def is_personal(question: str) -> bool:
+    """
+    Whether a question is about the customer asking it, so its answer must not
+    be served to, or looked up for, anyone else.
+    """
+    return bool(PERSONAL_WORDS.intersection(normalize_question(question).split()))
+
+
+def is_cacheable(question: str, answer: str) -> bool:
+    """
+    Decide whether a question/answer pair is safe to reuse for other customers:
+    the question must stand on its own (no references to earlier messages or to
+    the customer themselves) and the answer must not be a clarifying question
+    back to the customer.
+
+    Callers must also skip answers that used a tool result or earlier messages
+    of the conversation; neither is visible from the text alone.
+    """
+    words = normalize_question(question).split()
+    if not 2 <= len(words) <= 30:
+        return False
+    if not (question.strip().endswith("?") or words[0] in QUESTION_WORDS):
+        return False
+    if CONTEXT_WORDS.intersection(words) or is_personal(question):
+        return False
+    return not answer.strip().endswith("?")
+
+
+class CachedAnswer(NamedTuple):
+    answer: str
+    slot: int
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Caches assistant answers to standalone questions and serves them for new
+    questions that normalize to the same text or whose embedding is close
+    enough to a cached one.
+
+    Embeddings live in a preallocated float32 matrix, so a lookup is one
+    matrix-vector product over at most `max_size` rows. The whole cache is
+    dropped when the knowledge version reported by `version_fn` changes.
+    """
+
+    def __init__(self, embedder=None, threshold: float = 0.9, max_size: int = 1000, ttl: float = 6 * 3600,
+                 version_fn: Optional[Callable[[], Any]] = None, version_check_interval: float = 60):
+        """
+        Initialize the cache.
+
+        Args:
+            embedder: Object with an `embed(texts) -> np.ndarray` method. Defaults to HashingEmbedder.
+            threshold: Minimum cosine similarity for a semantic hit.
+            max_size: Maximum number of cached answers (least recently used are evicted).
+            ttl: Seconds an answer stays valid.
+            version_fn: Returns a fingerprint of the knowledge the answers were based on.
+            version_check_interval: Minimum seconds between two `version_fn` calls.
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._slot_keys = [None] * max_size
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._version = None
+        self._version_checked_at = 0.0
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+        self._avg_miss_latency = 0.0
+
+    def _check_version(self):
+        """
+        Clear the cache if the knowledge fingerprint changed. `version_fn` may be a
+        network call, so it runs without the lock held.
+        """
+        if self.version_fn is None:
+            return
+        with self._lock:
+            if time.monotonic() - self._version_checked_at < self.version_check_interval:
+                return
+            # Claim the check so concurrent lookups don't all call version_fn
+            self._version_checked_at = time.monotonic()
+        try:
+            version = self.version_fn()
+        except Exception as e:
+            logger.warning(f"Could not check knowledge version, keeping cached answers: {e}")
+            return
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._clear()
+                self.invalidations += 1
+            self._version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._valid[:] = False
+        self._free_slots = list(range(self.max_size - 1, -1, -1))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._valid[entry.slot] = False
+        self._free_slots.append(entry.slot)
+
+    def lookup(self, question: str) -> Optional[str]:
+        """
+        Get a cached answer for the question.
+
+        Returns:
+            str: The cached answer, or None on a miss. Personal questions always miss.
+        """
+        if is_personal(question):
+            return None
+        key = normalize_question(question)
+        self._check_version()
+        with self._lock:
+            needs_vector = key not in self._entries and bool(self._entries)
+        # Embedding may be a network call, so it runs without the lock held, like in `store`
+        vector = self.embedder.embed([key])[0] if needs_vector else None
+
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+            if entry is None and vector is not None and self._entries:
+                similarities = np.where(self._valid, self._vectors @ vector, -1.0)
+                best_slot = int(np.argmax(similarities))
+                if similarities[best_slot] >= self.threshold:
+                    key = self._slot_keys[best_slot]
+                    entry = self._entries[key]
+                    if entry.expires_at > now:
+                        self.semantic_hits += 1
+
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.latency_saved += self._avg_miss_latency
+            return entry.answer
+
+    def store(self, question: str, answer: str, latency: Optional[float] = None):
+        """
+        Cache the answer to a question.
+
+        Args:
+            question: The question as asked.
+            answer: The assistant's answer.
+            latency: Seconds it took to produce the answer, used to estimate latency saved by hits.
+        """
+        key = normalize_question(question)
+        if not key or is_personal(question):
+            return
+        vector = self.embedder.embed([key])[0]
+        with self._lock:
+            if latency is not None:
+                # Exponential moving average of the cost of a miss
+                self._avg_miss_latency = latency if not self._avg_miss_latency else 0.9 * self._avg_miss_latency + 0.1 * latency
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            if key in self._entries:
+                self._remove(key)
+            while not self._free_slots:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._slot_keys[slot] = key
+            self._entries[key] = CachedAnswer(answer, slot, time.time() + self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit rate, eviction and latency-saved metrics.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "latency_saved_s": round(self.latency_saved, 2),
+        }
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from openai import NotFoundError
+
+logger = logging.getLogger(__name__)
+
+ASSISTANT_CACHE_PATH = os.getenv("ASSISTANT_CACHE_PATH", "assistant_cache.json")
+# A cached assistant is checked to still exist when its entry is older than this
+ASSISTANT_VERIFY_INTERVAL = float(os.getenv("ASSISTANT_VERIFY_INTERVAL", 24 * 3600))
+
+_lock = threading.Lock()
+
+
+def definition_hash(definition: Dict[str, Any]) -> str:
+    """
+    Hash an assistant definition (model, instructions, tools, tool resources, ...).
+
+    Args:
+        definition (dict): Keyword arguments passed to `assistants.create`.
+
+    Returns:
+        str: A stable SHA-256 hex digest of the definition.
+    """
+    payload = json.dumps(definition, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_cache(path: str) -> Dict[str, Dict[str, str]]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable assistant cache {path}: {e}")
+        return {}
+
+
+def _save_cache(path: str, cache: Dict[str, Dict[str, str]]):
+    # Write to a temporary file first so a crash never leaves a truncated cache
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def _find_assistant(client, key: str):
+    """
+    Look for an assistant previously created for this key (e.g. by another host
+    whose local cache we don't have).
+    """
+    for assistant in client.beta.assistants.list(limit=100):
+        if (assistant.metadata or {}).get("definition_key") == key:
+            return assistant
+    return None
+
+
+def _exists(client, assistant_id: str) -> bool:
+    try:
+        client.beta.assistants.retrieve(assistant_id)
+        return True
+    except NotFoundError:
+        return False
+
+
+def _store_entry(cache_path: str, key: str, entry: Dict[str, Any]):
+    with _lock:
+        # Re-read so entries written concurrently for other keys are kept
+        cache = _load_cache(cache_path)
+        cache[key] = entry
+        _save_cache(cache_path, cache)
+
+
+def get_or_update_assistant(client, key: str, definition: Dict[str, Any],
+                            cache_path: str = ASSISTANT_CACHE_PATH,
+                            verify_interval: float = ASSISTANT_VERIFY_INTERVAL) -> str:
+    """
+    Return the id of an assistant matching the definition, creating or updating
+    it in place only when the definition changed.
+
+    When the cached hash matches, no API call is made, except for a check that
+    the assistant still exists once the entry is older than `verify_interval`.
+
+    Args:
+        client: The OpenAI client.
+        key (str): Stable name for this assistant role, e.g. "restaurant_concierge".
+        definition (dict): Keyword arguments for `assistants.create`.
+        cache_path (str): Path of the local assistant cache file.
+        verify_interval (float): Seconds a cached assistant is trusted without checking it exists.
+
+    Returns:
+        str: The assistant ID.
+    """
+    digest = definition_hash(definition)
+    metadata = {"definition_key": key, "definition_hash": digest}
+
+    with _lock:
+        entry = _load_cache(cache_path).get(key)
+    if entry and entry.get("hash") == digest:
+        if time.time() - entry.get("verified_at", 0) < verify_interval:
+            return entry["id"]
+        if _exists(client, entry["id"]):
+            _store_entry(cache_path, key, {**entry, "verified_at": time.time()})
+            return entry["id"]
+        logger.warning(f"Cached assistant {entry['id']} for {key} no longer exists")
+        entry = None
+
+    assistant = None
+    assistant_id = entry.get("id") if entry else None
+    if assistant_id is None:
+        existing = _find_assistant(client, key)
+        if existing is not None:
+            assistant_id = existing.id
+            if (existing.metadata or {}).get("definition_hash") == digest:
+                assistant = existing
+
+    if assistant is None and assistant_id is not None:
+        try:
+            assistant = client.beta.assistants.update(assistant_id, metadata=metadata, **definition)
+            logger.info(f"Updated assistant {key} ({assistant.id}) to definition {digest[:12]}")
+        except NotFoundError:
+            logger.warning(f"Cached assistant {assistant_id} for {key} no longer exists")
+
+    if assistant is None:
+        assistant = client.beta.assistants.create(metadata=metadata, **definition)
+        logger.info(f"Created assistant {key} ({assistant.id})")
+
+    _store_entry(cache_path, key, {"id": assistant.id, "hash": digest, "verified_at": time.time()})
+    return assistant.id
+
+
+def forget_assistant(key: str, cache_path: str = ASSISTANT_CACHE_PATH):
+    """
+    Drop an assistant from the cache, e.g. because a run reported it doesn't exist,
+    so the next `get_or_update_assistant` finds or creates it again.
+    """
+    with _lock:
+        cache = _load_cache(cache_path)
+        if cache.pop(key, None) is not None:
+            _save_cache(cache_path, cache)
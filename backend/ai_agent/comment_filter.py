@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+COMMENT_TEMPLATES_PATH = os.getenv("COMMENT_TEMPLATES_PATH")
+
+IGNORE = "ignore"
+CANNED = "canned"
+NEEDS_LLM = "needs_llm"
+
+DEFAULT_TEMPLATES = [
+    "Thank you so much! We can't wait to see you soon 🥩",
+    "Thanks for the love! ❤️",
+    "That means a lot to the whole team, thank you! 🙌",
+    "So glad you enjoyed it! See you again soon 😊",
+    "Thank you! Our chefs will be thrilled to hear that 🔥",
+]
+
+EMOJI_PATTERN = re.compile(
+    "[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U00002B00-\U00002BFF\U0000FE0F\U0000200D\U000020E3]"
+)
+POSITIVE_EMOJI = set("❤♥😍🥰😋🤤🔥👏🙌👌👍💯😊🤩💕💖💗🧡💛💚💙💜🤍🖤🥩🍖🍷✨⭐🌟")
+MENTION_PATTERN = re.compile(r"@[\w.]+")
+URL_PATTERN = re.compile(r"https?://|www\.|\b\w+\.(com|net|io|ly|me|shop|store)\b", re.IGNORECASE)
+SPAM_PATTERN = re.compile(
+    r"\b(follow (me|back|us)|check (out )?my (page|profile|bio)|dm (me|us) (for|to)|promo(te|tion)?|"
+    r"collab|crypto|bitcoin|forex|invest(ment)?s?|giveaway|free followers|earn \$?\d+|link in (my )?bio|"
+    r"sugar daddy|onlyfans)\b",
+    re.IGNORECASE,
+)
+PRAISE_PATTERN = re.compile(
+    r"\b(yum+y?|delicious|amazing|awesome|incredible|beautiful|gorgeous|love (it|this|that|you|flat ?iron)|"
+    r"looks? (so )?(good|great|amazing|delicious|tasty|incredible)|best (steak|place|restaurant)|"
+    r"so good|wow+|perfect|stunning|mouth ?watering|drooling|fire|banging)\b",
+    re.IGNORECASE,
+)
+QUESTION_PATTERN = re.compile(
+    r"\?|\b(what|when|where|how|why|which|who|do you|does it|are you|is (it|there)|can (i|we|you)|"
+    r"could (i|we|you)|book(ing)?|reserv\w*|table|price|cost|open(ing)?|hours?|menu|vegan|vegetarian|"
+    r"gluten|allerg\w*|halal|deliver\w*|takeaway|address|located)\b",
+    re.IGNORECASE,
+)
+COMPLAINT_PATTERN = re.compile(
+    r"\b(terrible|awful|worst|disgusting|rude|cold|overpriced|refund|complain\w*|disappoint\w*|sick|"
+    r"food poisoning|never again|raw|undercooked|waited)\b",
+    re.IGNORECASE,
+)
+NEGATION_PATTERN = re.compile(
+    r"^(no|not|never|nothing|nor|hardly|barely|nah|isnt|wasnt|arent|werent|dont|doesnt|didnt|aint|cant|wont)$|n[’']t$",
+    re.IGNORECASE,
+)
+# Words either side of a praise word that a negation may sit in ("not amazing", "amazing... not")
+NEGATION_WINDOW = 3
+# Runs of symbols or digits ("$$$$$$", "111111"); runs of letters and "!?." are enthusiasm ("sooooo good!!!!!!")
+REPEATED_SYMBOL_PATTERN = re.compile(r"((?![\s!?.])[\d\W_])\1{5,}")
+REPEATED_CHAR_PATTERN = re.compile(r"(.)\1{5,}")
+
+
+class FilterDecision(NamedTuple):
+    action: str
+    reason: str
+    reply: Optional[str] = None
+
+
+def _strip_emoji(text: str) -> str:
+    return EMOJI_PATTERN.sub("", text)
+
+
+def _is_repetitive(text: str) -> bool:
+    """
+    Whether a comment is keyboard noise: a run of repeated symbols, or almost nothing but repeated characters.
+    """
+    text = _strip_emoji(text)
+    if REPEATED_SYMBOL_PATTERN.search(text):
+        return True
+    compact = "".join(text.split())
+    repeated = sum(len(match.group(0)) for match in REPEATED_CHAR_PATTERN.finditer(compact))
+    return bool(compact) and repeated >= 0.8 * len(compact)
+
+
+def _negated_praise(text: str) -> bool:
+    """
+    Whether any praise word in the text has a negation within NEGATION_WINDOW words of it.
+    """
+    for match in PRAISE_PATTERN.finditer(text):
+        before = re.findall(r"[\w’']+", text[:match.start()])[-NEGATION_WINDOW:]
+        after = re.findall(r"[\w’']+", text[match.end():])[:NEGATION_WINDOW]
+        if any(NEGATION_PATTERN.search(word) for word in before + after):
+            return True
+    return False
+
+
+class CommentFilter:
+    """
+    Classifies Instagram comments locally before any OpenAI call.
+
+    Every comment is tagged `ignore` (spam, tag-a-friend, emoji noise), `canned`
+    (short praise, answered from a rotating template pool) or `needs_llm`
+    (questions, complaints and anything the rules are unsure about). Rules run
+    in that order of caution: anything that looks like a question or complaint
+    always reaches the assistant.
+    """
+
+    def __init__(self, templates: Optional[List[str]] = None, max_praise_words: int = 8):
+        """
+        Initialize the filter.
+
+        Args:
+            templates: Canned reply pool. Defaults to COMMENT_TEMPLATES_PATH (a JSON list) or DEFAULT_TEMPLATES.
+            max_praise_words: Longest comment still treated as simple praise.
+        """
+        self.templates = templates or self._load_templates()
+        self.max_praise_words = max_praise_words
+        self._lock = threading.Lock()
+        self._next_template = 0
+        self._decisions = Counter()
+        self._reasons = Counter()
+
+    @staticmethod
+    def _load_templates() -> List[str]:
+        if COMMENT_TEMPLATES_PATH:
+            try:
+                with open(COMMENT_TEMPLATES_PATH, "r", encoding="utf-8") as f:
+                    templates = [t for t in json.load(f) if isinstance(t, str) and t.strip()]
+                if templates:
+                    return templates
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load comment templates from {COMMENT_TEMPLATES_PATH}: {e}")
+        return list(DEFAULT_TEMPLATES)
+
+    def _classify(self, text: str) -> FilterDecision:
+        text = (text or "").strip()
+        if not text:
+            return FilterDecision(IGNORE, "empty")
+
+        without_mentions = MENTION_PATTERN.sub("", text)
+        words = _strip_emoji(without_mentions).split()
+        emojis = EMOJI_PATTERN.findall(text)
+
+        if URL_PATTERN.search(text) or SPAM_PATTERN.search(text) or _is_repetitive(text):
+            return FilterDecision(IGNORE, "spam")
+        if COMPLAINT_PATTERN.search(text):
+            return FilterDecision(NEEDS_LLM, "complaint")
+        if QUESTION_PATTERN.search(without_mentions):
+            return FilterDecision(NEEDS_LLM, "question")
+        if MENTION_PATTERN.search(text) and len(words) <= self.max_praise_words:
+            # Tagging a friend is a conversation between customers
+            return FilterDecision(IGNORE, "mention")
+        if not words:
+            if any(emoji in POSITIVE_EMOJI for emoji in emojis):
+                return FilterDecision(CANNED, "positive_emoji")
+            return FilterDecision(IGNORE, "emoji")
+        if len(words) <= self.max_praise_words and PRAISE_PATTERN.search(without_mentions):
+            if _negated_praise(without_mentions):
+                # "not amazing at all" is a complaint, not a compliment
+                return FilterDecision(NEEDS_LLM, "negated_praise")
+            return FilterDecision(CANNED, "praise")
+        return FilterDecision(NEEDS_LLM, "default")
+
+    def next_template(self) -> str:
+        """
+        Get the next canned reply, rotating through the pool.
+        """
+        with self._lock:
+            template = self.templates[self._next_template % len(self.templates)]
+            self._next_template += 1
+        return template
+
+    def classify(self, text: str) -> FilterDecision:
+        """
+        Decide how to handle a comment.
+
+        Args:
+            text: The comment text.
+
+        Returns:
+            FilterDecision: The action, the rule that decided it, and the reply for canned comments.
+        """
+        decision = self._classify(text)
+        if decision.action == CANNED:
+            decision = decision._replace(reply=self.next_template())
+        with self._lock:
+            self._decisions[decision.action] += 1
+            self._reasons[decision.reason] += 1
+        return decision
+
+    def ignores(self, text: str) -> bool:
+        """
+        Whether a comment would be ignored, without counting it as a decision.
+        """
+        return self._classify(text).action == IGNORE
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get decision counts and the share of comments that skipped the assistant.
+        """
+        total = sum(self._decisions.values())
+        return {
+            "comments": total,
+            "decisions": {action: self._decisions[action] for action in (IGNORE, CANNED, NEEDS_LLM)},
+            "reasons": dict(self._reasons),
+            "llm_calls_avoided": total - self._decisions[NEEDS_LLM],
+            "llm_avoided_rate": round((total - self._decisions[NEEDS_LLM]) / total, 4) if total else 0.0,
+        }
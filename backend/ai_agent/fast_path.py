@@ -0,0 +1,201 @@
+import datetime
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+from vector_database import content_tokens, directory_fingerprint
+from vector_database.knowledge_tables import KnowledgeTables, WEEKDAYS
+
+logger = logging.getLogger(__name__)
+
+# Only questions about the opening hours themselves; "what time" alone may be about anything
+HOURS_PATTERN = re.compile(r"\b(open(s|ing)?|close[sd]?|closing|hours)\b", re.IGNORECASE)
+ADDRESS_PATTERN = re.compile(r"\b(address|where are you|where is (flat ?iron|the restaurant)|located|location|postcode)\b",
+                             re.IGNORECASE)
+PRICE_PATTERN = re.compile(r"\b(how much|price|prices|cost|costs|priced)\b", re.IGNORECASE)
+# Anything that needs more than a table lookup goes to the assistant
+DEFER_PATTERN = re.compile(
+    r"\b(book|booking|reserv\w*|table for|christmas|easter|bank holiday|holiday|new year|birthday|party|"
+    r"group|private|kitchen|last orders?|delivery|deliver|takeaway|directions|parking|get there|tube|station|"
+    r"not|n't|and|also|cancel|change|allerg\w*|vegan|vegetarian|gluten|\d{1,2}(st|nd|rd|th)|\d{1,2}/\d{1,2}|"
+    r"now|right now|currently|still|other|another|branch\w*|site|sites|restaurants|locations)\b",
+    re.IGNORECASE,
+)
+# A named place ("in Manchester", "near Covent Garden") may mean another restaurant than the one in the tables
+PLACE_PATTERN = re.compile(
+    r"\b(in|at|near|by|around)\s+(?!(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\b)[A-Z][a-z]+"
+)
+# Words of the question itself; every other token has to name the item (see KnowledgeTables.find_items)
+PRICE_QUERY_WORDS = {
+    "much", "price", "prices", "cost", "costs", "priced", "£", "menu", "pay", "get",
+    "what's", "whats", "tell", "know", "like", "want", "just", "one", "hi", "hello", "hey", "thanks",
+}
+RELATIVE_DAYS = {"today": 0, "tonight": 0, "tomorrow": 1}
+
+
+def _format_time(value: str) -> str:
+    return datetime.datetime.strptime(value, "%H:%M").strftime("%I:%M %p").lstrip("0")
+
+
+class FastPathAnswerer:
+    """
+    Answers simple lookups (opening hours, address, menu prices) straight from
+    the structured knowledge tables, without an assistant run.
+
+    A question is only answered when exactly one intent matches and nothing in
+    it suggests a follow-up the tables can't handle; everything else returns
+    None and falls through to the assistant. Tables are reloaded when the
+    knowledge files change.
+    """
+
+    def __init__(self, loader: Callable[[], KnowledgeTables] = KnowledgeTables.from_directory,
+                 version_fn: Callable[[], Any] = directory_fingerprint, reload_interval: float = 5.0):
+        """
+        Initialize the answerer. Tables are loaded on first use.
+
+        Args:
+            loader: Builds the knowledge tables.
+            version_fn: Returns a fingerprint of the source files.
+            reload_interval: Minimum seconds between two `version_fn` checks.
+        """
+        self.loader = loader
+        self.version_fn = version_fn
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        self._tables: Optional[KnowledgeTables] = None
+        self._version = None
+        self._checked_at = 0.0
+
+        self._answers = Counter()
+        self.fallthroughs = 0
+        self.reloads = 0
+        self._answer_time = 0.0
+
+    @property
+    def tables(self) -> KnowledgeTables:
+        """
+        The current tables, reloaded if the source files changed.
+        """
+        now = time.monotonic()
+        if self._tables is not None and now - self._checked_at < self.reload_interval:
+            return self._tables
+        with self._lock:
+            if self._tables is None or now - self._checked_at >= self.reload_interval:
+                self._checked_at = now
+                version = self.version_fn()
+                if self._tables is None or version != self._version:
+                    self._tables = self.loader()
+                    if self._version is not None:
+                        self.reloads += 1
+                        logger.info("Reloaded structured knowledge tables")
+                    self._version = version
+        return self._tables
+
+    def _answer_hours(self, text: str, tables: KnowledgeTables) -> Optional[str]:
+        if not tables.hours:
+            return None
+        lowered = text.lower()
+        days = [day for day in WEEKDAYS if day in lowered]
+        relative = [word for word in RELATIVE_DAYS if word in lowered]
+        if len(days) + len(relative) > 1:
+            return None
+        if relative:
+            date = datetime.datetime.now() + datetime.timedelta(days=RELATIVE_DAYS[relative[0]])
+            days = [WEEKDAYS[date.weekday()]]
+            label = relative[0]
+        else:
+            label = f"on {days[0].capitalize()}" if days else None
+
+        if days:
+            hours = tables.hours.get(days[0])
+            if hours is None:
+                return None
+            if re.search(r"\bclos(e|es|ing)\b|until|how late", lowered):
+                return f"We close at {_format_time(hours.closes)} {label}."
+            if re.search(r"\bopen(s|ing)?\b", lowered) and "what time" in lowered:
+                return f"We open at {_format_time(hours.opens)} {label}."
+            return f"We're open {hours.display} {label}."
+
+        lines, previous = [], None
+        for day in WEEKDAYS[6:] + WEEKDAYS[:6]:
+            hours = tables.hours.get(day)
+            if hours is None:
+                continue
+            if previous and previous[1] == hours.display:
+                previous[0].append(day)
+            else:
+                previous = ([day], hours.display)
+                lines.append(previous)
+        summary = "; ".join(
+            f"{days[0].capitalize()}{'–' + days[-1].capitalize() if len(days) > 1 else ''}: {display}"
+            for days, display in lines
+        )
+        return f"Our opening hours are {summary}."
+
+    def _answer_address(self, tables: KnowledgeTables) -> Optional[str]:
+        if not tables.address:
+            return None
+        return f"You'll find us at {', '.join(tables.address)}."
+
+    def _answer_price(self, text: str, tables: KnowledgeTables) -> Optional[str]:
+        tokens = [token for token in content_tokens(text) if token not in PRICE_QUERY_WORDS]
+        if not tokens or len(tokens) > 6:
+            return None
+        items = tables.find_items(tokens)
+        if not items or len(items) > 3:
+            return None
+        return " ".join(
+            f"{item.match_name.title() if item.match_name.isupper() else item.match_name} is "
+            f"{' / '.join(price.format() for price in item.prices)}."
+            for item in items if item.prices
+        ) or None
+
+    def answer(self, text: str) -> Optional[str]:
+        """
+        Answer a message from the tables if it is a simple, unambiguous lookup.
+
+        Args:
+            text: The customer's message.
+
+        Returns:
+            str: The answer, or None if the message should go to the assistant.
+        """
+        started = time.perf_counter()
+        intents = [
+            name for name, pattern in (("hours", HOURS_PATTERN), ("address", ADDRESS_PATTERN), ("price", PRICE_PATTERN))
+            if pattern.search(text)
+        ]
+        answer = None
+        if len(intents) == 1 and len(text) <= 200 and not DEFER_PATTERN.search(text) and not PLACE_PATTERN.search(text):
+            tables = self.tables
+            intent = intents[0]
+            if intent == "hours":
+                answer = self._answer_hours(text, tables)
+            elif intent == "address":
+                answer = self._answer_address(tables)
+            else:
+                answer = self._answer_price(text, tables)
+
+        with self._lock:
+            if answer is None:
+                self.fallthroughs += 1
+            else:
+                self._answers[intents[0]] += 1
+                self._answer_time += time.perf_counter() - started
+        return answer
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get answer counts per intent, fallthroughs and reloads.
+        """
+        answered = sum(self._answers.values())
+        return {
+            "answered": dict(self._answers),
+            "fallthroughs": self.fallthroughs,
+            "reloads": self.reloads,
+            "avg_answer_us": round(1e6 * self._answer_time / answered, 1) if answered else 0.0,
+        }
@@ -1,56 +1,108 @@
 import os
 from openai import OpenAI
 from vector_database import RAGSystem
-from tools import get_calendar_functions
+from tools import get_calendar_functions, CHECK_AVAILABILITY_TOOL
 import datetime
+from startup import Lazy
+from helper import stage
+from .thread_store import create_thread_store
+from .assistant_cache import get_or_update_assistant
 
-user_threads = {}
+thread_store = create_thread_store()
 
-rag = RAGSystem(vector_store_name="flatiron_restaurant")
-vector_store_id = rag.get_vector_store_id()
-print("VECTOR_STORE_ID:", vector_store_id)
+VECTOR_STORE_NAME = os.getenv("VECTOR_STORE_NAME", "flatiron_restaurant")
+
+# Network-backed values are resolved on first use (or by the startup warm-up)
+rag = RAGSystem(vector_store_name=VECTOR_STORE_NAME)
+vector_store_id = Lazy(rag.get_vector_store_id, "vector_store")
+calendar_functions = Lazy(get_calendar_functions, "calendar_functions")
 
 # Retrieve the API key from the environment
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
 # Initialize the OpenAI client
 OPENAI_CLIENT = OpenAI(api_key=OPENAI_API_KEY)
-get_calendar_functions = get_calendar_functions()
 
-def create_assistant():
+def run_context(passages=None):
     """
-    Create an OpenAI assistant with specified instructions and model.
-    
+    Build per-run instructions with context that changes between runs, such as
+    the current date and time. Keeping it out of the assistant definition means
+    the definition (and its cache hash) stays stable.
+
+    Args:
+        passages (list, optional): SearchResults from the local knowledge index.
+            When given, they are injected so the run can skip the file_search tool.
+
     Returns:
-        assistant: The created assistant object.
+        str: Additional instructions to pass to `runs.create`.
     """
-    restaurant_name = "Flatiron Soho"
-    user_name = "Jamie"
-    
-    # Get current date and time
     current_datetime = datetime.datetime.now()
     current_date = current_datetime.strftime("%A, %B %d, %Y")
     current_time = current_datetime.strftime("%I:%M %p")
-    
+    context = f"""
+    ## Current Date and Time:
+    - Today is: {current_date}
+    - Current time is: {current_time}"""
+
+    if passages is not None:
+        knowledge = "\n\n".join(f"[{passage.source}]\n{passage.text}" for passage in passages)
+        context += f"""
+
+    ## Restaurant Information:
+    Answer information queries from these excerpts of the restaurant's files. If the
+    answer isn't in them, clearly state this.
+
+{knowledge}"""
+    return context
+
+def assistant_tools(include_file_search=True):
+    """
+    Get the tools of the restaurant concierge assistant.
+
+    Args:
+        include_file_search (bool): Whether to include the hosted file_search tool.
+            Runs that inject local knowledge override the tools without it.
+
+    Returns:
+        list: Tool definitions.
+    """
+    functions = calendar_functions.get()
     tools = [
-        {"type": "file_search"},
-        get_calendar_functions["reserve_event"],
-        get_calendar_functions["update_event"],
-        get_calendar_functions["delete_event"]
+        CHECK_AVAILABILITY_TOOL,
+        functions["reserve_event"],
+        functions["update_event"],
+        functions["delete_event"]
     ]
+    if include_file_search:
+        tools.insert(0, {"type": "file_search"})
+    return tools
+
+def create_assistant(restaurant_name="Flatiron Soho", user_name="Jamie", vector_store_ids=None,
+                     cache_key="restaurant_concierge"):
+    """
+    Get the restaurant concierge assistant, reusing the cached one when its
+    definition is unchanged.
+
+    Args:
+        restaurant_name (str): The restaurant the assistant works for.
+        user_name (str, optional): How to address the user.
+        vector_store_ids (list, optional): Vector stores for file_search. Defaults to the configured store.
+        cache_key (str): Identifies the assistant in the assistant cache; one per restaurant.
+    
+    Returns:
+        str: The assistant ID.
+    """
+    tools = assistant_tools()
+    address_user = f"address the user as {user_name}" if user_name else ""
     
-    assistant = OPENAI_CLIENT.beta.assistants.create(
+    definition = dict(
     name="Restaurant Concierge",
     instructions=f"""
     # Restaurant Concierge for {restaurant_name}
     
-    address the user as {user_name}
+    {address_user}
     
-    You are a restaurant concierge that answers queries and books reservations for Flatiron.
-    
-    ## Current Date and Time:
-    - Today is: {current_date}
-    - Current time is: {current_time}
+    You are a restaurant concierge that answers queries and books reservations for {restaurant_name}.
     
     ## Core Functions:
     1. Answer questions about {restaurant_name} using file search tool
@@ -70,8 +122,8 @@ def create_assistant():
     - Special requests
 
     2. Check availability:
-    - Use Google Calendar to verify availability
-    - If unavailable, offer alternatives
+    - Use the check_availability tool to verify availability
+    - If unavailable, offer the alternatives it returns
 
     3. Book reservation:
     - Create calendar event with all details
@@ -90,40 +142,28 @@ def create_assistant():
     tools = tools,
     tool_resources = {
         "file_search":{
-            "vector_store_ids": [vector_store_id]
+            "vector_store_ids": vector_store_ids or [vector_store_id.get()]
         }
     },
     response_format = {"type":"text"},
     )
     
-    return assistant
+    return get_or_update_assistant(OPENAI_CLIENT, cache_key, definition)
 
-def get_or_create_thread(sender_id):
+def comment_reply_assistant(vector_store_ids=None, cache_key="instagram_comment_concierge"):
     """
-    Retrieve an existing thread for the sender or create a new one if it doesn't exist.
+    Get the OpenAI assistant specifically for replying to Instagram comments.
+    The assistant uses a cheerful tone with emojis and keeps responses short.
 
     Args:
-        sender_id (str): Unique identifier for the sender.
-
-    Returns:
-        str: The thread ID associated with the sender.
-    """
-    if sender_id not in user_threads:
-        thread = OPENAI_CLIENT.beta.threads.create()
-        user_threads[sender_id] = thread.id
-    return user_threads[sender_id]
-
-
-def comment_reply_assistant():
-    """
-    Create an OpenAI assistant specifically for replying to Instagram comments.
-    The assistant uses a cheerful tone with emojis and keeps responses short.
+        vector_store_ids (list, optional): Vector stores for file_search. Defaults to the configured store.
+        cache_key (str): Identifies the assistant in the assistant cache; one per restaurant.
     
     Returns:
-        assistant: The created assistant object.
+        str: The assistant ID.
     """
     
-    assistant = OPENAI_CLIENT.beta.assistants.create(
+    definition = dict(
         name="Instagram Comment Concierge",
         instructions="""
         You are a friendly social media manager responding to Instagram comments for a restaurant.
@@ -144,13 +184,13 @@ def comment_reply_assistant():
         temperature=0.8,
         tool_resources={
             "file_search": {
-                "vector_store_ids": [vector_store_id]
+                "vector_store_ids": vector_store_ids or [vector_store_id.get()]
             }
         },
         response_format={"type": "text"},
     )
     
-    return assistant
+    return get_or_update_assistant(OPENAI_CLIENT, cache_key, definition)
 
 def get_or_create_thread(sender_id):
     """
@@ -162,7 +202,10 @@ def get_or_create_thread(sender_id):
     Returns:
         str: The thread ID associated with the sender.
     """
-    if sender_id not in user_threads:
-        thread = OPENAI_CLIENT.beta.threads.create()
-        user_threads[sender_id] = thread.id
-    return user_threads[sender_id]
\ No newline at end of file
+    with stage("get_or_create_thread"):
+        thread_id = thread_store.get(sender_id)
+        if thread_id is None:
+            thread = OPENAI_CLIENT.beta.threads.create()
+            # Another worker process may have created one first; keep whichever was stored
+            thread_id = thread_store.setdefault(sender_id, thread.id)
+    return thread_id
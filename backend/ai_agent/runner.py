@@ -0,0 +1,252 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from helper import observe_stage, stage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLY = "Sorry, I didn't get that."
+# Upper bound on requires_action steps in one run, so a tool loop can't run forever
+MAX_TOOL_ROUNDS = 8
+
+
+TERMINAL_RUN_EVENTS = {
+    "thread.run.completed",
+    "thread.run.incomplete",
+    "thread.run.failed",
+    "thread.run.cancelled",
+    "thread.run.expired",
+}
+
+
+class RunResult(NamedTuple):
+    reply: Optional[str]
+    run: Any
+    tool_calls: int
+
+
+def run_assistant(client, thread_id: str, assistant_id: str, content: str,
+                  tool_handler: Optional[Any] = None,
+                  additional_instructions: Optional[str] = None,
+                  tools: Optional[List[Dict]] = None, add_message: bool = True) -> RunResult:
+    """
+    Add a user message to a thread, run the assistant and return its reply.
+
+    Args:
+        client: The OpenAI client.
+        thread_id (str): The thread to run the assistant on.
+        assistant_id (str): The assistant to run.
+        content (str): The user message content.
+        tool_handler (optional): A ToolDispatcher, or a callable called with each tool
+            call of a `requires_action` run returning a tool output dict or None to skip it.
+        additional_instructions (str, optional): Per-run context appended to the
+            assistant's instructions, e.g. the current date.
+        tools (list, optional): Override of the assistant's tools for this run.
+        add_message (bool): Whether to add `content` to the thread first; False when
+            retrying a run whose message is already there.
+
+    Returns:
+        RunResult: The assistant reply (None if the run did not complete), the
+        final run object and the number of tool calls the run requested.
+    """
+    if add_message:
+        with stage("message_create"):
+            client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=content
+            )
+
+    run_options = {"tools": tools} if tools is not None else {}
+    started = time.monotonic()
+    run = client.beta.threads.runs.create_and_poll(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        additional_instructions=additional_instructions,
+        **run_options
+    )
+
+    tool_calls, rounds = 0, 0
+    # A run may ask for tools several times, e.g. check availability and then book
+    while run.status == "requires_action" and rounds < MAX_TOOL_ROUNDS:
+        rounds += 1
+        tool_outputs = collect_tool_outputs(run, tool_handler)
+        tool_calls += len(run.required_action.submit_tool_outputs.tool_calls)
+
+        if not tool_outputs:
+            logger.warning("No tool outputs to submit")
+            break
+        try:
+            # Covers the rest of the run after the outputs are in
+            with stage("tool_submit"):
+                run = client.beta.threads.runs.submit_tool_outputs_and_poll(
+                    thread_id=thread_id,
+                    run_id=run.id,
+                    tool_outputs=tool_outputs
+                )
+        except Exception as e:
+            logger.error(f"Failed to submit tool outputs: {e}")
+            break
+    if run.status == "requires_action":
+        # Gave up on the tool loop; a run left waiting for outputs blocks the thread
+        cancel_run(client, thread_id, run)
+
+    # Queued to terminal, tool rounds included
+    observe_stage("run", time.monotonic() - started, "ok" if run.status == "completed" else run.status)
+    logger.info(f"Run {run.id} {run.status}")
+    if run.status != "completed":
+        return RunResult(None, run, tool_calls)
+
+    # Only the messages this run produced, newest first, instead of the whole thread
+    with stage("messages_list"):
+        messages = client.beta.threads.messages.list(thread_id=thread_id, run_id=run.id, order="desc", limit=5)
+    reply = next(
+        (
+            msg.content[0].text.value for msg in messages.data
+            if msg.role == "assistant" and msg.content and msg.content[0].type == "text"
+        ),
+        DEFAULT_REPLY
+    )
+    return RunResult(reply, run, tool_calls)
+
+
+def cancel_run(client, thread_id: str, run):
+    """
+    Cancel a run that is waiting for tool outputs we won't submit, so the thread
+    accepts new messages and runs again.
+    """
+    logger.warning(f"Cancelling run {run.id} stuck in {run.status}")
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+    except Exception as e:
+        logger.error(f"Failed to cancel run {run.id}: {e}")
+
+
+def collect_tool_outputs(run, tool_handler) -> List[Dict]:
+    """
+    Execute the tool calls of a `requires_action` run.
+
+    Args:
+        run: The run requiring action.
+        tool_handler: A ToolDispatcher, which runs all calls concurrently, or a
+            callable executing one call at a time.
+
+    Returns:
+        list: The tool outputs to submit (calls the handler skipped are left out).
+    """
+    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+    with stage("tool_execution"):
+        if hasattr(tool_handler, "dispatch"):
+            return tool_handler.dispatch(tool_calls)
+        tool_outputs = []
+        for tool in tool_calls:
+            output = tool_handler(tool) if tool_handler else None
+            if output is not None:
+                tool_outputs.append(output)
+        return tool_outputs
+
+
+def stream_assistant(client, thread_id: str, assistant_id: str, content: str,
+                     tool_handler: Optional[Any] = None,
+                     additional_instructions: Optional[str] = None,
+                     tools: Optional[List[Dict]] = None,
+                     on_message: Optional[Callable[[str], None]] = None, add_message: bool = True) -> RunResult:
+    """
+    Like `run_assistant`, but consumes the run as a stream of events instead of
+    polling. Each assistant message is handed to `on_message` the moment it
+    completes, and tool calls are executed and submitted inside the stream.
+
+    Args:
+        client: The OpenAI client.
+        thread_id (str): The thread to run the assistant on.
+        assistant_id (str): The assistant to run.
+        content (str): The user message content.
+        tool_handler (optional): A ToolDispatcher, or a callable called with each tool
+            call of a `requires_action` event returning a tool output dict or None to skip it.
+        additional_instructions (str, optional): Per-run context appended to the
+            assistant's instructions.
+        tools (list, optional): Override of the assistant's tools for this run.
+        on_message (callable, optional): Called with the text of each completed assistant message.
+        add_message (bool): Whether to add `content` to the thread first.
+
+    Returns:
+        RunResult: The last assistant message (None if there was none or the
+        run did not complete), the final run object and the number of tool calls.
+    """
+    if add_message:
+        with stage("message_create"):
+            client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=content
+            )
+
+    run_options = {"tools": tools} if tools is not None else {}
+    started = time.monotonic()
+    first_message = True
+    stream = client.beta.threads.runs.create(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        additional_instructions=additional_instructions,
+        stream=True,
+        **run_options
+    )
+
+    run, reply, tool_calls, rounds = None, None, 0, 0
+    while stream is not None:
+        next_stream = None
+        with stream:
+            for event in stream:
+                if event.event == "thread.message.completed":
+                    message = event.data
+                    if message.role == "assistant" and message.content and message.content[0].type == "text":
+                        reply = message.content[0].text.value
+                        if first_message:
+                            # Time until the customer could see the first reply
+                            observe_stage("run_first_message", time.monotonic() - started)
+                            first_message = False
+                        if on_message:
+                            on_message(reply)
+                elif event.event == "thread.run.requires_action":
+                    run = event.data
+                    if rounds >= MAX_TOOL_ROUNDS:
+                        logger.warning(f"Run {run.id} still requires action after {rounds} tool rounds")
+                        cancel_run(client, thread_id, run)
+                        break
+                    rounds += 1
+                    tool_calls += len(run.required_action.submit_tool_outputs.tool_calls)
+                    tool_outputs = collect_tool_outputs(run, tool_handler)
+                    if not tool_outputs:
+                        logger.warning("No tool outputs to submit")
+                        cancel_run(client, thread_id, run)
+                        break
+                    # The run continues on a new stream once the outputs are submitted
+                    try:
+                        next_stream = client.beta.threads.runs.submit_tool_outputs(
+                            thread_id=thread_id,
+                            run_id=run.id,
+                            tool_outputs=tool_outputs,
+                            stream=True
+                        )
+                    except Exception as e:
+                        logger.error(f"Failed to submit tool outputs: {e}")
+                        cancel_run(client, thread_id, run)
+                    break
+                elif event.event in TERMINAL_RUN_EVENTS:
+                    run = event.data
+        stream = next_stream
+
+    status = run.status if run is not None else None
+    observe_stage("run", time.monotonic() - started, "ok" if status == "completed" else status or "error")
+    logger.info(f"Run {getattr(run, 'id', None)} {status}")
+    return RunResult(reply if status == "completed" else None, run, tool_calls)
+
+
+def record_exchange(client, thread_id: str, question: str, answer: str):
+    """
+    Append a question and an answer produced outside a run (e.g. from a cache)
+    to the thread, so later runs still see the whole conversation.
+    """
+    client.beta.threads.messages.create(thread_id=thread_id, role="user", content=question)
+    client.beta.threads.messages.create(thread_id=thread_id, role="assistant", content=answer)
@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from helper import LRUCache
+
+logger = logging.getLogger(__name__)
+
+THREAD_MAX_MESSAGES = int(os.getenv("THREAD_MAX_MESSAGES", 40))
+THREAD_MAX_TOKENS = int(os.getenv("THREAD_MAX_TOKENS", 8000))
+THREAD_SUMMARY_MODEL = os.getenv("THREAD_SUMMARY_MODEL", "gpt-4o-mini")
+THREAD_SUMMARY_MESSAGES = int(os.getenv("THREAD_SUMMARY_MESSAGES", 50))
+
+SUMMARY_INSTRUCTIONS = """Summarize this conversation between a restaurant concierge and a customer
+in at most 8 short bullet points. Keep every detail that matters for later messages: the
+customer's name, party sizes, booked or requested dates and times, special requests,
+dietary needs, and any open question. Leave out greetings and small talk."""
+
+
+class ThreadCompactor:
+    """
+    Keeps OpenAI threads bounded. Every run re-reads its whole thread, so once a
+    thread passes `max_messages` messages or its last run's prompt passes
+    `max_tokens` tokens, it is replaced by a fresh thread seeded with a summary
+    of the old one.
+
+    Sizes are tracked per thread in memory: message counts from what this process
+    added, token counts from `run.usage.prompt_tokens` of the latest run.
+    """
+
+    def __init__(self, client, thread_store, max_messages: int = THREAD_MAX_MESSAGES,
+                 max_tokens: int = THREAD_MAX_TOKENS, summary_model: str = THREAD_SUMMARY_MODEL,
+                 summary_messages: int = THREAD_SUMMARY_MESSAGES, max_tracked: int = 10000):
+        """
+        Initialize the compactor.
+
+        Args:
+            client: The OpenAI client.
+            thread_store: Maps conversation keys to thread ids; updated on compaction.
+            max_messages: Message count that triggers compaction (0 disables it).
+            max_tokens: Prompt token count that triggers compaction (0 disables it).
+            summary_model: Chat model used to write the summary.
+            summary_messages: Number of most recent messages the summary is written from.
+            max_tracked: Maximum number of threads whose sizes are tracked.
+        """
+        self.client = client
+        self.thread_store = thread_store
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.summary_model = summary_model
+        self.summary_messages = summary_messages
+
+        self._sizes = LRUCache(max_size=max_tracked)
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.failures = 0
+
+    def _size(self, thread_id: str) -> Dict[str, int]:
+        size = self._sizes.get(thread_id)
+        if size is None:
+            size = {"messages": 0, "prompt_tokens": 0, "runs": 0}
+            self._sizes.set(thread_id, size)
+        return size
+
+    def record_messages(self, thread_id: str, count: int = 1):
+        """
+        Count messages added to a thread outside a run.
+        """
+        with self._lock:
+            self._size(thread_id)["messages"] += count
+
+    def record_run(self, thread_id: str, run, messages_added: int = 2):
+        """
+        Record a finished run: the user message and reply it added, and its prompt size.
+
+        Args:
+            thread_id (str): The thread the run ran on.
+            run: The final run object (may be None).
+            messages_added (int): Messages the exchange added to the thread.
+        """
+        usage = getattr(run, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        with self._lock:
+            size = self._size(thread_id)
+            size["messages"] += messages_added
+            size["runs"] += 1
+            if isinstance(prompt_tokens, int):
+                size["prompt_tokens"] = prompt_tokens
+
+    def should_compact(self, thread_id: str) -> bool:
+        """
+        Check whether a thread passed the message or token limit.
+        """
+        size = self._sizes.get(thread_id)
+        if size is None:
+            return False
+        return (
+            bool(self.max_messages) and size["messages"] >= self.max_messages
+            or bool(self.max_tokens) and size["prompt_tokens"] >= self.max_tokens
+        )
+
+    def _transcript(self, thread_id: str) -> List[str]:
+        messages = self.client.beta.threads.messages.list(
+            thread_id=thread_id, order="desc", limit=min(self.summary_messages, 100)
+        )
+        lines = []
+        for message in reversed(list(messages.data)):
+            text = " ".join(part.text.value for part in message.content if part.type == "text")
+            if text:
+                lines.append(f"{message.role}: {text}")
+        return lines
+
+    def summarize(self, thread_id: str) -> Optional[str]:
+        """
+        Summarize the most recent messages of a thread.
+
+        Returns:
+            str: The summary, or None if the thread has no text messages.
+        """
+        transcript = self._transcript(thread_id)
+        if not transcript:
+            return None
+        response = self.client.chat.completions.create(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {"role": "user", "content": "\n".join(transcript)},
+            ],
+            temperature=0,
+        )
+        return response.choices[0].message.content
+
+    def compact(self, key: str, thread_id: str) -> str:
+        """
+        Replace a thread by a new one seeded with a summary of it.
+
+        Must not run concurrently with a run on the same thread; the webhook
+        pipeline guarantees this by ordering all work per sender.
+
+        Args:
+            key (str): The conversation key the thread is stored under.
+            thread_id (str): The thread to replace.
+
+        Returns:
+            str: The id of the thread to use from now on (the old one if compaction failed).
+        """
+        try:
+            summary = self.summarize(thread_id)
+            seed = [{
+                "role": "assistant",
+                "content": f"Summary of our earlier conversation:\n{summary}",
+            }] if summary else []
+            new_thread = self.client.beta.threads.create(messages=seed)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Could not compact thread {thread_id}, keeping it: {e}")
+            return thread_id
+
+        self.thread_store.set(key, new_thread.id)
+        old_size = self._sizes.pop(thread_id) or {}
+        with self._lock:
+            self._sizes.set(new_thread.id, {"messages": len(seed), "prompt_tokens": 0, "runs": 0})
+            self.compactions += 1
+        logger.info(
+            f"Compacted thread {thread_id} ({old_size.get('messages', 0)} messages, "
+            f"{old_size.get('prompt_tokens', 0)} prompt tokens) into {new_thread.id}"
+        )
+        return new_thread.id
+
+    def maybe_compact(self, key: str, thread_id: str) -> str:
+        """
+        Compact the thread if it passed a limit.
+
+        Returns:
+            str: The id of the thread to use from now on.
+        """
+        if self.should_compact(thread_id):
+            return self.compact(key, thread_id)
+        return thread_id
+
+    def stats(self, top: int = 5) -> Dict[str, Any]:
+        """
+        Get compaction counters and the sizes of the largest tracked threads.
+        """
+        with self._lock:
+            sizes = [(thread_id, dict(size)) for thread_id, size in self._sizes.items()]
+        largest = sorted(sizes, key=lambda item: (item[1]["prompt_tokens"], item[1]["messages"]), reverse=True)[:top]
+        return {
+            "tracked_threads": len(sizes),
+            "max_messages": self.max_messages,
+            "max_tokens": self.max_tokens,
+            "compactions": self.compactions,
+            "failures": self.failures,
+            "avg_messages": round(sum(s["messages"] for _, s in sizes) / len(sizes), 1) if sizes else 0.0,
+            "avg_prompt_tokens": round(sum(s["prompt_tokens"] for _, s in sizes) / len(sizes), 1) if sizes else 0.0,
+            "largest": [{"thread_id": thread_id, **size} for thread_id, size in largest],
+        }
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from helper import LRUCache, connect_sqlite
+
+THREAD_STORE_BACKEND = os.getenv("THREAD_STORE_BACKEND", "sqlite")
+THREAD_STORE_PATH = os.getenv("THREAD_STORE_PATH", "threads.db")
+THREAD_STORE_MAX_SIZE = int(os.getenv("THREAD_STORE_MAX_SIZE", 10000))
+THREAD_STORE_TTL = float(os.getenv("THREAD_STORE_TTL", 30 * 24 * 3600))
+
+
+class ThreadStore(ABC):
+    """
+    Interface for mapping a conversation key (e.g. a sender id) to an OpenAI thread id.
+
+    Every backend expires a key `ttl` seconds after its last use (get or set),
+    so an ongoing conversation keeps its thread whichever backend is configured.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get the thread id for a key, or None if unknown or expired. Restarts the key's TTL.
+        """
+
+    @abstractmethod
+    def set(self, key: str, thread_id: str):
+        """
+        Store (or replace) the thread id for a key.
+        """
+
+    @abstractmethod
+    def setdefault(self, key: str, thread_id: str) -> str:
+        """
+        Store the thread id unless the key already has one, and return the stored id.
+        """
+
+    @abstractmethod
+    def delete(self, key: str):
+        """
+        Forget the thread id for a key.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss/eviction counters for the store.
+        """
+
+
+class MemoryThreadStore(ThreadStore):
+    """
+    In-process LRU store with a TTL since last use. Fast, but per-process and lost on restart.
+    """
+
+    def __init__(self, max_size: int = THREAD_STORE_MAX_SIZE, ttl: Optional[float] = THREAD_STORE_TTL):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            thread_id = self._cache.get(key)
+            if thread_id is not None:
+                # Re-setting restarts the TTL, so expiry counts from the last use as in SQLiteThreadStore
+                self._cache.set(key, thread_id)
+            return thread_id
+
+    def set(self, key: str, thread_id: str):
+        self._cache.set(key, thread_id)
+
+    def setdefault(self, key: str, thread_id: str) -> str:
+        with self._lock:
+            existing = self._cache.get(key)
+            if existing is not None:
+                return existing
+            self._cache.set(key, thread_id)
+            return thread_id
+
+    def delete(self, key: str):
+        self._cache.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class SQLiteThreadStore(ThreadStore):
+    """
+    SQLite (WAL) store shared by every worker process on the host, with an
+    in-memory LRU in front so hot lookups never touch the database. Rows are
+    touched when read from the database, so last use is tracked to within
+    `cache_ttl`.
+    """
+
+    def __init__(self, path: str = THREAD_STORE_PATH, ttl: Optional[float] = THREAD_STORE_TTL,
+                 cache_size: int = THREAD_STORE_MAX_SIZE, cache_ttl: float = 300):
+        """
+        Initialize the store.
+
+        Args:
+            path: Path to the SQLite database file.
+            ttl: Seconds since last use after which a thread is forgotten. None keeps threads forever.
+            cache_size: Maximum number of entries in the in-memory front cache.
+            cache_ttl: Seconds a front cache entry is trusted before re-reading the database,
+                so changes made by other processes are picked up.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS threads ("
+            "key TEXT PRIMARY KEY, thread_id TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.db_hits = 0
+        self.db_misses = 0
+        self.expired = 0
+        self._writes = 0
+
+    def _min_updated_at(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        thread_id = self._cache.get(key)
+        if thread_id is not None:
+            return thread_id
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id FROM threads WHERE key = ? AND updated_at >= ?",
+                (key, self._min_updated_at())
+            ).fetchone()
+            if row is None:
+                self.db_misses += 1
+                return None
+            # Touch the row so active conversations don't expire
+            self._conn.execute("UPDATE threads SET updated_at = ? WHERE key = ?", (time.time(), key))
+        self.db_hits += 1
+        self._cache.set(key, row[0])
+        return row[0]
+
+    def set(self, key: str, thread_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (key, thread_id, updated_at) VALUES (?, ?, ?)",
+                (key, thread_id, time.time())
+            )
+            self._after_write()
+        self._cache.set(key, thread_id)
+
+    def setdefault(self, key: str, thread_id: str) -> str:
+        with self._lock:
+            # Replace only an expired row; otherwise keep whatever another process stored first
+            self._conn.execute(
+                "INSERT INTO threads (key, thread_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET thread_id = excluded.thread_id, updated_at = excluded.updated_at "
+                "WHERE threads.updated_at < ?",
+                (key, thread_id, time.time(), self._min_updated_at())
+            )
+            stored = self._conn.execute("SELECT thread_id FROM threads WHERE key = ?", (key,)).fetchone()[0]
+            self._after_write()
+        self._cache.set(key, stored)
+        return stored
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM threads WHERE key = ?", (key,))
+        self._cache.pop(key)
+
+    def _after_write(self):
+        """
+        Periodically purge expired rows so the table stays bounded. Caller holds the lock.
+        """
+        self._writes += 1
+        if self.ttl is not None and self._writes % 1000 == 0:
+            cursor = self._conn.execute("DELETE FROM threads WHERE updated_at < ?", (self._min_updated_at(),))
+            self.expired += cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "rows": rows,
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+            "expired": self.expired,
+            "cache": self._cache.stats(),
+        }
+
+
+def create_thread_store(backend: str = THREAD_STORE_BACKEND) -> ThreadStore:
+    """
+    Create the thread store configured by THREAD_STORE_BACKEND ("memory" or "sqlite").
+
+    Returns:
+        ThreadStore: The configured store.
+    """
+    if backend == "memory":
+        return MemoryThreadStore()
+    if backend == "sqlite":
+        return SQLiteThreadStore()
+    raise ValueError(f"Unknown thread store backend: {backend}")
@@ -0,0 +1,3 @@
+from .fake_services import FakeServices, FakeLatency
+from .scenarios import Scenario, WebhookEvent, SCENARIOS, EVENT_KINDS, generate_events
+from .runner import run, run_scenario, save_results, latest_results, format_results, compare, percentiles
@@ -0,0 +1,97 @@
+"""
+Benchmark the backend offline:
+
+    python -m benchmark list
+    python -m benchmark run [SCENARIO ...] [--rate 10] [--duration 30] [--env ASSISTANT_RUN_MODE=poll]
+    python -m benchmark compare [OLD.json NEW.json]
+
+Run from `backend/`. Results are saved to BENCHMARK_RESULTS_DIR; `compare`
+without arguments compares the two most recent runs.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from .fake_services import FakeLatency
+from .runner import BENCHMARK_RESULTS_DIR, compare, format_results, latest_results, run, save_results
+from .scenarios import SCENARIOS
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Offline load test of the webhook backend.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List the scenarios.")
+
+    run_parser = commands.add_parser("run", help="Run scenarios and save the results.")
+    run_parser.add_argument("scenarios", nargs="*", help="Scenarios to run (default: all).")
+    run_parser.add_argument("--rate", type=float, help="Events per second, overriding the scenarios' rates.")
+    run_parser.add_argument("--duration", type=float, help="Seconds of load, overriding the scenarios' durations.")
+    run_parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                            help="Backend setting for every scenario; repeatable.")
+    defaults = FakeLatency()
+    run_parser.add_argument("--model-turn", type=float, default=defaults.model_turn,
+                            help="Seconds per simulated model turn of a run.")
+    run_parser.add_argument("--openai-latency", type=float, default=defaults.openai_request,
+                            help="Seconds per plain OpenAI request.")
+    run_parser.add_argument("--graph-latency", type=float, default=defaults.graph_send, help="Seconds per Graph API send.")
+    run_parser.add_argument("--aci-latency", type=float, default=defaults.aci_execute, help="Seconds per ACI execution.")
+    run_parser.add_argument("--throttle-rate", type=float, default=defaults.graph_throttle_rate,
+                            help="Fraction of Graph sends answered with a throttling error.")
+    run_parser.add_argument("--reply-timeout", type=float, default=60.0,
+                            help="Seconds to wait for outstanding replies after the last event.")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default=BENCHMARK_RESULTS_DIR, help="Directory to save the results in.")
+    run_parser.add_argument("--no-save", action="store_true", help="Print the results without saving them.")
+
+    compare_parser = commands.add_parser("compare", help="Compare two saved results.")
+    compare_parser.add_argument("files", nargs="*", help="Baseline and new results (default: the two most recent).")
+    compare_parser.add_argument("--output", default=BENCHMARK_RESULTS_DIR, help="Directory the results are saved in.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.command == "list":
+        for scenario in SCENARIOS.values():
+            print(f"{scenario.name:<14} {scenario.rate:>5g}/s for {scenario.duration:g}s  {scenario.description}")
+        return
+
+    if args.command == "compare":
+        files = args.files or latest_results(args.output)
+        if len(files) != 2:
+            sys.exit("Need two results to compare")
+        with open(files[0]) as old, open(files[1]) as new:
+            print(compare(json.load(old), json.load(new)))
+        return
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}")
+    scenarios = [SCENARIOS[name] for name in args.scenarios or SCENARIOS]
+    overrides = {}
+    if args.rate is not None:
+        overrides["rate"] = args.rate
+    if args.duration is not None:
+        overrides["duration"] = args.duration
+    scenarios = [scenario._replace(**overrides) for scenario in scenarios]
+
+    latency = FakeLatency(
+        openai_request=args.openai_latency, model_turn=args.model_turn, graph_send=args.graph_latency,
+        aci_execute=args.aci_latency, graph_throttle_rate=args.throttle_rate,
+    )
+    env = dict(item.split("=", 1) for item in args.env)
+    results = asyncio.run(run(scenarios, latency, env, args.reply_timeout, args.seed))
+    print(format_results(results))
+    if not args.no_save:
+        print(f"Saved to {save_results(results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
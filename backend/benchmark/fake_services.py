@@ -0,0 +1,431 @@
+"""
+Local stand-ins for the OpenAI Assistants API, the Graph/Instagram send
+endpoints and the ACI function API, served from one FastAPI app.
+
+The backend is pointed at them through its base URL settings (see
+`FakeServices.env`). Every reply the backend sends is recorded with its
+arrival time, so the load generator can measure end-to-end latency from
+webhook to reply.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Runs whose last user message contains this ask for tools before answering
+BOOKING_KEYWORD = "book"
+
+
+class FakeLatency(NamedTuple):
+    # Seconds per plain OpenAI request (threads, messages, assistants, ...)
+    openai_request: float = 0.05
+    # Seconds per model turn of a run: until its first tool call, between tool rounds, until the answer
+    model_turn: float = 1.0
+    # Relative jitter applied to every latency, e.g. 0.3 for +/-30%
+    jitter: float = 0.3
+    graph_send: float = 0.08
+    aci_execute: float = 0.3
+    # Fraction of Graph sends answered with a throttling error
+    graph_throttle_rate: float = 0.0
+    # Poll interval the fake asks `create_and_poll` clients to use
+    poll_after_ms: int = 100
+
+
+def _list_page(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "object": "list",
+        "data": data,
+        "first_id": data[0]["id"] if data else None,
+        "last_id": data[-1]["id"] if data else None,
+        "has_more": False,
+    }
+
+
+def _text_message(message_id: str, thread_id: str, role: str, text: str, run_id: Optional[str] = None,
+                  assistant_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": message_id,
+        "object": "thread.message",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "role": role,
+        "status": "completed",
+        "assistant_id": assistant_id,
+        "run_id": run_id,
+        "attachments": [],
+        "metadata": {},
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+    }
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _Run:
+    def __init__(self, run_id: str, thread_id: str, assistant_id: str, tool_rounds: List[List[Dict[str, Any]]]):
+        self.id = run_id
+        self.thread_id = thread_id
+        self.assistant_id = assistant_id
+        # Tool calls still to request, one list per model turn
+        self.tool_rounds = tool_rounds
+        self.status = "queued"
+        self.required_action: Optional[Dict[str, Any]] = None
+        self.ready_at = 0.0
+        self.created_at = int(time.time())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "thread.run",
+            "created_at": self.created_at,
+            "thread_id": self.thread_id,
+            "assistant_id": self.assistant_id,
+            "status": self.status,
+            "required_action": self.required_action,
+            "instructions": "",
+            "model": "gpt-4o-mini",
+            "tools": [],
+            "parallel_tool_calls": True,
+            "usage": {"prompt_tokens": 500, "completion_tokens": 50, "total_tokens": 550}
+            if self.status == "completed" else None,
+        }
+
+
+class FakeServices:
+    """
+    Simulates the external APIs the backend talks to, with configurable latency.
+
+    Runs are simulated per model turn: a booking request ("book" in the message)
+    first asks for `check_availability`, then for `GOOGLE_CALENDAR__EVENTS_INSERT`,
+    and then answers; any other message is answered in one turn. Both polling
+    (`create_and_poll`) and streaming runs are supported.
+    """
+
+    def __init__(self, latency: FakeLatency = FakeLatency(), seed: int = 0):
+        """
+        Initialize the fakes.
+
+        Args:
+            latency: Latencies and failure rates to simulate.
+            seed: Seed for jitter and throttling decisions, so runs are repeatable.
+        """
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.assistants: Dict[str, Dict[str, Any]] = {}
+        self.vector_stores: Dict[str, Dict[str, Any]] = {}
+        self.threads: Dict[str, List[Dict[str, Any]]] = {}
+        self.runs: Dict[str, _Run] = {}
+        # Monotonic arrival times of the replies per recipient (DMs) or comment id
+        self.deliveries: Dict[str, List[float]] = defaultdict(list)
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.app = self._build_app()
+
+    def env(self, base_url: str) -> Dict[str, str]:
+        """
+        Environment variables that point the backend at the fakes served under `base_url`.
+        """
+        return {
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": f"{base_url}/openai/v1",
+            "AIPOLABS_ACI_API_KEY": "benchmark",
+            "AIPOLABS_ACI_SERVER_URL": f"{base_url}/aci/v1/",
+            "FACEBOOK_GRAPH_URL": f"{base_url}/graph",
+            "INSTAGRAM_GRAPH_URL": f"{base_url}/instagram",
+        }
+
+    def reset(self):
+        """
+        Forget recorded deliveries and request counts, e.g. between scenarios.
+        """
+        self.deliveries.clear()
+        self.requests.clear()
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    async def _delay(self, seconds: float):
+        if seconds > 0:
+            jitter = self.latency.jitter
+            await asyncio.sleep(seconds * self.rng.uniform(1 - jitter, 1 + jitter))
+
+    def _turn_time(self) -> float:
+        jitter = self.latency.jitter
+        return time.monotonic() + self.latency.model_turn * self.rng.uniform(1 - jitter, 1 + jitter)
+
+    # OpenAI ----------------------------------------------------------------
+
+    def _tool_rounds(self, thread_id: str) -> List[List[Dict[str, Any]]]:
+        user_messages = [m for m in self.threads.get(thread_id, []) if m["role"] == "user"]
+        text = user_messages[-1]["content"][0]["text"]["value"].lower() if user_messages else ""
+        if BOOKING_KEYWORD not in text:
+            return []
+        start = "2030-01-04T19:00:00"
+        return [
+            [{
+                "id": self._id("call"), "type": "function",
+                "function": {"name": "check_availability", "arguments": json.dumps({"start": start, "party_size": 2})},
+            }],
+            [{
+                "id": self._id("call"), "type": "function",
+                "function": {"name": "GOOGLE_CALENDAR__EVENTS_INSERT", "arguments": json.dumps({
+                    "path": {"calendarId": "primary"},
+                    "body": {
+                        "summary": "Table for 2",
+                        "start": {"dateTime": start},
+                        "end": {"dateTime": "2030-01-04T20:30:00"},
+                    },
+                })},
+            }],
+        ]
+
+    def _advance(self, run: _Run) -> List[tuple]:
+        """
+        Finish the run's current model turn. Returns the stream events it produced.
+        """
+        if run.tool_rounds:
+            run.status = "requires_action"
+            run.required_action = {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": run.tool_rounds.pop(0)}}
+            return [("thread.run.requires_action", run.to_dict())]
+        run.status = "completed"
+        run.required_action = None
+        message = _text_message(
+            self._id("msg"), run.thread_id, "assistant",
+            "Thanks for reaching out! We'd be happy to help with that.", run.id, run.assistant_id
+        )
+        self.threads.setdefault(run.thread_id, []).append(message)
+        return [("thread.message.completed", message), ("thread.run.completed", run.to_dict())]
+
+    def _poll(self, run: _Run) -> Dict[str, Any]:
+        if run.status in ("queued", "in_progress") and time.monotonic() >= run.ready_at:
+            self._advance(run)
+        elif run.status == "queued":
+            run.status = "in_progress"
+        return run.to_dict()
+
+    def _run_response(self, run: _Run, stream: bool):
+        headers = {"openai-poll-after-ms": str(self.latency.poll_after_ms)}
+        if not stream:
+            return JSONResponse(run.to_dict(), headers=headers)
+
+        async def events():
+            yield _sse("thread.run.created", run.to_dict())
+            run.status = "in_progress"
+            yield _sse("thread.run.in_progress", run.to_dict())
+            await asyncio.sleep(max(0.0, run.ready_at - time.monotonic()))
+            for event, data in self._advance(run):
+                yield _sse(event, data)
+            yield "event: done\ndata: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    def _openai_router(self) -> APIRouter:
+        router = APIRouter(prefix="/openai/v1")
+
+        @router.get("/assistants")
+        async def list_assistants():
+            await self._delay(self.latency.openai_request)
+            return _list_page(list(self.assistants.values()))
+
+        @router.post("/assistants")
+        async def create_assistant(request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            assistant = {**body, "id": self._id("asst"), "object": "assistant", "created_at": int(time.time())}
+            self.assistants[assistant["id"]] = assistant
+            return assistant
+
+        @router.post("/assistants/{assistant_id}")
+        async def update_assistant(assistant_id: str, request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            assistant = self.assistants.setdefault(assistant_id, {"id": assistant_id, "object": "assistant"})
+            assistant.update(body)
+            return assistant
+
+        @router.get("/vector_stores")
+        async def list_vector_stores():
+            await self._delay(self.latency.openai_request)
+            return _list_page(list(self.vector_stores.values()))
+
+        @router.post("/vector_stores")
+        async def create_vector_store(request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            store = {
+                "id": self._id("vs"), "object": "vector_store", "name": body.get("name"),
+                "created_at": int(time.time()), "status": "completed", "usage_bytes": 0,
+                "file_counts": {"in_progress": 0, "completed": 0, "failed": 0, "cancelled": 0, "total": 0},
+            }
+            self.vector_stores[store["id"]] = store
+            return store
+
+        @router.get("/vector_stores/{vector_store_id}/files")
+        async def list_vector_store_files(vector_store_id: str):
+            await self._delay(self.latency.openai_request)
+            return _list_page([])
+
+        @router.post("/threads")
+        async def create_thread():
+            await self._delay(self.latency.openai_request)
+            thread_id = self._id("thread")
+            self.threads[thread_id] = []
+            return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+        @router.post("/threads/{thread_id}/messages")
+        async def create_message(thread_id: str, request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            message = _text_message(self._id("msg"), thread_id, body.get("role", "user"), str(body.get("content", "")))
+            self.threads.setdefault(thread_id, []).append(message)
+            return message
+
+        @router.get("/threads/{thread_id}/messages")
+        async def list_messages(thread_id: str, run_id: Optional[str] = None, order: str = "desc", limit: int = 20):
+            await self._delay(self.latency.openai_request)
+            messages = [m for m in self.threads.get(thread_id, []) if run_id is None or m["run_id"] == run_id]
+            if order == "desc":
+                messages = messages[::-1]
+            return _list_page(messages[:limit])
+
+        @router.post("/threads/{thread_id}/runs")
+        async def create_run(thread_id: str, request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            run = _Run(self._id("run"), thread_id, body.get("assistant_id"), self._tool_rounds(thread_id))
+            run.ready_at = self._turn_time()
+            self.runs[run.id] = run
+            return self._run_response(run, body.get("stream", False))
+
+        @router.get("/threads/{thread_id}/runs/{run_id}")
+        async def retrieve_run(thread_id: str, run_id: str):
+            await self._delay(self.latency.openai_request)
+            run = self.runs.get(run_id)
+            if run is None:
+                return JSONResponse({"error": {"message": f"No run {run_id}"}}, status_code=404)
+            return JSONResponse(self._poll(run), headers={"openai-poll-after-ms": str(self.latency.poll_after_ms)})
+
+        @router.post("/threads/{thread_id}/runs/{run_id}/submit_tool_outputs")
+        async def submit_tool_outputs(thread_id: str, run_id: str, request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            run = self.runs.get(run_id)
+            if run is None or run.status != "requires_action":
+                return JSONResponse({"error": {"message": f"Run {run_id} is not waiting for tool outputs"}}, status_code=400)
+            run.status = "queued"
+            run.required_action = None
+            run.ready_at = self._turn_time()
+            return self._run_response(run, body.get("stream", False))
+
+        @router.post("/chat/completions")
+        async def chat_completion():
+            await self._delay(self.latency.model_turn)
+            return {
+                "id": self._id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+                "model": "gpt-4o-mini",
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "The customer asked about the restaurant."},
+                }],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": 20, "total_tokens": 1020},
+            }
+
+        @router.post("/embeddings")
+        async def embeddings(request: Request):
+            body = await request.json()
+            await self._delay(self.latency.openai_request)
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            data = []
+            for index, text in enumerate(inputs):
+                digest = hashlib.sha256(str(text).encode()).digest()
+                data.append({"object": "embedding", "index": index, "embedding": [b / 255 - 0.5 for b in digest]})
+            return {"object": "list", "data": data, "model": body.get("model"), "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+        return router
+
+    # Graph / Instagram -----------------------------------------------------
+
+    async def _graph_send(self, api: str, key: Optional[str], is_reply: bool) -> JSONResponse:
+        self.requests[api] += 1
+        await self._delay(self.latency.graph_send)
+        if self.rng.random() < self.latency.graph_throttle_rate:
+            self.requests[f"{api}_throttled"] += 1
+            return JSONResponse(
+                {"error": {"message": "(#613) Calls to this api have exceeded the rate limit.", "code": 613}},
+                status_code=400
+            )
+        if is_reply and key:
+            self.deliveries[key].append(time.monotonic())
+        return JSONResponse({"recipient_id": key, "message_id": self._id("mid")})
+
+    def _graph_router(self) -> APIRouter:
+        router = APIRouter()
+
+        @router.post("/graph/{version}/me/messages")
+        async def messenger_send(version: str, request: Request):
+            body = await request.json()
+            return await self._graph_send(
+                "messenger_sender_action" if "sender_action" in body else "messenger_send",
+                body.get("recipient", {}).get("id"), "message" in body
+            )
+
+        @router.post("/graph/{version}/{comment_id}/replies")
+        async def comment_reply(version: str, comment_id: str):
+            return await self._graph_send("comment_reply", comment_id, True)
+
+        @router.post("/instagram/{version}/me/messages")
+        async def instagram_send(version: str, request: Request):
+            body = await request.json()
+            return await self._graph_send(
+                "instagram_sender_action" if "sender_action" in body else "instagram_send",
+                body.get("recipient", {}).get("id"), "message" in body
+            )
+
+        @router.get("/instagram/refresh_access_token")
+        async def refresh_access_token():
+            return {"access_token": "benchmark-refreshed", "token_type": "bearer", "expires_in": 60 * 24 * 3600}
+
+        return router
+
+    # ACI -------------------------------------------------------------------
+
+    def _aci_router(self) -> APIRouter:
+        router = APIRouter(prefix="/aci/v1")
+
+        @router.get("/functions/{function_name}/definition")
+        async def function_definition(function_name: str):
+            await self._delay(self.latency.openai_request)
+            return {
+                "type": "function",
+                "function": {
+                    "name": function_name,
+                    "description": f"Benchmark stand-in for {function_name}.",
+                    "parameters": {"type": "object", "properties": {}, "required": []},
+                },
+            }
+
+        @router.post("/functions/{function_name}/execute")
+        async def execute(function_name: str):
+            self.requests["aci_execute"] += 1
+            await self._delay(self.latency.aci_execute)
+            if function_name == "GOOGLE_CALENDAR__EVENTS_LIST":
+                return {"success": True, "data": {"items": []}}
+            return {"success": True, "data": {"id": self._id("event"), "status": "confirmed"}}
+
+        return router
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+        app.include_router(self._openai_router())
+        app.include_router(self._graph_router())
+        app.include_router(self._aci_router())
+        return app
@@ -0,0 +1,442 @@
+"""
+Runs benchmark scenarios against the backend with its external APIs faked.
+
+For every scenario the backend (`main:app`) is started in a subprocess,
+configured to talk to the fakes served from this process, and warmed up with
+one event of each kind. Webhooks are then posted open-loop at the scenario's
+rate, so a slow backend builds up a backlog instead of slowing the load down.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+import uvicorn
+
+from .fake_services import FakeLatency, FakeServices
+from .scenarios import EVENT_KINDS, INSTAGRAM_ACCOUNT_ID, PAGE_ID, Scenario, generate_events
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_RESULTS_DIR = os.getenv("BENCHMARK_RESULTS_DIR", os.path.join(BACKEND_DIR, "benchmark_results"))
+BACKEND_START_TIMEOUT = 60.0
+
+STAGE_LINE = re.compile(r'^concierge_stage_latency_seconds_(sum|count)\{stage="([^"]+)",[^}]*\} (\S+)$')
+
+
+def percentiles(values: Iterable[float]) -> Dict[str, Optional[float]]:
+    """
+    p50/p95/p99/max of latencies in seconds, in milliseconds (None if there are none).
+    """
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+
+    def pick(fraction):
+        return round(1000 * values[min(len(values) - 1, int(fraction * len(values)))], 1)
+
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(1000 * values[-1], 1)}
+
+
+def _listening_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+def _free_port() -> int:
+    with _listening_socket() as sock:
+        return sock.getsockname()[1]
+
+
+def write_tenants(path: str):
+    """
+    Write the tenants file routing the benchmark's accounts to one tenant with inline tokens.
+    """
+    with open(path, "w") as f:
+        json.dump([{
+            "tenant_id": "bench",
+            "account_ids": [INSTAGRAM_ACCOUNT_ID, PAGE_ID],
+            "restaurant_name": "Benchmark Bistro",
+            "ig_access_token": "benchmark-ig-token",
+            "facebook_access_token": "benchmark-page-token",
+        }], f, indent=4)
+
+
+def backend_env(fakes: FakeServices, fakes_url: str, workdir: str, overrides: Dict[str, str]) -> Dict[str, str]:
+    """
+    The backend's environment: the fakes' base URLs, and every cache and store in `workdir`.
+    """
+    tenants_path = os.path.join(workdir, "tenants.json")
+    write_tenants(tenants_path)
+    return {
+        **os.environ,
+        **fakes.env(fakes_url),
+        "LINKED_ACCOUNT_OWNER_ID": "benchmark",
+        "FACEBOOK_ACCESS_TOKEN": "benchmark-page-token",
+        "REPLY_TO_COMMENTS": "true",
+        "TENANTS_PATH": tenants_path,
+        "THREAD_STORE_PATH": os.path.join(workdir, "threads.db"),
+        "STARTUP_CACHE_PATH": os.path.join(workdir, "startup_cache.json"),
+        "ASSISTANT_CACHE_PATH": os.path.join(workdir, "assistant_cache.json"),
+        "RAG_MANIFEST_PATH": os.path.join(workdir, "rag_manifest.json"),
+        "VECTOR_FILE_CACHE_DIR": os.path.join(workdir, "vector_file_cache"),
+        "DEDUP_BACKEND": "memory",
+        "INBOX_PATH": os.path.join(workdir, "inbox.db"),
+        **overrides,
+    }
+
+
+class FakeServer:
+    """
+    Serves the fakes with uvicorn on the current event loop.
+    """
+
+    def __init__(self, fakes: FakeServices):
+        self.fakes = fakes
+        self.url: Optional[str] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        sock = _listening_socket()
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        self._server = uvicorn.Server(uvicorn.Config(self.fakes.app, log_level="warning", lifespan="off"))
+        self._task = asyncio.create_task(self._server.serve(sockets=[sock]))
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            await self._task
+
+
+class BackendProcess:
+    """
+    Runs `main:app` with uvicorn in a subprocess, logging to a file.
+    """
+
+    def __init__(self, env: Dict[str, str], log_path: str):
+        self.env = env
+        self.log_path = log_path
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process: Optional[subprocess.Popen] = None
+
+    async def start(self, client: httpx.AsyncClient):
+        """
+        Start the backend and wait until its startup warm-up finished.
+
+        Raises:
+            RuntimeError: If it exits or isn't warm within BACKEND_START_TIMEOUT.
+        """
+        with open(self.log_path, "w") as log:
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port)],
+                cwd=BACKEND_DIR, env=self.env, stdout=log, stderr=subprocess.STDOUT,
+            )
+        deadline = time.monotonic() + BACKEND_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"Backend exited with {self._process.returncode}, see {self.log_path}")
+            try:
+                response = await client.get(f"{self.url}/stats")
+                if "warm" in response.json()["startup"]["phases"]:
+                    return
+            except (httpx.TransportError, ValueError, KeyError):
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"Backend not ready after {BACKEND_START_TIMEOUT:g}s, see {self.log_path}")
+
+    def stop(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+
+
+def stage_totals(text: str) -> Dict[str, Dict[str, float]]:
+    """
+    Sum the backend's stage latency histograms in `/metrics` output over their labels.
+
+    Returns:
+        dict: Total seconds and observation count per stage.
+    """
+    totals: Dict[str, Dict[str, float]] = {}
+    for line in text.splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, {"sum": 0.0, "count": 0.0})[kind] += float(value)
+    return totals
+
+
+def stage_latencies(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """
+    Observation count and mean latency in milliseconds per stage between two `stage_totals`.
+    """
+    latencies = {}
+    for stage, total in after.items():
+        base = before.get(stage, {"sum": 0.0, "count": 0.0})
+        count = total["count"] - base["count"]
+        if count:
+            latencies[stage] = {"count": int(count), "mean_ms": round(1000 * (total["sum"] - base["sum"]) / count, 1)}
+    return latencies
+
+
+async def wait_for_replies(fakes: FakeServices, keys: List[str], timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and any(key not in fakes.deliveries for key in keys):
+        await asyncio.sleep(0.05)
+
+
+async def post_events(client: httpx.AsyncClient, url: str, events, rate: float) -> List[Dict[str, Any]]:
+    """
+    Post events open-loop, one every 1/rate seconds regardless of how fast they are acknowledged.
+
+    Returns:
+        list: Per event its kind, reply key, post time, acknowledgement latency and status.
+    """
+    async def post(kind, event):
+        record = {"kind": kind, "reply_key": event.reply_key, "sent_at": time.monotonic(), "status": None}
+        try:
+            response = await client.post(f"{url}{event.path}", json=event.payload)
+            record["status"] = response.status_code
+        except httpx.HTTPError as e:
+            record["error"] = str(e)
+        record["ack_latency"] = time.monotonic() - record["sent_at"]
+        return record
+
+    started = time.monotonic()
+    tasks = []
+    for n, (kind, event) in enumerate(events):
+        delay = started + n / rate - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(post(kind, event)))
+    return await asyncio.gather(*tasks)
+
+
+def summarize(scenario: Scenario, records: List[Dict[str, Any]], fakes: FakeServices) -> Dict[str, Any]:
+    """
+    Latency percentiles, throughput and error rates of one scenario run.
+    """
+    kinds: Dict[str, List[float]] = {}
+    reply_latencies, reply_times = [], []
+    rejected = errors = missing = 0
+    for record in records:
+        if record["status"] == 503:
+            rejected += 1
+            continue
+        if record["status"] != 200:
+            errors += 1
+            continue
+        deliveries = fakes.deliveries.get(record["reply_key"])
+        if not deliveries:
+            missing += 1
+            continue
+        latency = deliveries[0] - record["sent_at"]
+        reply_latencies.append(latency)
+        reply_times.append(deliveries[0])
+        kinds.setdefault(record["kind"], []).append(latency)
+
+    events = len(records)
+    first_sent = min((record["sent_at"] for record in records), default=0.0)
+    window = max(reply_times) - first_sent if reply_times else 0.0
+    return {
+        "description": scenario.description,
+        "offered_rate": scenario.rate,
+        "duration": scenario.duration,
+        "env": scenario.env,
+        "events": events,
+        "replies": len(reply_latencies),
+        "rejected": rejected,
+        "errors": errors,
+        "missing_replies": missing,
+        "error_rate": round((rejected + errors + missing) / events, 4) if events else 0.0,
+        "throughput": round(len(reply_latencies) / window, 2) if window > 0 else 0.0,
+        "ack_ms": percentiles(record["ack_latency"] for record in records),
+        "reply_ms": percentiles(reply_latencies),
+        "kinds": {kind: {"replies": len(latencies), **percentiles(latencies)} for kind, latencies in kinds.items()},
+        "graph_requests": dict(fakes.requests),
+    }
+
+
+async def run_scenario(scenario: Scenario, fakes: FakeServices, fakes_url: str, workdir: str,
+                       env_overrides: Dict[str, str], reply_timeout: float, seed: int) -> Dict[str, Any]:
+    """
+    Run one scenario against a fresh backend.
+
+    Returns:
+        dict: The scenario's results (see `summarize`), plus the backend's per-stage latencies.
+    """
+    scenario_dir = os.path.join(workdir, scenario.name)
+    os.makedirs(scenario_dir, exist_ok=True)
+    env = backend_env(fakes, fakes_url, scenario_dir, {**scenario.env, **env_overrides})
+    backend = BackendProcess(env, os.path.join(scenario_dir, "backend.log"))
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        try:
+            await backend.start(client)
+
+            # Initializes the tenant's assistants, knowledge and availability index
+            warmup = [(kind, EVENT_KINDS[kind](f"warmup-{uuid.uuid4().hex[:8]}", fakes.rng)) for kind, _ in scenario.mix]
+            await post_events(client, backend.url, warmup, rate=len(warmup))
+            await wait_for_replies(fakes, [event.reply_key for _, event in warmup], reply_timeout)
+            fakes.reset()
+            warm_stages = stage_totals((await client.get(f"{backend.url}/metrics")).text)
+
+            logger.info(f"Running {scenario.name}: {scenario.rate:g} events/s for {scenario.duration:g}s")
+            records = await post_events(
+                client, backend.url, generate_events(scenario, uuid.uuid4().hex[:8], seed), scenario.rate
+            )
+            await wait_for_replies(
+                fakes, [record["reply_key"] for record in records if record["status"] == 200], reply_timeout
+            )
+            result = summarize(scenario, records, fakes)
+            result["stages"] = stage_latencies(warm_stages, stage_totals((await client.get(f"{backend.url}/metrics")).text))
+            return result
+        finally:
+            backend.stop()
+
+
+async def run(scenarios: List[Scenario], latency: FakeLatency = FakeLatency(), env_overrides: Optional[Dict[str, str]] = None,
+              reply_timeout: float = 60.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Run scenarios one after another, each against a fresh backend.
+
+    Args:
+        scenarios: The scenarios to run.
+        latency: Latencies and failure rates of the fake APIs.
+        env_overrides: Backend settings applied to every scenario, e.g. {"ASSISTANT_RUN_MODE": "poll"}.
+        reply_timeout: Seconds to wait for outstanding replies after the last event.
+        seed: Seed for the event mix and the fakes.
+
+    Returns:
+        dict: The results document, as saved by `save_results`.
+    """
+    env_overrides = env_overrides or {}
+    fakes = FakeServices(latency, seed)
+    server = FakeServer(fakes)
+    await server.start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+            for scenario in scenarios:
+                results[scenario.name] = await run_scenario(
+                    scenario, fakes, server.url, workdir, env_overrides, reply_timeout, seed
+                )
+    finally:
+        await server.stop()
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "latency": latency._asdict(),
+        "env": env_overrides,
+        "scenarios": results,
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    """
+    The commit the benchmark ran on and whether the tree had uncommitted changes.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout
+        return {"commit": commit, "dirty": bool(status.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def save_results(results: Dict[str, Any], directory: str = BENCHMARK_RESULTS_DIR) -> str:
+    """
+    Save a results document as `<timestamp>_<commit>.json`.
+
+    Returns:
+        str: The path written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    commit = results["git"]["commit"] or "unknown"
+    if results["git"]["dirty"]:
+        commit += "-dirty"
+    path = os.path.join(directory, f"{stamp}_{commit}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def latest_results(directory: str = BENCHMARK_RESULTS_DIR, count: int = 2) -> List[str]:
+    """
+    Paths of the most recent saved results, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    return [os.path.join(directory, name) for name in names[-count:]]
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    lines = [f"commit {results['git']['commit']}{' (dirty)' if results['git']['dirty'] else ''}"]
+    for name, result in results["scenarios"].items():
+        reply, ack = result["reply_ms"], result["ack_ms"]
+        lines.append(
+            f"{name:<14} {result['events']:>5} events  {result['throughput']:>6.2f} replies/s  "
+            f"errors {100 * result['error_rate']:.1f}%  "
+            f"reply p50/p95/p99 {reply['p50']}/{reply['p95']}/{reply['p99']} ms  ack p99 {ack['p99']} ms"
+        )
+        for stage, latency in sorted(result.get("stages", {}).items(), key=lambda item: -item[1]["mean_ms"]):
+            lines.append(f"    {stage:<22} {latency['count']:>6} x {latency['mean_ms']:>9.1f} ms")
+    return "\n".join(lines)
+
+
+COMPARED_METRICS = [
+    ("reply p50 ms", lambda r: r["reply_ms"]["p50"]),
+    ("reply p95 ms", lambda r: r["reply_ms"]["p95"]),
+    ("reply p99 ms", lambda r: r["reply_ms"]["p99"]),
+    ("ack p99 ms", lambda r: r["ack_ms"]["p99"]),
+    ("replies/s", lambda r: r["throughput"]),
+    ("error rate", lambda r: r["error_rate"]),
+]
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    """
+    Tabulate the change of each scenario's headline metrics between two results documents.
+    """
+    lines = [f"{old['git']['commit']} -> {new['git']['commit']}"]
+    for name, new_result in new["scenarios"].items():
+        old_result = old["scenarios"].get(name)
+        if old_result is None:
+            lines.append(f"{name}: not in the baseline")
+            continue
+        lines.append(name)
+        for label, metric in COMPARED_METRICS:
+            before, after = metric(old_result), metric(new_result)
+            change = f"{100 * (after - before) / before:+.1f}%" if before and after is not None else ""
+            lines.append(f"    {label:<14} {before!s:>10} -> {after!s:>10}  {change}")
+    return "\n".join(lines)
@@ -0,0 +1,151 @@
+"""
+Synthetic webhook traffic: Instagram and Messenger DMs and Instagram comments.
+"""
+
+import random
+import time
+from typing import Any, Dict, NamedTuple, Tuple
+
+# Account ids the benchmark tenant claims (see `runner.write_tenants`)
+INSTAGRAM_ACCOUNT_ID = "bench-ig"
+PAGE_ID = "bench-page"
+
+FAQ_QUESTIONS = [
+    "What time do you open on Monday?",
+    "What are your opening hours on Saturday?",
+    "When do you close on Friday?",
+]
+GENERAL_QUESTIONS = [
+    "Do you have any vegetarian dishes?",
+    "Can I bring my dog along?",
+    "Is there a dress code for dinner?",
+    "Do you do gift vouchers?",
+    "Are your steaks dry aged?",
+]
+BOOKING_REQUESTS = [
+    "Hi, could I book a table for 2 on Friday at 7pm?",
+    "I'd like to book for 4 people tomorrow evening",
+]
+COMMENT_QUESTIONS = [
+    "Do you take reservations for big groups?",
+    "Is this on the lunch menu?",
+    "What's the price of this one?",
+]
+
+
+class WebhookEvent(NamedTuple):
+    path: str
+    payload: Dict[str, Any]
+    # Recipient (DMs) or comment id the reply is sent to
+    reply_key: str
+
+
+class Scenario(NamedTuple):
+    name: str
+    description: str
+    # (event kind, weight) pairs, see EVENT_KINDS
+    mix: Tuple[Tuple[str, float], ...]
+    rate: float
+    duration: float
+    # Backend settings the scenario runs with
+    env: Dict[str, str] = {}
+
+
+def instagram_dm(sender_id: str, text: str, mid: str) -> WebhookEvent:
+    now = int(time.time() * 1000)
+    return WebhookEvent("/webhook", {
+        "object": "instagram",
+        "entry": [{
+            "id": INSTAGRAM_ACCOUNT_ID,
+            "time": now,
+            "messaging": [{
+                "sender": {"id": sender_id},
+                "recipient": {"id": INSTAGRAM_ACCOUNT_ID},
+                "timestamp": now,
+                "message": {"mid": mid, "text": text},
+            }],
+        }],
+    }, sender_id)
+
+
+def messenger_dm(sender_id: str, text: str, mid: str) -> WebhookEvent:
+    now = int(time.time() * 1000)
+    return WebhookEvent("/fb_webhook", {
+        "object": "page",
+        "entry": [{
+            "id": PAGE_ID,
+            "time": now,
+            "messaging": [{
+                "sender": {"id": sender_id},
+                "recipient": {"id": PAGE_ID},
+                "timestamp": now,
+                "message": {"mid": mid, "text": text},
+            }],
+        }],
+    }, sender_id)
+
+
+def instagram_comment(user_id: str, text: str, comment_id: str) -> WebhookEvent:
+    return WebhookEvent("/webhook", {
+        "object": "instagram",
+        "entry": [{
+            "id": INSTAGRAM_ACCOUNT_ID,
+            "time": int(time.time()),
+            "changes": [{
+                "field": "comments",
+                "value": {
+                    "id": comment_id,
+                    "text": text,
+                    "from": {"id": user_id, "username": f"user_{user_id}"},
+                    "media": {"id": "bench-media", "media_product_type": "FEED"},
+                },
+            }],
+        }],
+    }, comment_id)
+
+
+EVENT_KINDS = {
+    # Answered from the knowledge tables without an assistant run
+    "ig_dm_faq": lambda ref, rng: instagram_dm(f"{ref}-user", rng.choice(FAQ_QUESTIONS), f"{ref}-mid"),
+    "ig_dm": lambda ref, rng: instagram_dm(f"{ref}-user", rng.choice(GENERAL_QUESTIONS), f"{ref}-mid"),
+    # Runs with two tool rounds: check_availability, then a calendar insert through ACI
+    "ig_dm_booking": lambda ref, rng: instagram_dm(f"{ref}-user", rng.choice(BOOKING_REQUESTS), f"{ref}-mid"),
+    "fb_dm": lambda ref, rng: messenger_dm(f"{ref}-user", rng.choice(GENERAL_QUESTIONS), f"{ref}-mid"),
+    "ig_comment": lambda ref, rng: instagram_comment(f"{ref}-user", rng.choice(COMMENT_QUESTIONS), f"{ref}-comment"),
+}
+
+# Every event is a new conversation, so the answer cache would only measure itself
+NO_ANSWER_CACHE = {"ANSWER_CACHE_ENABLED": "false"}
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario("dm_fast_path", "Instagram DMs answered by the fast path", (("ig_dm_faq", 1.0),), 20, 30),
+        Scenario("dm_assistant", "Instagram DMs answered by an assistant run", (("ig_dm", 1.0),), 5, 30, NO_ANSWER_CACHE),
+        Scenario("dm_booking", "Instagram booking requests with tool calls and ACI", (("ig_dm_booking", 1.0),), 2, 30),
+        Scenario("messenger", "Messenger DMs answered by an assistant run", (("fb_dm", 1.0),), 5, 30, NO_ANSWER_CACHE),
+        Scenario("comments", "Instagram comment questions", (("ig_comment", 1.0),), 5, 30),
+        Scenario(
+            "mixed", "A mix of all of the above",
+            (("ig_dm", 0.4), ("ig_dm_faq", 0.2), ("ig_dm_booking", 0.1), ("fb_dm", 0.1), ("ig_comment", 0.2)),
+            10, 60, NO_ANSWER_CACHE
+        ),
+    ]
+}
+
+
+def generate_events(scenario: Scenario, run_ref: str, seed: int = 0):
+    """
+    Yield the scenario's events: `rate * duration` events drawn from its mix.
+    Every event comes from a new sender, so each reply can be matched to its event.
+
+    Args:
+        scenario: The scenario to generate.
+        run_ref: Prefix for sender, message and comment ids, unique per run.
+        seed: Seed for the event mix, so runs are repeatable.
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in scenario.mix]
+    weights = [weight for _, weight in scenario.mix]
+    for n in range(int(scenario.rate * scenario.duration)):
+        kind = rng.choices(kinds, weights)[0]
+        yield kind, EVENT_KINDS[kind](f"{run_ref}-{n}", rng)
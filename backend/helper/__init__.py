@@ -1,2 +1,7 @@
-from .ig_helper import load_access_token, send_instagram_message, reply_to_instagram_comment
+from .ig_helper import load_access_token, send_instagram_message, reply_to_instagram_comment, asend_instagram_message, areply_to_instagram_comment, send_instagram_sender_action
 from .fb_helper import FacebookApiClient
+from .http_client import HttpClient, http_client
+from .cache_helper import LRUCache
+from .sqlite_helper import connect_sqlite
+from .token_manager import TokenManager, token_manager, read_token_file, write_token_file, refresh_instagram_token
+from .metrics import metrics, MetricsRegistry, stage, observe_stage, bind, new_trace_id, current_trace_id, set_trace_labels, TraceIdFilter
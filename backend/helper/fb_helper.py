@@ -7,12 +7,14 @@ It handles authentication, request formatting, and error handling in a consisten
 """
 
 import os
-import requests
+import httpx
 import json
 import logging
 from typing import Dict, Any, Optional, Union
 from dotenv import load_dotenv
 
+from .http_client import http_client, FACEBOOK_GRAPH_URL
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,7 +29,7 @@ class FacebookApiClient:
     API_VERSION = "v21.0"
     
     # Base URLs for different API endpoints
-    GRAPH_API_BASE_URL = "https://graph.facebook.com"
+    GRAPH_API_BASE_URL = FACEBOOK_GRAPH_URL
     
     def __init__(self, access_token: Optional[str] = None):
         """
@@ -67,7 +69,7 @@ class FacebookApiClient:
     def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, 
                      data: Optional[Dict] = None) -> Dict[str, Any]:
         """
-        Make a request to the Facebook Graph API.
+        Make a request to the Facebook Graph API over the shared connection pool.
         
         Args:
             method: HTTP method (GET, POST, etc.)
@@ -79,39 +81,59 @@ class FacebookApiClient:
             Parsed JSON response
             
         Raises:
-            requests.exceptions.RequestException: If the request fails
+            httpx.HTTPError: If the request fails
         """
-        # Ensure access token is included in params
-        params = params or {}
-        if 'access_token' not in params:
-            params['access_token'] = self.access_token
-            
-        url = self._build_url(endpoint)
+        url, params = self._prepare_request(endpoint, params)
         
         try:
             logger.debug(f"Making {method} request to {url}")
-            response = requests.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                params=params,
-                json=data
-            )
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
+            response = http_client.request(method, url, headers=self.headers, params=params, json=data)
+            return self._parse_response(response)
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {str(e)}")
+            raise
+
+    async def _amake_request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                             data: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Async version of `_make_request`.
+        
+        Raises:
+            httpx.HTTPError: If the request fails
+        """
+        url, params = self._prepare_request(endpoint, params)
+        
+        try:
+            logger.debug(f"Making {method} request to {url}")
+            response = await http_client.arequest(method, url, headers=self.headers, params=params, json=data)
+            return self._parse_response(response)
+        except httpx.HTTPError as e:
             logger.error(f"Request failed: {str(e)}")
-            # If we got a JSON response with an error, include it in the exception
-            if hasattr(response, 'json'):
-                try:
-                    error_data = response.json()
-                    if 'error' in error_data:
-                        logger.error(f"API error: {error_data['error']}")
-                except ValueError:
-                    # Response wasn't valid JSON
-                    pass
             raise
+
+    def _prepare_request(self, endpoint: str, params: Optional[Dict]):
+        """
+        Build the URL and query parameters, ensuring the access token is included.
+        """
+        params = params or {}
+        if 'access_token' not in params:
+            params['access_token'] = self.access_token
+        return self._build_url(endpoint), params
+
+    def _parse_response(self, response: httpx.Response) -> Dict[str, Any]:
+        """
+        Return the parsed JSON body, logging API errors before raising for non-2xx statuses.
+        """
+        if response.is_error:
+            try:
+                error_data = response.json()
+                if 'error' in error_data:
+                    logger.error(f"API error: {error_data['error']}")
+            except ValueError:
+                # Response wasn't valid JSON
+                pass
+        response.raise_for_status()
+        return response.json()
     
     def get_page_posts(self, page_id: str, fields: Optional[str] = None, limit: int = 25) -> Dict[str, Any]:
         """
@@ -138,7 +160,8 @@ class FacebookApiClient:
         logger.info(f"Retrieved {len(response.get('data', []))} posts from page {page_id}")
         return response
     
-    def send_message(self, recipient_id: str, message_text: str, messaging_type: str = "RESPONSE") -> Optional[Dict[str, Any]]:
+    def send_message(self, recipient_id: str, message_text: str, messaging_type: str = "RESPONSE",
+                     raise_errors: bool = False) -> Optional[Dict[str, Any]]:
         """
         Send a text message to a user via the Facebook Messaging API.
         
@@ -146,27 +169,71 @@ class FacebookApiClient:
             recipient_id: The ID of the recipient
             message_text: The text content of the message
             messaging_type: The messaging type (RESPONSE, UPDATE, MESSAGE_TAG)
+            raise_errors: Raise failures instead of returning None, e.g. so a scheduler can retry them
             
         Returns:
             JSON response if successful, None if failed
         """
         endpoint = "me/messages"
-        
-        data = {
-            "recipient": {"id": recipient_id},
-            "message": {"text": message_text},
-            "messaging_type": messaging_type
-        }
+        data = self._message_payload(recipient_id, message_text, messaging_type)
         
         try:
             response = self._make_request("POST", endpoint, data=data)
             logger.info(f"Message sent to recipient {recipient_id}")
             return response
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Failed to send message: {str(e)}")
+            if raise_errors:
+                raise
             return None
 
+    async def asend_message(self, recipient_id: str, message_text: str, messaging_type: str = "RESPONSE") -> Optional[Dict[str, Any]]:
+        """
+        Async version of `send_message`.
+        """
+        endpoint = "me/messages"
+        data = self._message_payload(recipient_id, message_text, messaging_type)
+        
+        try:
+            response = await self._amake_request("POST", endpoint, data=data)
+            logger.info(f"Message sent to recipient {recipient_id}")
+            return response
+            
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to send message: {str(e)}")
+            return None
+
+    def send_sender_action(self, recipient_id: str, action: str = "typing_on") -> Optional[Dict[str, Any]]:
+        """
+        Send a sender action (typing_on, typing_off, mark_seen) to a user.
+        
+        Args:
+            recipient_id: The ID of the recipient
+            action: The sender action
+            
+        Returns:
+            JSON response if successful, None if failed
+        """
+        data = {
+            "recipient": {"id": recipient_id},
+            "sender_action": action
+        }
+        
+        try:
+            return self._make_request("POST", "me/messages", data=data)
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to send sender action: {str(e)}")
+            return None
+
+    @staticmethod
+    def _message_payload(recipient_id: str, message_text: str, messaging_type: str) -> Dict[str, Any]:
+        return {
+            "recipient": {"id": recipient_id},
+            "message": {"text": message_text},
+            "messaging_type": messaging_type
+        }
+
     def pretty_print_response(self, response_data: Dict[str, Any], label: str = "API Response"):
         """
         Pretty print an API response for debugging purposes.
@@ -0,0 +1,332 @@
+"""
+Shared HTTP client for the Graph/Instagram APIs.
+
+Every helper goes through one pooled, keep-alive connection pool (sync and
+async), so outbound calls reuse TCP+TLS connections. Throttled (429) and
+server error (5xx) responses are retried with exponential backoff that honours
+Meta's rate limit headers. Sends (POST) are only retried when they provably
+weren't processed: a throttled response or a connection that never opened.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10.0))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+# Overridable so the benchmark can point the helpers at local stand-ins
+FACEBOOK_GRAPH_URL = os.getenv("FACEBOOK_GRAPH_URL", "https://graph.facebook.com").rstrip("/")
+INSTAGRAM_GRAPH_URL = os.getenv("INSTAGRAM_GRAPH_URL", "https://graph.instagram.com").rstrip("/")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Set by callers that retry on their own (e.g. the outbound scheduler) for the requests they make
+max_retries_override: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("http_retry_limit", default=None)
+# Graph API error codes for application/user/page-level throttling
+THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80001, 80002, 80006}
+
+
+def _usage_delay(headers: httpx.Headers) -> Optional[float]:
+    """
+    Read Meta's usage headers and return how long to wait before retrying, if they say so.
+    """
+    business_usage = headers.get("x-business-use-case-usage")
+    if business_usage:
+        try:
+            minutes = max(
+                usage.get("estimated_time_to_regain_access", 0)
+                for usages in json.loads(business_usage).values()
+                for usage in usages
+            )
+            if minutes:
+                return 60.0 * minutes
+        except (ValueError, AttributeError, TypeError):
+            pass
+
+    for header in ("x-app-usage", "x-page-usage"):
+        usage = headers.get(header)
+        if not usage:
+            continue
+        try:
+            if max(json.loads(usage).values()) >= 100:
+                # Usage is computed over a rolling hour; back off for a while
+                return 60.0
+        except (ValueError, AttributeError, TypeError):
+            pass
+    return None
+
+
+def never_sent(error: Exception) -> bool:
+    # The request never reached the server, so a retry can't repeat it
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+def _is_throttled(response: httpx.Response) -> bool:
+    if response.status_code == 429:
+        return True
+    if response.status_code not in (400, 403):
+        return False
+    try:
+        return response.json().get("error", {}).get("code") in THROTTLE_ERROR_CODES
+    except ValueError:
+        return False
+
+
+class HttpClient:
+    """
+    A pooled HTTP client with retry and backoff, usable from threads and coroutines.
+    """
+
+    def __init__(self, max_connections: int = HTTP_MAX_CONNECTIONS, max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                 timeout: float = HTTP_TIMEOUT, max_retries: int = HTTP_MAX_RETRIES,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        """
+        Initialize the client. Connections are opened lazily.
+
+        Args:
+            max_connections: Maximum concurrent connections per pool.
+            max_keepalive: Maximum idle keep-alive connections per pool.
+            timeout: Request timeout in seconds.
+            max_retries: Retries after the first attempt for retryable failures.
+            backoff_base: Delay before the first retry; doubles on each retry.
+            backoff_max: Upper bound for any single delay.
+        """
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_clients: Dict[int, httpx.AsyncClient] = {}
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(limits=self.limits, timeout=self.timeout)
+        return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # An AsyncClient is bound to the event loop it was first used on
+        loop_id = id(asyncio.get_running_loop())
+        client = self._async_clients.get(loop_id)
+        if client is None:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self._async_clients[loop_id] = client
+        return client
+
+    def _retry_delay(self, method: str, response: Optional[httpx.Response], attempt: int,
+                     error: Optional[httpx.TransportError] = None) -> Optional[float]:
+        """
+        Decide whether to retry and how long to wait first.
+
+        A non-idempotent request (e.g. a POST that sends a message) is only retried
+        if it was throttled or never reached the server; after a read timeout or a
+        5xx it may have been processed, and a retry would send it twice.
+
+        Returns:
+            float: Seconds to wait, or None if the request should not be retried.
+        """
+        max_retries = max_retries_override.get()
+        if attempt >= (self.max_retries if max_retries is None else max_retries):
+            return None
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        if error is not None and not idempotent and not never_sent(error):
+            return None
+        if response is not None:
+            throttled = _is_throttled(response)
+            if throttled:
+                self.throttled += 1
+            elif response.status_code not in RETRY_STATUS_CODES or not idempotent:
+                return None
+
+            retry_after = response.headers.get("retry-after")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+            usage_delay = _usage_delay(response.headers)
+            if usage_delay is not None:
+                return min(usage_delay, self.backoff_max)
+
+        backoff = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return backoff * random.uniform(0.5, 1.0)
+
+    @contextmanager
+    def retry_limit(self, max_retries: int) -> Iterator[None]:
+        """
+        Override `max_retries` for the requests made inside the block by this thread or task.
+        """
+        token = max_retries_override.set(max_retries)
+        try:
+            yield
+        finally:
+            max_retries_override.reset(token)
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request from synchronous code, retrying throttled and failed attempts.
+
+        Args:
+            method: HTTP method.
+            url: Absolute URL.
+            **kwargs: Passed to `httpx.Client.request` (params, json, headers, ...).
+
+        Returns:
+            httpx.Response: The final response. Callers check the status.
+
+        Raises:
+            httpx.TransportError: If the request still fails at the network level after all retries.
+        """
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                response = self.sync_client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = self._retry_delay(method, None, attempt, e)
+                if delay is None:
+                    self.errors += 1
+                    raise
+                logger.warning(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                delay = self._retry_delay(method, response, attempt)
+                if delay is None:
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request from async code, retrying throttled and failed attempts.
+
+        Args:
+            method: HTTP method.
+            url: Absolute URL.
+            **kwargs: Passed to `httpx.AsyncClient.request` (params, json, headers, ...).
+
+        Returns:
+            httpx.Response: The final response. Callers check the status.
+
+        Raises:
+            httpx.TransportError: If the request still fails at the network level after all retries.
+        """
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                response = await self.async_client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = self._retry_delay(method, None, attempt, e)
+                if delay is None:
+                    self.errors += 1
+                    raise
+                logger.warning(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                delay = self._retry_delay(method, response, attempt)
+                if delay is None:
+                    return response
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def download(self, url: str, path: str, chunk_size: int = 1 << 16, **kwargs) -> int:
+        """
+        Stream a response body to a file without holding it in memory, retrying
+        like `request`. The file is overwritten on every attempt.
+
+        Args:
+            url: Absolute URL.
+            path: File to write the body to.
+            chunk_size: Bytes written per chunk.
+            **kwargs: Passed to `httpx.Client.stream` (params, headers, ...).
+
+        Returns:
+            int: The number of bytes written.
+
+        Raises:
+            httpx.HTTPStatusError: If the final response is not successful.
+            httpx.TransportError: If the request still fails at the network level after all retries.
+        """
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                with self.sync_client.stream("GET", url, **kwargs) as response:
+                    if response.is_success:
+                        written = 0
+                        with open(path, "wb") as f:
+                            for chunk in response.iter_bytes(chunk_size):
+                                f.write(chunk)
+                                written += len(chunk)
+                        return written
+                    # Error bodies are small; read it so throttling codes can be inspected
+                    response.read()
+                    delay = self._retry_delay("GET", response, attempt)
+                    if delay is None:
+                        self.errors += 1
+                        response.raise_for_status()
+                    logger.warning(f"GET {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            except httpx.TransportError as e:
+                delay = self._retry_delay("GET", None, attempt, e)
+                if delay is None:
+                    self.errors += 1
+                    raise
+                logger.warning(f"GET {url} failed ({e}), retrying in {delay:.2f}s")
+            self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        """
+        Close the synchronous connection pool.
+        """
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def aclose(self):
+        """
+        Close the async connection pool of the running event loop.
+        """
+        client = self._async_clients.pop(id(asyncio.get_running_loop()), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get request, retry and throttling counters.
+        """
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+
+http_client = HttpClient()
@@ -1,57 +1,121 @@
 import json
-import requests
+import logging
 from dotenv import load_dotenv
-import os
+
+from .http_client import http_client, FACEBOOK_GRAPH_URL, INSTAGRAM_GRAPH_URL
+from .token_manager import read_token_file
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 IG_TOKEN_PATH = "ig_token.json"
-INSTAGRAM_API_URL = "https://graph.instagram.com/v21.0/me/messages"
+INSTAGRAM_API_URL = f"{INSTAGRAM_GRAPH_URL}/v21.0/me/messages"
+GRAPH_API_URL = f"{FACEBOOK_GRAPH_URL}/v21.0"
 
 def load_access_token(path=IG_TOKEN_PATH):
     """
-    Load the Instagram access token from a JSON file.
+    Load the Instagram access token from a JSON file. Hot paths should use
+    `token_manager`, which keeps it in memory and refreshes it.
     """
-    with open(path, "r") as f:
-        return json.load(f)["access_token"]
+    return read_token_file(path)[0]
+
+def _instagram_message_request(user_access_token, recipient_id, message_text):
+    headers = {
+        "Authorization": f"Bearer {user_access_token}",
+        "Content-Type": "application/json"
+    }
+    json_body = {
+        "recipient": {"id": recipient_id},
+        "message": {"text": message_text}
+    }
+    return {"headers": headers, "json": json_body}
+
+def _comment_reply_request(comment_id, message_text, access_token):
+    if not access_token:
+        # Each page replies with its own token; there is deliberately no process-wide fallback
+        raise ValueError("A page access token is required to reply to a comment")
+    url = f"{GRAPH_API_URL}/{comment_id}/replies"
+
+    payload = {
+        "message": message_text,
+        "access_token":access_token
+    }
+
+    # Notice we're using params instead of data here
+    return url, {"params": payload}
 
 def send_instagram_message(user_access_token, recipient_id, message_text):
     """
     Send a text message to an Instagram user via the Messaging API.
+
+    Raises:
+        httpx.HTTPStatusError: If the API rejects the message.
+    """
+    response = http_client.request("POST", INSTAGRAM_API_URL,
+                                   **_instagram_message_request(user_access_token, recipient_id, message_text))
+    # Surface failures (throttling included) before parsing, as error bodies may not be JSON
+    response.raise_for_status()
+    data = response.json()
+    logger.debug(f"Message send response: {json.dumps(data)}")
+    return data
+
+async def asend_instagram_message(user_access_token, recipient_id, message_text):
     """
+    Async version of `send_instagram_message`.
+    """
+    response = await http_client.arequest("POST", INSTAGRAM_API_URL,
+                                          **_instagram_message_request(user_access_token, recipient_id, message_text))
+    response.raise_for_status()
+    data = response.json()
+    logger.debug(f"Message send response: {json.dumps(data)}")
+    return data
 
+def send_instagram_sender_action(user_access_token, recipient_id, action="typing_on"):
+    """
+    Send a sender action (typing_on, typing_off, mark_seen) to an Instagram user.
+    """
     headers = {
         "Authorization": f"Bearer {user_access_token}",
         "Content-Type": "application/json"
     }
     json_body = {
         "recipient": {"id": recipient_id},
-        "message": {"text": message_text}
+        "sender_action": action
     }
+    response = http_client.request("POST", INSTAGRAM_API_URL, headers=headers, json=json_body)
+    response.raise_for_status()
+    return response.json()
 
-    response = requests.post(INSTAGRAM_API_URL, headers=headers, json=json_body)
+def reply_to_instagram_comment(comment_id, message_text, access_token):
+    """
+    Reply to an Instagram comment using the Facebook Graph API.
+
+    Args:
+        comment_id (str): The comment to reply to.
+        message_text (str): The reply.
+        access_token (str): The access token of the page the comment belongs to.
+
+    Raises:
+        ValueError: If no access token is given.
+        httpx.HTTPStatusError: If the API rejects the reply.
+    """
+    url, request = _comment_reply_request(comment_id, message_text, access_token)
+    response = http_client.request("POST", url, **request)
+    response.raise_for_status()
     data = response.json()
-    print("\n📨 Message Send Response:")
-    print(json.dumps(data, indent=4))
+    logger.debug(f"Comment reply response: {json.dumps(data)}")
+    
     return data
 
-def reply_to_instagram_comment(comment_id, message_text, access_token=None):
+async def areply_to_instagram_comment(comment_id, message_text, access_token):
     """
-    Reply to an Instagram comment using the Facebook Graph API.
+    Async version of `reply_to_instagram_comment`.
     """
-    
-    access_token = os.getenv("FACEBOOK_ACCESS_TOKEN")
-        
-    url = f"https://graph.facebook.com/v21.0/{comment_id}/replies"
-    
-    payload = {
-        "message": message_text,
-        "access_token":access_token
-    }
-    
-    # Notice we're using params instead of data here
-    response = requests.post(url, params=payload)
+    url, request = _comment_reply_request(comment_id, message_text, access_token)
+    response = await http_client.arequest("POST", url, **request)
+    response.raise_for_status()
     data = response.json()
-    print(json.dumps(data, indent=4))
-    
-    return data
\ No newline at end of file
+    logger.debug(f"Comment reply response: {json.dumps(data)}")
+
+    return data
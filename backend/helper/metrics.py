@@ -0,0 +1,231 @@
+"""
+In-process metrics in the Prometheus text format, and per-event trace ids.
+
+Stages of the reply pipeline are timed with `stage(...)`, which records a
+latency histogram labeled by stage, channel, assistant and outcome. Channel,
+assistant and trace id come from the current trace context, which `bind`
+carries from the webhook request onto the worker that handles the event.
+"""
+
+import bisect
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# Trace id, channel, assistant and conversation of the webhook event being handled
+trace_context: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("trace_context", default={})
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (the last one is +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    A gauge read from a callback when metrics are scraped, e.g. a queue depth.
+    The callback returns a number, or a dict of label value tuples to numbers.
+    """
+
+    def __init__(self, name: str, help: str, callback: Callable[[], Any], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Gauge {self.name} failed: {e}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {float(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics and renders them for `/metrics`.
+    """
+
+    def __init__(self, namespace: str = "concierge"):
+        self.namespace = namespace
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module reloaded) returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, callback: Callable[[], Any], labelnames: Sequence[str] = ()) -> Gauge:
+        with self._lock:
+            # Callbacks may be replaced, e.g. when the app is recreated
+            gauge = self._metrics[f"{self.namespace}_{name}"] = Gauge(
+                f"{self.namespace}_{name}", help, callback, labelnames
+            )
+        return gauge
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_LATENCY = metrics.histogram(
+    "stage_latency_seconds", "Latency of reply pipeline stages.", ("stage", "channel", "assistant", "outcome")
+)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id() -> Optional[str]:
+    return trace_context.get().get("trace_id")
+
+
+def set_trace_labels(**labels: str):
+    """
+    Add labels (e.g. `assistant="concierge"`) to the current trace context.
+    """
+    trace_context.set({**trace_context.get(), **labels})
+
+
+def bind(func: Callable, **context: str) -> Callable:
+    """
+    Wrap `func` so it runs inside a trace context with the given trace id and
+    labels, wherever it is executed (worker thread, executor, ...).
+    """
+    def traced(*args, **kwargs):
+        token = trace_context.set(dict(context))
+        try:
+            return func(*args, **kwargs)
+        finally:
+            trace_context.reset(token)
+
+    traced.__name__ = getattr(func, "__name__", "traced")
+    return traced
+
+
+def observe_stage(name: str, seconds: float, outcome: str = "ok"):
+    """
+    Record the latency of a stage that was timed elsewhere.
+    """
+    context = trace_context.get()
+    STAGE_LATENCY.observe(
+        seconds, stage=name, channel=context.get("channel", "none"),
+        assistant=context.get("assistant", "none"), outcome=outcome,
+    )
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block as a pipeline stage. The outcome is "error" if the block raises.
+    """
+    started = time.monotonic()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        observe_stage(name, time.monotonic() - started, outcome)
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Prefixes log messages emitted while handling a webhook event with its trace id.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        record.trace_id = trace_id or "-"
+        if trace_id and not getattr(record, "_traced", False):
+            record.msg = f"[{trace_id}] {record.msg}"
+            record._traced = True
+        return True
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database tuned for being shared by several worker processes.
+
+    WAL mode lets readers run alongside a writer, and the busy timeout makes
+    concurrent writers wait for each other instead of failing.
+
+    Args:
+        path: Path to the database file. Parent directories are created if needed.
+
+    Returns:
+        sqlite3.Connection: An autocommit connection usable from any thread
+        (callers serialise access with their own lock).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
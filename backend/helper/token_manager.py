@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .http_client import http_client, INSTAGRAM_GRAPH_URL
+
+logger = logging.getLogger(__name__)
+
+IG_REFRESH_URL = f"{INSTAGRAM_GRAPH_URL}/refresh_access_token"
+# Long-lived Instagram tokens last 60 days; refresh them once less than this is left
+IG_TOKEN_REFRESH_MARGIN = float(os.getenv("IG_TOKEN_REFRESH_MARGIN", 10 * 24 * 3600))
+IG_TOKEN_CHECK_INTERVAL = float(os.getenv("IG_TOKEN_CHECK_INTERVAL", 3600))
+
+
+def read_token_file(path: str) -> Tuple[str, Optional[float]]:
+    """
+    Read an access token file as written by `ig_oauth.py`.
+
+    Returns:
+        tuple: The token and its expiry as a UNIX timestamp (None if the file has none).
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    expires_at = data.get("expires_at")
+    if expires_at:
+        parsed = datetime.fromisoformat(expires_at)
+        if parsed.tzinfo is None:
+            # ig_oauth.py writes naive UTC times
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return data["access_token"], parsed.timestamp()
+    return data["access_token"], None
+
+
+def write_token_file(path: str, token: str, expires_at: Optional[float]):
+    """
+    Write an access token file atomically, so readers never see a partial file.
+    """
+    data = {"access_token": token}
+    if expires_at is not None:
+        data["expires_at"] = datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None).isoformat()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def refresh_instagram_token(token: str) -> Tuple[str, float]:
+    """
+    Exchange a long-lived Instagram token for a new one with a fresh 60-day lifetime.
+
+    Returns:
+        tuple: The new token and its expiry as a UNIX timestamp.
+
+    Raises:
+        RuntimeError: If the refresh is rejected.
+    """
+    response = http_client.request("GET", IG_REFRESH_URL, params={
+        "grant_type": "ig_refresh_token",
+        "access_token": token,
+    })
+    data = response.json()
+    if response.status_code != 200 or "access_token" not in data:
+        raise RuntimeError(f"Instagram token refresh failed: {data}")
+    return data["access_token"], time.time() + float(data["expires_in"])
+
+
+class _Entry:
+    def __init__(self, path: Optional[str], token: Optional[str], expires_at: Optional[float], refreshable: bool):
+        self.path = path
+        self.token = token
+        self.expires_at = expires_at
+        self.refreshable = refreshable
+        self.file_mtime: Optional[float] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+
+class TokenManager:
+    """
+    Keeps access tokens of any number of accounts in memory.
+
+    Hot-path reads are a dict lookup. Tokens backed by a file are read on first
+    use and re-read only when the file changes (checked in the background).
+    Refreshable tokens are exchanged for new ones with `ig_refresh_token` once
+    they are within `refresh_margin` of expiring, and the new token is written
+    back to its file atomically.
+    """
+
+    def __init__(self, refresh_margin: float = IG_TOKEN_REFRESH_MARGIN,
+                 check_interval: float = IG_TOKEN_CHECK_INTERVAL,
+                 refresh_fn: Callable[[str], Tuple[str, float]] = refresh_instagram_token):
+        """
+        Initialize the manager.
+
+        Args:
+            refresh_margin: Seconds before expiry at which a token is refreshed.
+            check_interval: Seconds between background checks.
+            refresh_fn: Exchanges a token for a new one and its expiry.
+        """
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.refresh_fn = refresh_fn
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.RLock()
+
+    def register_file(self, account: str, path: str, refreshable: bool = True):
+        """
+        Serve an account's token from a token file. The file is read on first use.
+        """
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None or entry.path != path:
+                self._entries[account] = _Entry(path, None, None, refreshable)
+
+    def register(self, account: str, token: str, expires_at: Optional[float] = None):
+        """
+        Serve a fixed token for an account, e.g. a page token from the environment.
+        """
+        with self._lock:
+            self._entries[account] = _Entry(None, token, expires_at, refreshable=False)
+
+    def __contains__(self, account: str) -> bool:
+        return account in self._entries
+
+    def _load(self, entry: _Entry):
+        mtime = os.path.getmtime(entry.path)
+        entry.token, entry.expires_at = read_token_file(entry.path)
+        entry.file_mtime = mtime
+
+    def get(self, account: str) -> str:
+        """
+        Get an account's current token.
+
+        Raises:
+            KeyError: If the account is not registered.
+            FileNotFoundError: If its token file doesn't exist.
+        """
+        entry = self._entries[account]
+        token = entry.token
+        if token is None:
+            with self._lock:
+                if entry.token is None:
+                    self._load(entry)
+                token = entry.token
+        return token
+
+    def refresh(self, account: str) -> str:
+        """
+        Refresh an account's token now and persist it to its file.
+
+        Returns:
+            str: The new token.
+        """
+        with self._lock:
+            entry = self._entries[account]
+            token = self.get(account)
+            try:
+                entry.token, entry.expires_at = self.refresh_fn(token)
+            except Exception as e:
+                entry.failures += 1
+                entry.last_error = str(e)
+                raise
+            entry.refreshes += 1
+            entry.last_error = None
+            if entry.path:
+                write_token_file(entry.path, entry.token, entry.expires_at)
+                entry.file_mtime = os.path.getmtime(entry.path)
+            logger.info(
+                f"Refreshed access token of {account}, valid until "
+                f"{datetime.fromtimestamp(entry.expires_at, timezone.utc).isoformat()}"
+            )
+            return entry.token
+
+    def check(self):
+        """
+        Pick up token files changed by another process or the OAuth flow, and
+        refresh tokens that are about to expire.
+        """
+        with self._lock:
+            accounts = list(self._entries.items())
+        now = time.time()
+        for account, entry in accounts:
+            try:
+                if entry.path and os.path.exists(entry.path) and os.path.getmtime(entry.path) != entry.file_mtime:
+                    with self._lock:
+                        self._load(entry)
+                if not entry.refreshable or entry.token is None or entry.expires_at is None:
+                    continue
+                if entry.expires_at <= now:
+                    logger.error(f"Access token of {account} expired; rerun ig_oauth.py to authorize again")
+                elif entry.expires_at - now <= self.refresh_margin:
+                    self.refresh(account)
+            except Exception as e:
+                logger.warning(f"Could not check access token of {account}: {e}")
+
+    async def run(self):
+        """
+        Check the tokens every `check_interval` seconds until cancelled.
+        """
+        while True:
+            await asyncio.to_thread(self.check)
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the expiry and refresh state of every account (never the tokens themselves).
+        """
+        now = time.time()
+        with self._lock:
+            return {
+                account: {
+                    "loaded": entry.token is not None,
+                    "refreshable": entry.refreshable,
+                    "expires_in_days": (
+                        round((entry.expires_at - now) / 86400, 1) if entry.expires_at is not None else None
+                    ),
+                    "refreshes": entry.refreshes,
+                    "failures": entry.failures,
+                    "last_error": entry.last_error,
+                }
+                for account, entry in self._entries.items()
+            }
+
+
+token_manager = TokenManager()
@@ -1,12 +1,15 @@
 import json
 import os
+import time
 import urllib.parse
 import webbrowser
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Union
 
 import requests
 
+from helper import refresh_instagram_token, write_token_file
+
 # Constants
 TOKEN_PATH = 'ig_token.json'
 CONFIG_PATH = 'cwdchat_config.json'
@@ -158,17 +161,33 @@ class InstagramAuth:
             expires_in: Token expiration time in seconds.
             token_path: Path where the token should be saved.
         """
-        expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-        data = {
-            "access_token": token,
-            "expires_at": expires_at.isoformat()
-        }
-        
-        with open(token_path, 'w') as f:
-            json.dump(data, f, indent=4)
-            
+        # Written atomically: the running server may be reading or refreshing it
+        write_token_file(token_path, token, time.time() + expires_in)
+
         print(f"✅ Saved access token to {token_path}")
 
+    def refresh_token(self, token_path: str = TOKEN_PATH) -> Optional[str]:
+        """
+        Exchange the saved long-lived token for a new one valid for another 60 days.
+
+        Args:
+            token_path: Path to the token file.
+
+        Returns:
+            The new access token, or None if there is no valid token to refresh.
+        """
+        token = self.load_token(token_path)
+        if not token:
+            return None
+        try:
+            new_token, expires_at = refresh_instagram_token(token)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return None
+        write_token_file(token_path, new_token, expires_at)
+        print(f"✅ Refreshed access token in {token_path}")
+        return new_token
+
     def load_token(self, token_path: str = TOKEN_PATH) -> Optional[str]:
         """
         Load and validate an access token from a file.
@@ -1,56 +1,190 @@
+from startup import Lazy, startup_timer
+
 import os
+import sys
 import json
+import time
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 import logging
-from vector_database import RAGSystem
-from openai import OpenAI
+from openai import NotFoundError, OpenAI
 
-from ai_agent import create_assistant, get_or_create_thread, comment_reply_assistant
-from helper import load_access_token, send_instagram_message, FacebookApiClient, reply_to_instagram_comment
+from ai_agent import (
+    get_or_create_thread, run_assistant, stream_assistant, record_exchange, thread_store, run_context, assistant_tools,
+    SemanticAnswerCache, is_cacheable, IGNORE, CANNED, NEEDS_LLM, ThreadCompactor
+)
+from pipeline import (
+    WorkerPool, KeyedScheduler, WebhookBatch, OutboundScheduler, PRIORITY_COMMENT, create_dedup_store, event_key,
+    WebhookInbox, INBOX_ENABLED
+)
+from vector_database import HashingEmbedder, OpenAIEmbedder, vector_store_resolver
+from helper import (
+    http_client, token_manager, metrics, stage, bind, new_trace_id, set_trace_labels, TraceIdFilter
+)
+from tenants import Tenant, TenantRegistry, load_tenant_configs
 
 from aipolabs import ACI
 
-aci = ACI()
-
-LINKED_ACCOUNT_OWNER_ID = os.getenv("LINKED_ACCOUNT_OWNER_ID", "")
-if not LINKED_ACCOUNT_OWNER_ID:
-    raise ValueError("LINKED_ACCOUNT_OWNER_ID is not set")
+startup_timer.mark("imports")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Log lines written while handling a webhook event carry its trace id
+for handler in logging.getLogger().handlers:
+    handler.addFilter(TraceIdFilter())
 logger = logging.getLogger(__name__)
 
-user_access_token_ig = load_access_token()
-
 load_dotenv()
 # Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') # requires OpenAI Realtime API Access
 PORT = int(os.getenv('PORT', 5050))
-rag = RAGSystem(vector_store_name="Restaurant Details")
-vector_store_id = rag.get_vector_store_id()
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 8))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+# Answer from the in-process knowledge index instead of the hosted file_search tool
+LOCAL_RETRIEVAL = os.getenv('LOCAL_RETRIEVAL', 'true').lower() == 'true'
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', 3))
+# "stream" dispatches replies as soon as the message completes; "poll" waits for the run
+ASSISTANT_RUN_MODE = os.getenv('ASSISTANT_RUN_MODE', 'stream')
+# Reuse answers to repeated standalone questions instead of running the assistant
+ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', 0.9))
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 1000))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', 6 * 3600))
+ANSWER_CACHE_EMBEDDER = os.getenv('ANSWER_CACHE_EMBEDDER', 'hashing')
+# Answer hours/address/price lookups from the parsed knowledge files
+FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true'
+# Classify comments locally and only send questions and complaints to the assistant
+COMMENT_FILTER_ENABLED = os.getenv('COMMENT_FILTER_ENABLED', 'true').lower() == 'true'
+# Post comment replies publicly (rate limited behind DM replies); off only logs them
+REPLY_TO_COMMENTS = os.getenv('REPLY_TO_COMMENTS', 'false').lower() == 'true'
 LINKED_ACCOUNT_OWNER_ID = os.getenv("LINKED_ACCOUNT_OWNER_ID")
 if not LINKED_ACCOUNT_OWNER_ID:
     raise ValueError("LINKED_ACCOUNT_OWNER_ID is not set")
+if not OPENAI_API_KEY:
+  raise ValueError('Missing the OpenAI API key. Please set it in the .env file.') 
 OPENAI_CLIENT = OpenAI(api_key= OPENAI_API_KEY)
 
-client = FacebookApiClient()
+# Network-backed clients and assistants are created on first use; the warm-up
+# below resolves them concurrently in the background once the server is up
+aci = Lazy(ACI, "aci_client")
+answer_cache_embedder = OpenAIEmbedder(OPENAI_CLIENT) if ANSWER_CACHE_EMBEDDER == "openai" else HashingEmbedder()
 
+def create_answer_cache(version_fn):
+    """
+    Create a tenant's answer cache, invalidated when `version_fn`'s knowledge fingerprint changes.
+    """
+    return SemanticAnswerCache(
+        embedder=answer_cache_embedder,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        max_size=ANSWER_CACHE_SIZE,
+        ttl=ANSWER_CACHE_TTL,
+        version_fn=version_fn,
+    )
 
-SHOW_TIMING_MATH = False
-app = FastAPI()
-if not OPENAI_API_KEY:
-  raise ValueError('Missing the OpenAI API key. Please set it in the .env file.') 
+# Outbound sends are rate limited per page/Instagram account, DM replies first
+outbound = OutboundScheduler()
 
-assistant = create_assistant()
-comment_assistant = comment_reply_assistant()
+# Each restaurant gets its own assistants, knowledge, caches and tools; webhook
+# entries are routed to them by page or Instagram account id
+tenants = TenantRegistry(
+    load_tenant_configs(),
+    factory=lambda config: Tenant(config, OPENAI_CLIENT, aci, create_answer_cache, outbound),
+)
+# Long threads are rolled over into a fresh, summary-seeded thread
+thread_compactor = ThreadCompactor(OPENAI_CLIENT, thread_store)
+
+# Webhook events are acknowledged immediately and processed by these workers
+worker_pool = WorkerPool(num_workers=WEBHOOK_WORKERS, max_queue_size=WEBHOOK_QUEUE_SIZE, name="webhook")
+# Events for the same sender share an OpenAI thread, so they must run one at a time
+scheduler = KeyedScheduler(worker_pool)
+# Meta redelivers webhooks it thinks we missed; each event is only processed once
+dedup_store = create_dedup_store()
+# Accepted events are written to disk before Meta gets its 200, so a crash doesn't lose them
+inbox = WebhookInbox() if INBOX_ENABLED else None
+
+webhook_events = metrics.counter("webhook_events_total", "Webhook events by channel and outcome.", ("channel", "outcome"))
+metrics.gauge("webhook_queue_depth", "Webhook events waiting for a worker.", lambda: worker_pool.stats()["queue_depth"])
+metrics.gauge("webhook_busy_workers", "Workers handling a webhook event.", lambda: worker_pool.stats()["busy_workers"])
+metrics.gauge(
+    "outbound_queue_depth", "Sends waiting for their account's rate limit.",
+    lambda: {(account,): state["queue_depth"] for account, state in outbound.stats()["accounts"].items()},
+    ("account",)
+)
+metrics.gauge(
+    "outbound_throttled", "Sends the Graph API throttled, per account.",
+    lambda: {(account,): state["throttled"] for account, state in outbound.stats()["accounts"].items()},
+    ("account",)
+)
+
+async def warm_up():
+    """
+    Resolve the lazy clients and assistants concurrently, then log the startup timing breakdown.
+    """
+    # Only the default tenant is warmed; the others initialize on their first event
+    tenant = tenants.default
+    results = await asyncio.gather(
+        *(asyncio.to_thread(lazy.get) for lazy in [aci] + tenant.lazies),
+        asyncio.to_thread(lambda: tenant.fast_path.tables),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Startup warm-up failed: {result}")
+    startup_timer.mark("warm")
+    startup_timer.log_report()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await worker_pool.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    # Long-lived Instagram tokens are refreshed in the background before they expire
+    token_refresh_task = asyncio.create_task(token_manager.run())
+    # Picks up events a crashed process left unfinished, starting with the previous run's
+    inbox_task = asyncio.create_task(run_inbox()) if inbox is not None else None
+    startup_timer.mark("serving")
+    yield
+    warm_up_task.cancel()
+    token_refresh_task.cancel()
+    if inbox_task is not None:
+        inbox_task.cancel()
+    await worker_pool.stop()
+    if inbox is not None:
+        inbox.close()
+    dedup_store.close()
+    http_client.close()
+    await http_client.aclose()
+
+SHOW_TIMING_MATH = False
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/", response_class=HTMLResponse)
 async def index_page():
     return "<html><body><h1>Twilio Media Stream Server is running!</h1></body></html>"
-    
-#Instagram API ----------------------------------------------------------
+
+@app.get("/stats")
+async def stats():
+    return {
+        "startup": startup_timer.report(),
+        "worker_pool": worker_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "dedup": dedup_store.stats(),
+        "thread_store": thread_store.stats(),
+        "threads": thread_compactor.stats(),
+        "tenants": tenants.stats(),
+        "vector_stores": vector_store_resolver.stats(),
+        "http_client": http_client.stats(),
+        "outbound": outbound.stats(),
+        "tokens": token_manager.stats(),
+        "inbox": inbox.stats() if inbox is not None else None,
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.api_route("/privacy_policy", methods= ["GET", "POST"])
 def privacy_policy():
@@ -59,6 +193,419 @@ def privacy_policy():
 
     return privacy_policy_html
     
+#Webhook processing (runs on the worker pool) ----------------------------
+
+def run_options(tenant, message_text, tools=True):
+    """
+    Build the per-run options for a message: the run context and, with local
+    retrieval enabled, the top matching knowledge passages in place of file_search.
+
+    Args:
+        tenant (Tenant): The restaurant whose knowledge is searched.
+        message_text (str): The user message used as the retrieval query.
+        tools (bool): Whether the assistant has tools to override.
+
+    Returns:
+        dict: Keyword arguments for `run_assistant`.
+    """
+    if not LOCAL_RETRIEVAL:
+        return {"additional_instructions": run_context()}
+
+    passages = tenant.knowledge_index.get().search(message_text, k=RETRIEVAL_TOP_K)
+    options = {"additional_instructions": run_context(passages)}
+    if tools:
+        options["tools"] = assistant_tools(include_file_search=False)
+    return options
+
+def get_message_text(messaging):
+    """
+    Extract the text of a messaging event, or None for non-text events (echoes, reads, attachments).
+    """
+    message = messaging.get("message") or {}
+    if message.get("is_echo"):
+        return None
+    return message.get("text")
+
+def run_on_assistant(tenant, assistant, runner, thread_id, content, *args, **kwargs):
+    """
+    Run one of a tenant's assistants with `runner` (`run_assistant` or `stream_assistant`).
+    If the assistant was deleted remotely, it is recreated and the run started once more,
+    without adding the message to the thread again.
+    """
+    assistant_id = assistant.get()
+    try:
+        return runner(OPENAI_CLIENT, thread_id, assistant_id, content, *args, **kwargs)
+    except NotFoundError as e:
+        if assistant_id not in str(e):
+            raise
+        logger.warning(f"Assistant {assistant_id} no longer exists, recreating it")
+        tenant.assistant_missing(assistant)
+        return runner(OPENAI_CLIENT, thread_id, assistant.get(), content, *args, add_message=False, **kwargs)
+
+def send_local_answer(key, thread_id, message_text, answer, send):
+    """
+    Send an answer produced without an assistant run and add the exchange to the thread.
+    """
+    send(answer)
+    record_exchange(OPENAI_CLIENT, thread_id, message_text, answer)
+    thread_compactor.record_messages(thread_id, 2)
+    thread_compactor.maybe_compact(key, thread_id)
+
+def reply_to_message(tenant, sender_id, message_text, send, typing=None):
+    """
+    Answer a direct message with the concierge assistant (or the answer cache) and send the reply.
+
+    Args:
+        tenant (Tenant): The restaurant the message was sent to.
+        sender_id (str): The sender whose thread the message belongs to.
+        message_text (str): The message text.
+        send (callable): Sends the reply text on the message's channel.
+        typing (callable, optional): Shows a typing indicator on the message's channel.
+    """
+    key = tenant.thread_key(sender_id)
+    # An answer written with earlier messages in view may depend on them, so only first messages are cached
+    has_history = thread_store.get(key) is not None
+    thread_id = get_or_create_thread(key)
+
+    if FAST_PATH_ENABLED:
+        fast_response = tenant.fast_path.answer(message_text)
+        if fast_response is not None:
+            set_trace_labels(assistant="fast_path")
+            send_local_answer(key, thread_id, message_text, fast_response, send)
+            return
+
+    if ANSWER_CACHE_ENABLED:
+        cached_response = tenant.answer_cache.lookup(message_text)
+        if cached_response is not None:
+            set_trace_labels(assistant="answer_cache")
+            send_local_answer(key, thread_id, message_text, cached_response, send)
+            return
+
+    if typing:
+        try:
+            typing()
+        except Exception as e:
+            logger.warning(f"Could not send typing indicator: {e}")
+
+    set_trace_labels(assistant="concierge")
+    # Lets a reservation hold a table for the party size checked earlier in the conversation
+    tool_handler = tenant.tool_dispatcher.for_conversation(key)
+    started = time.monotonic()
+    if ASSISTANT_RUN_MODE == "stream":
+        # Replies are sent from inside the stream as each message completes
+        result = run_on_assistant(
+            tenant, tenant.assistant_id, stream_assistant, thread_id, message_text, tool_handler,
+            on_message=send, **run_options(tenant, message_text)
+        )
+    else:
+        result = run_on_assistant(
+            tenant, tenant.assistant_id, run_assistant, thread_id, message_text, tool_handler,
+            **run_options(tenant, message_text)
+        )
+        if result.reply:
+            send(result.reply)
+
+    if result.reply:
+        logger.info(f"Reply: {result.reply}")
+        if ANSWER_CACHE_ENABLED and not has_history and result.tool_calls == 0 and is_cacheable(message_text, result.reply):
+            tenant.answer_cache.store(message_text, result.reply, time.monotonic() - started)
+
+    thread_compactor.record_run(thread_id, result.run)
+    thread_compactor.maybe_compact(key, thread_id)
+
+def handle_facebook_message(tenant, messaging):
+    """
+    Run the concierge assistant on a Messenger message and send the reply.
+    """
+    sender_id = messaging["sender"]["id"]
+    message_text = get_message_text(messaging)
+    if not message_text:
+        return
+
+    reply_to_message(
+        tenant, sender_id, message_text,
+        send=lambda reply: tenant.send_messenger_message(sender_id, reply),
+        typing=lambda: tenant.send_messenger_typing(sender_id)
+    )
+
+def handle_instagram_message(tenant, messaging):
+    """
+    Run the concierge assistant on an Instagram DM and send the reply.
+    """
+    sender_id = messaging["sender"]["id"]
+    message_text = get_message_text(messaging)
+    if not message_text:
+        return
+
+    reply_to_message(
+        tenant, sender_id, message_text,
+        send=lambda reply: tenant.send_instagram_message(sender_id, reply),
+        typing=lambda: tenant.send_instagram_typing(sender_id)
+    )
+
+def handle_instagram_comment(tenant, comment_data):
+    """
+    Run the comment assistant on a new Instagram FEED comment.
+    """
+    comment_id = comment_data.get("id")
+    comment_text = comment_data.get("text")
+    user_id = comment_data.get("from", {}).get("id")
+
+    decision = tenant.comment_filter.classify(comment_text) if COMMENT_FILTER_ENABLED else None
+    set_trace_labels(assistant="comment_filter" if decision and decision.action != NEEDS_LLM else "comment")
+    if decision and decision.action == IGNORE:
+        logger.info(f"Ignoring comment {comment_id} ({decision.reason})")
+        return
+
+    if decision and decision.action == CANNED:
+        assistant_response = decision.reply
+    else:
+        key = tenant.thread_key(user_id)
+        thread_id = get_or_create_thread(key)
+        result = run_on_assistant(
+            tenant, tenant.comment_assistant_id, run_assistant, thread_id, f"[Instagram Comment] {comment_text}",
+            **run_options(tenant, comment_text, tools=False)
+        )
+        thread_compactor.record_run(thread_id, result.run)
+        thread_compactor.maybe_compact(key, thread_id)
+        assistant_response = result.reply
+    if assistant_response:
+        logger.info(f"Assistant response: {assistant_response}")
+
+        # Reply to the comment instead of sending a DM
+        if REPLY_TO_COMMENTS:
+            tenant.reply_to_comment(comment_id, assistant_response)
+
+CHANNEL_HANDLERS = {
+    "facebook": handle_facebook_message,
+    "instagram": handle_instagram_message,
+    "instagram_comment": handle_instagram_comment,
+}
+
+def conversation_key(tenant, channel, item):
+    """
+    The key a webhook event is ordered by: its sender's (or commenter's) thread key.
+    """
+    if channel == "instagram_comment":
+        return tenant.thread_key(item.get("from", {}).get("id"))
+    return tenant.thread_key(item["sender"]["id"])
+
+def outbound_account(tenant, channel):
+    """
+    The account a webhook event's replies are sent (and rate limited) on.
+    """
+    return tenant.messenger_account if channel == "facebook" else tenant.instagram_account
+
+def sends_reply(tenant, channel, item):
+    """
+    Whether a webhook event's job will send on its outbound account: text messages, and
+    comments when comment replies are on and the filter doesn't ignore them.
+    """
+    if channel != "instagram_comment":
+        return bool(get_message_text(item))
+    if not REPLY_TO_COMMENTS:
+        return False
+    return not (COMMENT_FILTER_ENABLED and tenant.comment_filter.ignores(item.get("text")))
+
+def traced_handler(func, channel, inbox_id=None, account=None):
+    """
+    Wrap a handler so it runs under a new trace id and is timed as the "handler" stage.
+    With an inbox id, the event is marked done or failed in the inbox when the handler returns.
+    With an account, the job stops counting towards the account's outbound backlog once it ends.
+
+    Returns:
+        tuple: The wrapped handler and its trace id.
+    """
+    trace_id = new_trace_id()
+
+    def handle(*args):
+        with stage("handler"):
+            try:
+                result = func(*args)
+            except Exception as e:
+                if inbox_id is not None:
+                    inbox.fail(inbox_id, repr(e))
+                raise
+            finally:
+                if account is not None:
+                    outbound.untrack(account)
+        if inbox_id is not None:
+            inbox.complete(inbox_id)
+        return result
+
+    handle.__name__ = func.__name__
+    return bind(handle, trace_id=trace_id, channel=channel), trace_id
+
+def enqueue(batch, event_id, channel, tenant, item, inbox_id=None):
+    """
+    Queue a webhook event on the worker pool, ordered per conversation key.
+
+    Args:
+        batch (WebhookBatch): The delivery the event came in, which limits its fan-out.
+        event_id (str): Idempotency key of the event.
+        channel (str): "facebook", "instagram" or "instagram_comment".
+        tenant (Tenant): The restaurant the event belongs to.
+        item (dict): The `messaging` item or the comment `value`.
+        inbox_id (int, optional): The event's id in the inbox.
+
+    Returns:
+        bool: False if the queue is full and the event was rejected.
+    """
+    func = CHANNEL_HANDLERS[channel]
+    # Only jobs that will send count towards the account's backlog
+    account = outbound_account(tenant, channel) if sends_reply(tenant, channel, item) else None
+    handler, trace_id = traced_handler(func, channel, inbox_id, account)
+    if account is not None:
+        outbound.track(account)
+    try:
+        scheduler.submit(conversation_key(tenant, channel, item), batch.track(handler), tenant, item, gate=batch.gate)
+        logger.info(f"Queued {func.__name__} for event {event_id} as trace {trace_id}")
+        webhook_events.inc(channel=channel, outcome="accepted")
+        return True
+    except asyncio.QueueFull:
+        logger.warning(f"Webhook queue full, rejecting {func.__name__}")
+        webhook_events.inc(channel=channel, outcome="rejected")
+        batch.untrack()
+        if account is not None:
+            outbound.untrack(account)
+        return False
+
+async def accept_events(source, events):
+    """
+    Record a delivery's new events in the inbox and queue them. Events already
+    accepted earlier (Meta redeliveries) are dropped.
+
+    Args:
+        source (str): The webhook the delivery came in on.
+        events (list): (event id, channel, tenant, item) per event.
+
+    Returns:
+        bool: False if any event was rejected and Meta should redeliver.
+    """
+    try:
+        # Repeats are answered from memory; new keys are written by the dedup store's writer thread
+        is_new = await dedup_store.check_and_mark_many([event_id for event_id, _, _, _ in events])
+    except sqlite3.Error as e:
+        logger.error(f"Could not record webhook events in the dedup store: {e}")
+        return False
+    fresh = []
+    for event, new in zip(events, is_new):
+        if new:
+            fresh.append(event)
+        else:
+            logger.info(f"Skipping duplicate webhook event {event[0]}")
+            webhook_events.inc(channel=event[1], outcome="duplicate")
+    if not fresh:
+        return True
+
+    inbox_ids = [None] * len(fresh)
+    if inbox is not None:
+        try:
+            # Committed together with concurrent deliveries' events
+            inbox_ids = await inbox.append([(event_id, channel, tenant.id, item) for event_id, channel, tenant, item in fresh])
+        except sqlite3.Error as e:
+            logger.error(f"Could not record webhook events in the inbox: {e}")
+            for event_id, _, _, _ in fresh:
+                dedup_store.forget(event_id)
+            return False
+
+    batch = WebhookBatch(source)
+    accepted = True
+    for (event_id, channel, tenant, item), inbox_id in zip(fresh, inbox_ids):
+        if inbox is not None and inbox_id is None:
+            # Already in the inbox, e.g. accepted by another worker process or before a restart
+            logger.info(f"Skipping duplicate webhook event {event_id}")
+            webhook_events.inc(channel=channel, outcome="duplicate")
+            continue
+        if not enqueue(batch, event_id, channel, tenant, item, inbox_id):
+            dedup_store.forget(event_id)
+            if inbox_id is not None:
+                inbox.discard(inbox_id)
+            accepted = False
+    batch.seal()
+    return accepted
+
+def requeue_inbox_events(events):
+    """
+    Queue events reclaimed from the inbox. Events that don't fit in the queue
+    are released and picked up again by the next reclaim.
+    """
+    batch = WebhookBatch("inbox")
+    for event in events:
+        try:
+            tenant = tenants.get(event.tenant_id)
+        except KeyError:
+            logger.error(f"Inbox event {event.id} belongs to unknown tenant {event.tenant_id}")
+            inbox.fail(event.id, f"Unknown tenant {event.tenant_id}")
+            continue
+        # So a redelivery of the event isn't handled a second time
+        dedup_store.check_and_mark(event.event_key)
+        if not enqueue(batch, event.event_key, event.channel, tenant, event.payload, event.id):
+            inbox.release(event.id)
+    batch.seal()
+
+async def run_inbox():
+    """
+    Keep this process's inbox leases alive, reclaim events whose process died,
+    and prune finished events, until cancelled.
+    """
+    runs = 0
+    while True:
+        try:
+            await asyncio.to_thread(inbox.renew)
+            events = await asyncio.to_thread(inbox.reclaim)
+            if events:
+                logger.warning(f"Recovered {len(events)} unfinished webhook events from the inbox")
+                requeue_inbox_events(events)
+            if runs % 100 == 0:
+                await asyncio.to_thread(inbox.prune)
+        except sqlite3.Error as e:
+            logger.error(f"Inbox maintenance failed: {e}")
+        runs += 1
+        await asyncio.sleep(inbox.lease_seconds / 3)
+
+def replay_events(event_ids):
+    """
+    Run recorded inbox events through their handlers again, synchronously, e.g. to debug
+    a failed event. Replies are sent again; the inbox and dedup store are left untouched.
+
+    Args:
+        event_ids (list): Inbox ids of the events.
+    """
+    if inbox is None:
+        logger.error("The inbox is disabled (INBOX_ENABLED=false), nothing to replay")
+        return
+    for event_id in event_ids:
+        event = inbox.get(event_id)
+        if event is None:
+            logger.error(f"No inbox event {event_id}")
+            continue
+        logger.info(f"Replaying inbox event {event.id} ({event.channel}, {event.status}, received {time.ctime(event.received_at)})")
+        handler, _ = traced_handler(CHANNEL_HANDLERS[event.channel], event.channel)
+        handler(tenants.get(event.tenant_id), event.payload)
+
+def list_inbox_events(status=None, limit=20):
+    """
+    Print recent inbox events, e.g. to find a failed one to replay.
+    """
+    if inbox is None:
+        logger.error("The inbox is disabled (INBOX_ENABLED=false)")
+        return
+    for event in inbox.events(status=status, limit=limit):
+        received = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.received_at))
+        print(f"{event.id:>8}  {received}  {event.status:<7}  {event.channel:<17}  {event.tenant_id}  "
+              f"{event.event_key}  {event.error or ''}")
+
+def acknowledge(accepted):
+    """
+    Build the webhook response. A 503 asks Meta to redeliver later when we are saturated.
+    """
+    if accepted:
+        return "EVENT_RECEIVED"
+    return JSONResponse({"status": "busy"}, status_code=503)
+
+#Instagram API ----------------------------------------------------------
+
 @app.get("/fb_webhook")
 async def webhook(request: Request):
     return int(request.query_params.get("hub.challenge"))
@@ -66,91 +613,14 @@ async def webhook(request: Request):
 @app.post("/fb_webhook")
 async def webhook(request: Request):
     data = await request.json()
-    
+    events = []
+
     for entry in data.get("entry", []):
-        if "messaging" in entry:
-            for messaging in entry.get("messaging", []):
-                sender_id = messaging["sender"]["id"]
-                print(f"\n {sender_id} \n")
-
-                # Check if message exists
-                message = messaging.get("message")
-
-                # Process actual user message
-                message_text = message["text"]
-                thread_id = get_or_create_thread(sender_id)
-                
-                # Send message to OpenAI
-                OPENAI_CLIENT.beta.threads.messages.create(
-                    thread_id=thread_id,
-                    role="user",
-                    content=message_text
-                )
-                
-                run = OPENAI_CLIENT.beta.threads.runs.create_and_poll(
-                    thread_id=thread_id,
-                    assistant_id=assistant.id,
-                )
-
-                if run.status == 'completed':
-                    messages = OPENAI_CLIENT.beta.threads.messages.list(
-                        thread_id=thread_id
-                    )
-                    print (run.status)
-                    assistant_response = next(
-                        (msg.content[0].text.value for msg in messages.data if msg.role == "assistant"),
-                        "Sorry, I didn't get that."
-                    )
-                    print(f"\n{assistant_response}\n")
-                    message_response = client.send_message(sender_id, assistant_response)
-                    #send_facebook_message(sender_id, assistant_response)
-                    
-                elif run.status == 'requires_action':
-                    tool_outputs = []
-                    for tool in run.required_action.submit_tool_outputs.tool_calls:
-                        if tool.function.name == "GOOGLE_CALENDAR__EVENTS_INSERT":
-                            try:
-                                arguments = json.loads(tool.function.arguments)
-                                aci_result = aci.functions.execute(
-                                    tool.function.name,
-                                    arguments,
-                                    linked_account_owner_id = LINKED_ACCOUNT_OWNER_ID
-                                )
-                                tool_outputs.append({
-                                    "tool_call_id": tool.id,
-                                    "output": aci_result.model_dump_json()
-                                })
-                            except Exception as e:
-                                print(f"Error executing ACI Google Calendar: {e}")
-                                tool_outputs.append({
-                                    "tool_call_id": tool.id,
-                                    "output": f"Error{e}"
-                                })
-                        
-                    if tool_outputs:
-                        try:
-                            run = OPENAI_CLIENT.beta.threads.runs.submit_tool_outputs_and_poll(thread_id=thread_id,
-                            run_id = run.id,
-                            tool_outputs= tool_outputs)
-                            
-                            print("Tool outputs submitted successfully.")
-                        except Exception as e:
-                            print("Failed to submit tool outputs:", e)
-                    else:
-                        print("No tool outputs to submit")
-                        
-                    if run.status == "completed":
-                        messages = OPENAI_CLIENT.beta.threads.messages.list(thread_id=thread_id)
-                        assistant_response = next(
-                            (msg.content[0].text.value for msg in messages.data if msg.role == "assistant"),
-                            "Sorry, I didn't get that."
-                        )
-                        print(f"\n{assistant_response}\n")
-                        message_response = client.send_message(sender_id, assistant_response)
-                    else:
-                        print(run.status)
-                else: 
-                    print(run.status)
+        tenant = tenants.resolve(entry.get("id"))
+        for messaging in entry.get("messaging", []):
+            events.append((event_key("message", entry, messaging), "facebook", tenant, messaging))
+
+    return acknowledge(await accept_events("fb_webhook", events))
                                            
 @app.api_route("/webhook", methods=["GET"])
 async def webhook(request: Request):
@@ -159,151 +629,41 @@ async def webhook(request: Request):
 @app.api_route("/webhook", methods=["POST"])
 async def webhook(request: Request):
     data = await request.json()
-    
+    events = []
+    accepted = True
+
     for entry in data.get("entry", []):
-        print("Processing entry:", entry)
-        
+        tenant = tenants.resolve(entry.get("id"))
         # Handle comments
-        if "changes" in entry:
-            for change in entry.get("changes", []):  # Use "changes" here, not "value"
-                print("Processing change:", change)
-                
-                if change.get("field") == "comments":
-                    comment_data = change.get("value", {})  # "value" is inside each change
-                    print("Comment data:", comment_data)
-                    
-                    # Extract comment information
-                    comment_id = comment_data.get("id")
-                    comment_text = comment_data.get("text")
-                    from_user = comment_data.get("from", {})
-                    user_id = from_user.get("id")
-                    username = from_user.get("username")
-                    media_id = comment_data.get("media", {}).get("id")
-                    
-                    print(f"Comment ID: {comment_id}")
-                    print(f"From: {username} (ID: {user_id})")
-                    print(f"Text: {comment_text}")
-                    print(f"Media ID: {media_id}")
-                    
-                    # Check if this is a new comment
-                    if comment_data.get("media", {}).get("media_product_type") == "FEED":
-                        print(f"New FEED comment from {username}: {comment_text}")
-                        
-                        # Process the comment with your assistant
-                        thread_id = get_or_create_thread(user_id)
-                        
-                        # Send comment to OpenAI
-                        OPENAI_CLIENT.beta.threads.messages.create(
-                            thread_id=thread_id,
-                            role="user",
-                            content=f"[Instagram Comment] {comment_text}"
-                        )
-                        
-                        run = OPENAI_CLIENT.beta.threads.runs.create_and_poll(
-                            thread_id=thread_id,
-                            assistant_id=comment_assistant.id,
-                        )
-
-                        if run.status == 'completed':
-                            messages = OPENAI_CLIENT.beta.threads.messages.list(
-                                thread_id=thread_id
-                            )
-                            print(f"Run status: {run.status}")
-                            assistant_response = next(
-                                (msg.content[0].text.value for msg in messages.data if msg.role == "assistant"),
-                                "Sorry, I didn't get that."
-                            )
-                            print(f"AssistaSnt response: {assistant_response}")
-                            
-                            # Reply to the comment instead of sending a DM
-                            #reply_to_instagram_comment(comment_id, assistant_response)
-                    else:
-                        print(f"Not a FEED comment or missing media_product_type")
-                        
-        if "messaging" in entry:
-            for messaging in entry.get("messaging", []):
-                sender_id = messaging["sender"]["id"]
-                print(f"\n {sender_id} \n")
-
-                # Check if message exists
-                message = messaging.get("message")
-
-                # Process actual user message
-                message_text = message["text"]
-                thread_id = get_or_create_thread(sender_id)
-                
-                # Send message to OpenAI
-                OPENAI_CLIENT.beta.threads.messages.create(
-                    thread_id=thread_id,
-                    role="user",
-                    content=message_text
-                )
-                
-                run = OPENAI_CLIENT.beta.threads.runs.create_and_poll(
-                    thread_id=thread_id,
-                    assistant_id=assistant.id,
-                )
-
-                if run.status == 'completed':
-                    messages = OPENAI_CLIENT.beta.threads.messages.list(
-                        thread_id=thread_id
-                    )
-                    print (run.status)
-                    assistant_response = next(
-                        (msg.content[0].text.value for msg in messages.data if msg.role == "assistant"),
-                        "Sorry, I didn't get that."
-                    )
-                    print(f"\n{assistant_response}\n")
-                    send_instagram_message(user_access_token_ig,sender_id, assistant_response)
-                    
-                elif run.status == 'requires_action':
-                    tool_outputs = []
-                    for tool in run.required_action.submit_tool_outputs.tool_calls:
-                        if tool.function.name == "GOOGLE_CALENDAR__EVENTS_INSERT":
-                            try:
-                                arguments = json.loads(tool.function.arguments)
-                                aci_result = aci.functions.execute(
-                                    tool.function.name,
-                                    arguments,
-                                    linked_account_owner_id = LINKED_ACCOUNT_OWNER_ID
-                                )
-                                tool_outputs.append({
-                                    "tool_call_id": tool.id,
-                                    "output": aci_result.model_dump_json()
-                                })
-                            except Exception as e:
-                                print(f"Error executing ACI Google Calendar: {e}")
-                                tool_outputs.append({
-                                    "tool_call_id": tool.id,
-                                    "output": f"Error{e}"
-                                })
-                        
-                    if tool_outputs:
-                        try:
-                            run = OPENAI_CLIENT.beta.threads.runs.submit_tool_outputs_and_poll(thread_id=thread_id,
-                            run_id = run.id,
-                            tool_outputs= tool_outputs)
-                            
-                            print("Tool outputs submitted successfully.")
-                        except Exception as e:
-                            print("Failed to submit tool outputs:", e)
-                    else:
-                        print("No tool outputs to submit")
-                        
-                    if run.status == "completed":
-                        messages = OPENAI_CLIENT.beta.threads.messages.list(thread_id=thread_id)
-                        assistant_response = next(
-                            (msg.content[0].text.value for msg in messages.data if msg.role == "assistant"),
-                            "Sorry, I didn't get that."
-                        )
-                        print(f"\n{assistant_response}\n")
-                        send_instagram_message(user_access_token_ig,sender_id, assistant_response)
-                    else:
-                        print(run.status)
-                else: 
-                    print(run.status)
+        for change in entry.get("changes", []):
+            if change.get("field") != "comments":
+                continue
+            comment_data = change.get("value", {})
+            if comment_data.get("media", {}).get("media_product_type") == "FEED":
+                if (sends_reply(tenant, "instagram_comment", comment_data)
+                        and not outbound.accepting(tenant.instagram_account, PRIORITY_COMMENT)):
+                    # Replies for this account are backed up; Meta redelivers the comment later
+                    logger.warning(f"Outbound backlog for {tenant.instagram_account}, deferring comment")
+                    webhook_events.inc(channel="instagram_comment", outcome="deferred")
+                    accepted = False
+                    continue
+                events.append((event_key("comment", entry, comment_data), "instagram_comment", tenant, comment_data))
+            else:
+                logger.info("Not a FEED comment or missing media_product_type")
+
+        for messaging in entry.get("messaging", []):
+            events.append((event_key("message", entry, messaging), "instagram", tenant, messaging))
 
+    accepted &= await accept_events("webhook", events)
+    return acknowledge(accepted)
 
 if __name__ == "__main__":
-  import uvicorn
-  uvicorn.run(app, host="0.0.0.0", port=PORT)
\ No newline at end of file
+  if sys.argv[1:2] == ["inbox"]:
+    # python main.py inbox [status] [limit]
+    list_inbox_events(sys.argv[2] if len(sys.argv) > 2 else None, int(sys.argv[3]) if len(sys.argv) > 3 else 20)
+  elif sys.argv[1:2] == ["replay"]:
+    # python main.py replay <inbox event id> ...
+    replay_events([int(event_id) for event_id in sys.argv[2:]])
+  else:
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
\ No newline at end of file
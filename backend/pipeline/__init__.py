@@ -0,0 +1,6 @@
+from .worker_pool import WorkerPool
+from .keyed_scheduler import KeyedScheduler
+from .batch import BatchGate, WebhookBatch
+from .dedup import DedupStore, create_dedup_store, event_key
+from .outbound import OutboundScheduler, OutboundTimeout, TokenBucket, PRIORITY_DM, PRIORITY_COMMENT
+from .inbox import WebhookInbox, InboxEvent, INBOX_ENABLED
@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_BATCH_CONCURRENCY = int(os.getenv("WEBHOOK_BATCH_CONCURRENCY", 4))
+
+
+class BatchGate:
+    """
+    Limits how many jobs of one group run at the same time.
+
+    Used from the event loop only. A job that cannot start registers a resume
+    callback instead of blocking, so a throttled group never holds a pool worker
+    while it waits.
+    """
+
+    def __init__(self, limit: int):
+        """
+        Args:
+            limit: Maximum number of concurrently running jobs.
+        """
+        self.limit = max(1, limit)
+        self.active = 0
+        self.max_active = 0
+        self._waiters = deque()
+
+    def try_acquire(self, resume: Callable[[], None]) -> bool:
+        """
+        Take a slot if one is free, otherwise remember `resume` to be called once a slot frees up.
+
+        Returns:
+            bool: True if the slot was taken.
+        """
+        if self.active < self.limit:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            return True
+        self._waiters.append(resume)
+        return False
+
+    def release(self):
+        """
+        Free a slot and wake the oldest waiter.
+        """
+        self.active -= 1
+        if self._waiters:
+            self._waiters.popleft()()
+
+
+class WebhookBatch:
+    """
+    The events of a single webhook delivery.
+
+    Events fan out across the worker pool, at most `max_concurrency` at a time
+    so one large delivery cannot starve the others, and the batch logs its
+    timing once the last event has been handled.
+    """
+
+    def __init__(self, source: str, max_concurrency: int = WEBHOOK_BATCH_CONCURRENCY):
+        """
+        Args:
+            source: Name of the webhook the delivery came in on, used in logs.
+            max_concurrency: Maximum number of this delivery's events processed at once.
+        """
+        self.id = uuid.uuid4().hex[:8]
+        self.source = source
+        self.gate = BatchGate(max_concurrency)
+        self.received_at = time.perf_counter()
+
+        self._lock = threading.Lock()
+        self._sealed = False
+        self.events = 0
+        self._pending = 0
+        self.failed = 0
+        self._work_time = 0.0
+
+    def track(self, func: Callable) -> Callable:
+        """
+        Count an event of this batch and wrap its handler to record its timing.
+
+        Args:
+            func: The synchronous event handler.
+
+        Returns:
+            callable: The wrapped handler.
+        """
+        with self._lock:
+            self.events += 1
+            self._pending += 1
+
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self._finish(time.perf_counter() - started, failed)
+
+        run.__name__ = getattr(func, "__name__", "job")
+        return run
+
+    def untrack(self):
+        """
+        Forget the most recently tracked event, e.g. because it could not be queued.
+        """
+        with self._lock:
+            self.events -= 1
+            self._pending -= 1
+        self._maybe_log()
+
+    def seal(self):
+        """
+        Mark the batch complete: no more events will be tracked.
+        """
+        with self._lock:
+            self._sealed = True
+        self._maybe_log()
+
+    def _finish(self, duration: float, failed: bool):
+        with self._lock:
+            self._pending -= 1
+            self._work_time += duration
+            self.failed += failed
+        self._maybe_log()
+
+    def _maybe_log(self):
+        with self._lock:
+            if not self._sealed or self._pending or not self.events:
+                return
+            # Only log once
+            self._sealed = False
+            stats = self.stats()
+        logger.info(
+            f"Webhook batch {self.id} ({self.source}): {stats['events']} events, {stats['failed']} failed, "
+            f"wall {stats['wall_s']:.2f}s, handler time {stats['work_s']:.2f}s, "
+            f"max concurrency {stats['max_concurrency']}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the batch's event count and timings.
+        """
+        return {
+            "events": self.events,
+            "failed": self.failed,
+            "wall_s": round(time.perf_counter() - self.received_at, 3),
+            "work_s": round(self._work_time, 3),
+            "max_concurrency": self.gate.max_active,
+        }
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from helper import LRUCache, connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+DEDUP_BACKEND = os.getenv("DEDUP_BACKEND", "memory")
+DEDUP_PATH = os.getenv("DEDUP_PATH", "dedup.db")
+DEDUP_RETENTION = float(os.getenv("DEDUP_RETENTION", 24 * 3600))
+DEDUP_MAX_SIZE = int(os.getenv("DEDUP_MAX_SIZE", 100000))
+
+
+def event_key(kind: str, entry: Dict[str, Any], item: Dict[str, Any]) -> str:
+    """
+    Build the idempotency key of a webhook event.
+
+    Messages are keyed by their `mid` and comments by their comment `id`. Events
+    without either fall back to the entry id and timestamps, which Meta keeps
+    identical across redeliveries.
+
+    Args:
+        kind: "message" or "comment".
+        entry: The webhook `entry` object the event came in.
+        item: The `messaging` item or the comment `value`.
+
+    Returns:
+        str: The key.
+    """
+    if kind == "message":
+        mid = (item.get("message") or {}).get("mid")
+        if mid:
+            return f"message:{mid}"
+        sender_id = (item.get("sender") or {}).get("id")
+        return f"message:{entry.get('id')}:{entry.get('time')}:{sender_id}:{item.get('timestamp')}"
+
+    comment_id = item.get("id")
+    if comment_id:
+        return f"comment:{comment_id}"
+    return f"comment:{entry.get('id')}:{entry.get('time')}:{item.get('text')}"
+
+
+class DedupStore:
+    """
+    Remembers the keys of webhook events already accepted, so redeliveries are suppressed.
+
+    An in-memory LRU front answers every key this process accepted recently,
+    including ones whose write is still in flight, without I/O. With a SQLite
+    path, new keys are also recorded in a table shared by every worker process,
+    so a retry landing on a different worker is caught too. Those writes run on
+    a writer thread that commits concurrent deliveries' keys together, so intake
+    never waits on SQLite on the event loop.
+    """
+
+    def __init__(self, retention: float = DEDUP_RETENTION, max_size: int = DEDUP_MAX_SIZE,
+                 path: Optional[str] = None, max_batch: int = 1000):
+        """
+        Initialize the store.
+
+        Args:
+            retention: Seconds a key is remembered.
+            max_size: Maximum number of keys held in memory.
+            path: Optional SQLite database path for cross-process deduplication.
+            max_batch: Maximum number of writes committed together.
+        """
+        self.retention = retention
+        self.max_batch = max_batch
+        self._recent = LRUCache(max_size=max_size, ttl=retention)
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = connect_sqlite(path)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen_events (key TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS seen_events_seen_at ON seen_events (seen_at)")
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._written = 0
+
+        self.accepted = 0
+        self.suppressed = 0
+        self.front_hits = 0
+        self.commits = 0
+
+    # Writer thread -----------------------------------------------------------
+
+    def _submit(self, operation: str, *args) -> Future:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="dedup-writer", daemon=True)
+                    self._writer.start()
+        future = Future()
+        self._writes.put((operation, args, future))
+        return future
+
+    def _write_loop(self):
+        while True:
+            batch = [self._writes.get()]
+            # Everything that queued up during the previous commit goes into this one
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+            if any(operation == "stop" for operation, _, _ in batch):
+                return
+
+    def _commit(self, batch: List[Tuple[str, tuple, Future]]):
+        results = []
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for operation, args, _ in batch:
+                results.append(getattr(self, f"_write_{operation}")(*args))
+            self._conn.execute("COMMIT")
+        except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            logger.error(f"Dedup commit of {len(batch)} writes failed: {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.commits += 1
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _write_mark(self, keys: List[str], now: float) -> List[bool]:
+        marked = []
+        for key in keys:
+            # Replace a row only if it fell out of the retention window
+            cursor = self._conn.execute(
+                "INSERT INTO seen_events (key, seen_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET seen_at = excluded.seen_at WHERE seen_events.seen_at < ?",
+                (key, now, now - self.retention)
+            )
+            marked.append(cursor.rowcount > 0)
+            self._written += 1
+            if self._written % 1000 == 0:
+                self._conn.execute("DELETE FROM seen_events WHERE seen_at < ?", (now - self.retention,))
+        return marked
+
+    def _write_forget(self, key: str):
+        self._conn.execute("DELETE FROM seen_events WHERE key = ?", (key,))
+
+    def _write_stop(self):
+        pass
+
+    def _write_flush(self):
+        pass
+
+    # Marking -----------------------------------------------------------------
+
+    def _mark_in_front(self, keys: List[str]) -> List[bool]:
+        """
+        Mark keys in the in-memory front. Returns whether each key was new to it.
+        """
+        new = []
+        with self._lock:
+            for key in keys:
+                if key in self._recent:
+                    self.front_hits += 1
+                    new.append(False)
+                else:
+                    # Marked before the SQLite write, so a concurrent redelivery stops here
+                    self._recent.set(key, True)
+                    new.append(True)
+        return new
+
+    def _settle(self, keys: List[str], new: List[bool], marked: Optional[List[bool]]) -> List[bool]:
+        """
+        Combine the front's answer with the SQLite write's, and update the counters.
+        """
+        marked = iter(marked or [])
+        results = [is_new and (self._conn is None or next(marked)) for is_new in new]
+        with self._lock:
+            self.accepted += sum(results)
+            self.suppressed += len(results) - sum(results)
+        return results
+
+    def _unmark(self, keys: List[str], new: List[bool]):
+        with self._lock:
+            for key, is_new in zip(keys, new):
+                if is_new:
+                    self._recent.pop(key)
+
+    async def check_and_mark_many(self, keys: List[str]) -> List[bool]:
+        """
+        Check which of a delivery's events are new and remember them, without
+        blocking the event loop on SQLite.
+
+        Args:
+            keys: The events' idempotency keys.
+
+        Returns:
+            list: Whether each event was not seen before and should be processed.
+
+        Raises:
+            sqlite3.Error: If the keys could not be recorded; none of them are remembered.
+        """
+        new = self._mark_in_front(keys)
+        to_write = [key for key, is_new in zip(keys, new) if is_new]
+        marked = None
+        if self._conn is not None and to_write:
+            try:
+                marked = await asyncio.wrap_future(self._submit("mark", to_write, time.time()))
+            except Exception:
+                self._unmark(keys, new)
+                raise
+        return self._settle(keys, new, marked)
+
+    def check_and_mark(self, key: str) -> bool:
+        """
+        Atomically check whether an event is new and remember it, waiting for the SQLite write.
+
+        Args:
+            key: The event's idempotency key.
+
+        Returns:
+            bool: True if the event was not seen before and should be processed.
+        """
+        new = self._mark_in_front([key])
+        marked = None
+        if self._conn is not None and new[0]:
+            try:
+                marked = self._submit("mark", [key], time.time()).result()
+            except Exception:
+                self._unmark([key], new)
+                raise
+        return self._settle([key], new, marked)[0]
+
+    def forget(self, key: str):
+        """
+        Forget a key, e.g. because its event was rejected and Meta should be able to redeliver it.
+        The SQLite delete is committed in the background, before any later write.
+        """
+        with self._lock:
+            self._recent.pop(key)
+            self.accepted -= 1
+        if self._conn is not None:
+            self._submit("forget", key)
+
+    def flush(self, timeout: Optional[float] = None):
+        """
+        Wait until every write submitted so far is committed.
+        """
+        if self._writer is not None:
+            self._submit("flush").result(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Commit pending writes, stop the writer and close the database.
+        """
+        if self._writer is not None:
+            self._submit("stop")
+            self._writer.join(timeout)
+            self._writer = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get accepted/suppressed counters.
+        """
+        return {
+            "backend": "sqlite" if self._conn is not None else "memory",
+            "accepted": self.accepted,
+            "suppressed_duplicates": self.suppressed,
+            "front_hits": self.front_hits,
+            "commits": self.commits,
+            "memory_keys": len(self._recent),
+        }
+
+
+def create_dedup_store(backend: str = DEDUP_BACKEND) -> DedupStore:
+    """
+    Create the dedup store configured by DEDUP_BACKEND ("memory" or "sqlite").
+    """
+    if backend == "memory":
+        return DedupStore()
+    if backend == "sqlite":
+        return DedupStore(path=DEDUP_PATH)
+    raise ValueError(f"Unknown dedup backend: {backend}")
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from helper import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+INBOX_ENABLED = os.getenv("INBOX_ENABLED", "true").lower() == "true"
+INBOX_PATH = os.getenv("INBOX_PATH", "inbox.db")
+# A lease is renewed while its process lives; one that runs out means the process died
+INBOX_LEASE_SECONDS = float(os.getenv("INBOX_LEASE_SECONDS", 60))
+# Events whose lease ran out this many times are given up on instead of crashing every restart
+INBOX_MAX_ATTEMPTS = int(os.getenv("INBOX_MAX_ATTEMPTS", 3))
+# Finished events are kept this long for replay
+INBOX_RETENTION = float(os.getenv("INBOX_RETENTION", 7 * 24 * 3600))
+INBOX_MAX_BATCH = int(os.getenv("INBOX_MAX_BATCH", 1000))
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+EVENT_COLUMNS = "id, event_key, channel, tenant_id, payload, received_at, status, attempts, error"
+
+
+class InboxEvent(NamedTuple):
+    id: int
+    event_key: str
+    channel: str
+    tenant_id: str
+    payload: Dict[str, Any]
+    received_at: float
+    status: str
+    attempts: int
+    error: Optional[str]
+
+
+def _event(row: Sequence[Any]) -> InboxEvent:
+    return InboxEvent(row[0], row[1], row[2], row[3], json.loads(row[4]), row[5], row[6], row[7], row[8])
+
+
+class WebhookInbox:
+    """
+    A durable, append-only log of accepted webhook events in SQLite (WAL mode).
+
+    Intake appends events before acknowledging the webhook; appends from
+    concurrent requests are group-committed by a writer thread, so one fsync
+    covers many events. An appended event is leased to the process that
+    accepted it and marked done or failed when its handler returns. The lease
+    is renewed while the process lives, so events whose lease ran out were
+    left behind by a process that died, and are reclaimed and run again
+    (at least once delivery). Finished events are kept for `retention` seconds
+    so they can be inspected and replayed.
+    """
+
+    def __init__(self, path: str = INBOX_PATH, lease_seconds: float = INBOX_LEASE_SECONDS,
+                 max_attempts: int = INBOX_MAX_ATTEMPTS, retention: float = INBOX_RETENTION,
+                 max_batch: int = INBOX_MAX_BATCH):
+        """
+        Initialize the inbox. The database is opened on first use.
+
+        Args:
+            path: SQLite database path, shared by every worker process.
+            lease_seconds: Seconds a lease lasts without being renewed.
+            max_attempts: Leases an event may run out of before it is marked failed.
+            retention: Seconds finished events are kept.
+            max_batch: Maximum number of writes committed together.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.max_batch = max_batch
+        # Identifies this process's leases
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+        self.appended = 0
+        self.duplicates = 0
+        self.completed = 0
+        self.failed = 0
+        self.reclaimed = 0
+        self.commits = 0
+        self.max_commit_size = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect_sqlite(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS inbox_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, event_key TEXT NOT NULL UNIQUE, channel TEXT NOT NULL, "
+                "tenant_id TEXT NOT NULL, payload TEXT NOT NULL, received_at REAL NOT NULL, status TEXT NOT NULL, "
+                "lease_owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "finished_at REAL, error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS inbox_events_status ON inbox_events (status, lease_expires)")
+        return self._conn
+
+    # Group commit ------------------------------------------------------------
+
+    def _submit(self, operation: str, *args) -> Future:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="inbox-writer", daemon=True)
+                    self._writer.start()
+        future = Future()
+        self._writes.put((operation, args, future))
+        return future
+
+    def _write_loop(self):
+        while True:
+            batch = [self._writes.get()]
+            # Everything that queued up during the previous commit goes into this one
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(operation == "stop" for operation, _, _ in batch)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[Tuple[str, tuple, Future]]):
+        results = []
+        with self._lock:
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for operation, args, _ in batch:
+                    results.append(getattr(self, f"_write_{operation}")(conn, *args))
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                logger.error(f"Inbox commit of {len(batch)} writes failed: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+            self.commits += 1
+            self.max_commit_size = max(self.max_commit_size, len(batch))
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _write_append(self, conn, events, now) -> List[Optional[int]]:
+        ids = []
+        for event_key, channel, tenant_id, payload in events:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO inbox_events "
+                "(event_key, channel, tenant_id, payload, received_at, status, lease_owner, lease_expires, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)",
+                (event_key, channel, tenant_id, json.dumps(payload), now, LEASED, self.owner, now + self.lease_seconds)
+            )
+            if cursor.rowcount:
+                ids.append(cursor.lastrowid)
+                self.appended += 1
+            else:
+                ids.append(None)
+                self.duplicates += 1
+        return ids
+
+    def _write_finish(self, conn, event_id, status, error, now):
+        conn.execute(
+            "UPDATE inbox_events SET status = ?, error = ?, finished_at = ?, lease_owner = NULL, lease_expires = NULL "
+            "WHERE id = ?",
+            (status, error, now, event_id)
+        )
+
+    def _write_discard(self, conn, event_id):
+        conn.execute("DELETE FROM inbox_events WHERE id = ?", (event_id,))
+
+    def _write_release(self, conn, event_id):
+        conn.execute(
+            "UPDATE inbox_events SET status = ?, lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1 "
+            "WHERE id = ? AND status = ?",
+            (PENDING, event_id, LEASED)
+        )
+
+    def _write_stop(self, conn):
+        pass
+
+    def _write_flush(self, conn):
+        pass
+
+    # Intake and completion ---------------------------------------------------
+
+    async def append(self, events: List[Tuple[str, str, str, Dict[str, Any]]]) -> List[Optional[int]]:
+        """
+        Durably record newly accepted events, leased to this process.
+
+        Args:
+            events: (event key, channel, tenant id, payload) per event.
+
+        Returns:
+            list: The inbox id of each event, or None for events already in the
+            inbox (e.g. accepted earlier by another process).
+
+        Raises:
+            sqlite3.Error: If the events could not be written.
+        """
+        return await asyncio.wrap_future(self._submit("append", events, time.time()))
+
+    def complete(self, event_id: int) -> Future:
+        """
+        Mark an event as handled. The write is committed in the background.
+        """
+        self.completed += 1
+        return self._submit("finish", event_id, DONE, None, time.time())
+
+    def fail(self, event_id: int, error: str) -> Future:
+        """
+        Mark an event whose handler raised; it is kept for inspection and replay, not retried.
+        """
+        self.failed += 1
+        return self._submit("finish", event_id, FAILED, error[:1000], time.time())
+
+    def discard(self, event_id: int) -> Future:
+        """
+        Remove an event that was appended but then refused, so a redelivery is appended again.
+        """
+        return self._submit("discard", event_id)
+
+    def release(self, event_id: int) -> Future:
+        """
+        Give up this process's lease without counting an attempt, e.g. because the
+        worker queue was full; the next `reclaim` picks the event up again.
+        """
+        return self._submit("release", event_id)
+
+    def flush(self, timeout: Optional[float] = None):
+        """
+        Wait until every write submitted so far is committed.
+        """
+        if self._writer is not None:
+            self._submit("flush").result(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Commit pending writes, stop the writer and close the database.
+        """
+        if self._writer is not None:
+            self._submit("stop")
+            self._writer.join(timeout)
+            self._writer = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # Leases ------------------------------------------------------------------
+
+    def renew(self) -> int:
+        """
+        Extend the leases of every event this process is still working on.
+
+        Returns:
+            int: The number of leases renewed.
+        """
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE inbox_events SET lease_expires = ? WHERE lease_owner = ? AND status = ?",
+                (time.time() + self.lease_seconds, self.owner, LEASED)
+            )
+            return cursor.rowcount
+
+    def reclaim(self, limit: int = 500) -> List[InboxEvent]:
+        """
+        Lease events to this process that nobody is working on: released events, and
+        events whose lease ran out because their process died. Events that already
+        ran out of `max_attempts` leases are marked failed instead.
+
+        Returns:
+            list: The reclaimed events, oldest first.
+        """
+        now = time.time()
+        orphaned = "(status = ? OR (status = ? AND lease_expires < ?))"
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"UPDATE inbox_events SET status = ?, error = ?, finished_at = ?, lease_owner = NULL, "
+                    f"lease_expires = NULL WHERE {orphaned} AND attempts >= ?",
+                    (FAILED, f"Lease expired {self.max_attempts} times", now, PENDING, LEASED, now, self.max_attempts)
+                )
+                rows = conn.execute(
+                    f"SELECT {EVENT_COLUMNS} FROM inbox_events WHERE {orphaned} ORDER BY id LIMIT ?",
+                    (PENDING, LEASED, now, limit)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE inbox_events SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(LEASED, self.owner, now + self.lease_seconds, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self.reclaimed += len(rows)
+        # Report the events as leased by this reclaim, not as they were selected
+        return [_event(row)._replace(status=LEASED, attempts=row[7] + 1) for row in rows]
+
+    def prune(self) -> int:
+        """
+        Delete finished events older than the retention period.
+
+        Returns:
+            int: The number of events deleted.
+        """
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM inbox_events WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - self.retention)
+            )
+            return cursor.rowcount
+
+    # Inspection --------------------------------------------------------------
+
+    def get(self, event_id: int) -> Optional[InboxEvent]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {EVENT_COLUMNS} FROM inbox_events WHERE id = ?", (event_id,)
+            ).fetchone()
+        return _event(row) if row else None
+
+    def events(self, status: Optional[str] = None, since: Optional[float] = None, limit: int = 50) -> List[InboxEvent]:
+        """
+        List recorded events, newest first.
+
+        Args:
+            status: Only events with this status (pending, leased, done or failed).
+            since: Only events received after this UNIX timestamp.
+            limit: Maximum number of events.
+        """
+        query, params = f"SELECT {EVENT_COLUMNS} FROM inbox_events WHERE 1 = 1", []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if since is not None:
+            query += " AND received_at >= ?"
+            params.append(since)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [_event(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get intake and commit counters, and the number of events per status.
+        """
+        with self._lock:
+            counts = dict(self._connection().execute("SELECT status, COUNT(*) FROM inbox_events GROUP BY status"))
+        return {
+            "path": self.path,
+            "appended": self.appended,
+            "duplicates": self.duplicates,
+            "completed": self.completed,
+            "failed": self.failed,
+            "reclaimed": self.reclaimed,
+            "commits": self.commits,
+            "max_commit_size": self.max_commit_size,
+            "write_queue": self._writes.qsize(),
+            "events": counts,
+        }
+
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .batch import BatchGate
+from .worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedScheduler:
+    """
+    Runs jobs that share a key strictly in submission order, while jobs for
+    different keys run in parallel on a WorkerPool.
+
+    Each active key owns a small FIFO. The first job for an idle key schedules a
+    drain task on the pool; that task runs the key's jobs one after another and
+    removes the FIFO as soon as it is empty, so memory only grows with the number
+    of conversations that currently have work in flight.
+    """
+
+    def __init__(self, pool: WorkerPool):
+        """
+        Initialize the scheduler.
+
+        Args:
+            pool: The worker pool that executes the jobs.
+        """
+        self.pool = pool
+        self._pending: Dict[Hashable, deque] = {}
+        self._max_active_keys = 0
+        self._max_key_depth = 0
+
+    def submit(self, key: Hashable, func: Callable, *args, gate: Optional[BatchGate] = None, **kwargs):
+        """
+        Queue a job behind any other jobs with the same key.
+
+        Args:
+            key: Ordering key, e.g. the sender id of a conversation.
+            func: The function or coroutine function to execute.
+            *args: Positional arguments for the function.
+            gate: Optional concurrency gate the job must pass before it starts.
+            **kwargs: Keyword arguments for the function.
+
+        Raises:
+            asyncio.QueueFull: If the key is idle and the pool queue is at capacity.
+        """
+        queue = self._pending.get(key)
+        if queue is not None:
+            # A drain task is already scheduled or running for this key
+            queue.append((func, args, kwargs, gate))
+            self._max_key_depth = max(self._max_key_depth, len(queue))
+            return
+
+        queue = deque([(func, args, kwargs, gate)])
+        self._pending[key] = queue
+        try:
+            self.pool.submit(self._drain, key)
+        except Exception:
+            del self._pending[key]
+            raise
+        self._max_active_keys = max(self._max_active_keys, len(self._pending))
+
+    async def _drain(self, key: Hashable):
+        """
+        Run every queued job for a key in order, then forget the key.
+
+        If the next job's gate is full, the drain returns without forgetting the
+        key, so later jobs for it keep queueing behind, and is resumed by the gate.
+        """
+        queue = self._pending[key]
+        try:
+            while queue:
+                func, args, kwargs, gate = queue[0]
+                if gate is not None and not gate.try_acquire(lambda: self._resume(key)):
+                    return
+                try:
+                    await self.pool.run_job(func, *args, **kwargs)
+                except Exception:
+                    logger.exception(f"Job {getattr(func, '__name__', func)} failed for key {key}")
+                finally:
+                    if gate is not None:
+                        gate.release()
+                queue.popleft()
+        except BaseException:
+            del self._pending[key]
+            raise
+        # Runs on the event loop, so no job can be appended between the
+        # emptiness check above and this removal.
+        del self._pending[key]
+
+    def _resume(self, key: Hashable):
+        """
+        Reschedule the drain of a key whose job was waiting on a gate.
+        """
+        try:
+            self.pool.submit(self._drain, key)
+        except asyncio.QueueFull:
+            # The job was already accepted, so run it rather than drop it
+            asyncio.get_running_loop().create_task(self._drain(key))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the scheduler's metrics.
+
+        Returns:
+            Dictionary with the number of active keys and queued jobs.
+        """
+        return {
+            "active_keys": len(self._pending),
+            "queued_jobs": sum(len(queue) for queue in self._pending.values()),
+            "max_active_keys": self._max_active_keys,
+            "max_key_depth": self._max_key_depth,
+        }
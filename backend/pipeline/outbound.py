@@ -0,0 +1,333 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from helper.http_client import THROTTLE_ERROR_CODES, http_client, never_sent
+from helper.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", 10))
+OUTBOUND_BURST = int(os.getenv("OUTBOUND_BURST", 20))
+OUTBOUND_SEND_TIMEOUT = float(os.getenv("OUTBOUND_SEND_TIMEOUT", 120))
+OUTBOUND_MAX_ATTEMPTS = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", 3))
+OUTBOUND_THROTTLE_PAUSE = float(os.getenv("OUTBOUND_THROTTLE_PAUSE", 30))
+# Comment webhooks are refused (and redelivered by Meta later) once an account's queued sends
+# would take longer than this many seconds at OUTBOUND_RATE
+OUTBOUND_MAX_BACKLOG = float(os.getenv("OUTBOUND_MAX_BACKLOG", 10))
+
+PRIORITY_DM = 0
+PRIORITY_COMMENT = 1
+
+
+class OutboundTimeout(Exception):
+    """Raised when a send waited longer than its timeout for its account's rate limit."""
+
+
+class TokenBucket:
+    """
+    Allows `rate` operations per second on average, with bursts of up to `burst`.
+    Not thread-safe; the scheduler guards it with its lock.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until a token is available (0 if one is available now).
+        """
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """
+        Hold every send for `seconds`, e.g. after the API throttled the account.
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Account:
+    def __init__(self, rate: float, burst: int, condition: threading.Condition):
+        self.bucket = TokenBucket(rate, burst)
+        self.condition = condition
+        # (priority, sequence) of the sends waiting for a token, best first
+        self.waiters = []
+        self.max_depth = 0
+        # Queued jobs that will send on the account, including those not running yet
+        self.pending = 0
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.wait_times = deque(maxlen=256)
+        self.latencies = deque(maxlen=256)
+
+
+def _is_throttle_error(error: Exception) -> bool:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    response = error.response
+    if response.status_code == 429:
+        return True
+    try:
+        # Graph API throttling comes back as 400/403 with a throttling error code
+        return response.json().get("error", {}).get("code") in THROTTLE_ERROR_CODES
+    except ValueError:
+        return False
+
+
+def _percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return round(1000 * values[int(fraction * (len(values) - 1))], 1) if values else 0.0
+
+
+class OutboundScheduler:
+    """
+    Rate limits outbound Graph API sends per page or Instagram account.
+
+    Each account has a token bucket. Sends run on the caller's thread, which
+    blocks until its account has a token; waiting sends are served by priority
+    (DM replies before comment replies) and in arrival order within a priority,
+    so replies in one conversation keep their order. A send the API throttles
+    pauses its whole account and is retried, as is a send that failed to
+    connect, up to `max_attempts` times before the error is raised to the
+    caller. The scheduler owns these retries: the shared HTTP client does not
+    retry requests made inside a send.
+
+    Intake `track`s each job it queues for an account and can ask `accepting`
+    before queuing more, so a burst of comments is pushed back to Meta instead
+    of piling up behind the rate limit.
+    """
+
+    def __init__(self, rate: float = OUTBOUND_RATE, burst: int = OUTBOUND_BURST,
+                 timeout: float = OUTBOUND_SEND_TIMEOUT, max_attempts: int = OUTBOUND_MAX_ATTEMPTS,
+                 throttle_pause: float = OUTBOUND_THROTTLE_PAUSE, max_backlog: float = OUTBOUND_MAX_BACKLOG):
+        """
+        Initialize the scheduler.
+
+        Args:
+            rate: Sends per second allowed per account.
+            burst: Sends an idle account may make at once.
+            timeout: Default seconds a send may wait for a token.
+            max_attempts: Attempts per send when the API throttles it.
+            throttle_pause: Seconds an account is paused after it was throttled.
+            max_backlog: Seconds of queued sends above which an account stops accepting comment work.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.throttle_pause = throttle_pause
+        self.max_backlog = max_backlog
+        self._lock = threading.Lock()
+        self._accounts: Dict[str, _Account] = {}
+        self._sequence = itertools.count()
+        self.refused = 0
+
+    def _account(self, account: str) -> _Account:
+        state = self._accounts.get(account)
+        if state is None:
+            state = self._accounts[account] = _Account(self.rate, self.burst, threading.Condition(self._lock))
+        return state
+
+    def _acquire(self, state: _Account, priority: int, deadline: float) -> float:
+        """
+        Wait for a token, honouring the priority order of the waiters. Must hold the lock.
+
+        Returns:
+            float: Seconds waited.
+        """
+        started = time.monotonic()
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(state.waiters, ticket)
+        state.max_depth = max(state.max_depth, len(state.waiters))
+        try:
+            while True:
+                now = time.monotonic()
+                wait = state.bucket.wait_time(now)
+                if state.waiters[0] == ticket and wait == 0:
+                    state.bucket.take()
+                    return now - started
+                if now >= deadline:
+                    state.timeouts += 1
+                    raise OutboundTimeout(f"No send slot within {deadline - started:.0f}s")
+                # The head waits for the bucket; everyone else until the head is served
+                state.condition.wait(min(wait, deadline - now) if state.waiters[0] == ticket else deadline - now)
+        finally:
+            state.waiters.remove(ticket)
+            heapq.heapify(state.waiters)
+            state.condition.notify_all()
+
+    def send(self, account: str, func: Callable, *args, priority: int = PRIORITY_DM,
+             timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Call `func(*args, **kwargs)` once the account may send.
+
+        Args:
+            account: The page or Instagram account the send counts against.
+            func: Performs the send; it should raise on failure.
+            priority: PRIORITY_DM or PRIORITY_COMMENT; lower is served first.
+            timeout: Seconds to wait for a slot. Defaults to the scheduler's timeout.
+
+        Returns:
+            Whatever `func` returns.
+
+        Raises:
+            OutboundTimeout: If no slot freed up in time.
+            Exception: Whatever the last attempt of `func` raised.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        for attempt in range(1, self.max_attempts + 1):
+            with self._lock:
+                state = self._account(account)
+                waited = self._acquire(state, priority, deadline)
+                state.wait_times.append(waited)
+            observe_stage("outbound_wait", waited)
+            started = time.monotonic()
+            try:
+                with http_client.retry_limit(0):
+                    result = func(*args, **kwargs)
+            except Exception as e:
+                observe_stage("graph_send", time.monotonic() - started, "error")
+                throttled = _is_throttle_error(e)
+                retry = (throttled or never_sent(e)) and attempt < self.max_attempts
+                with self._lock:
+                    if throttled:
+                        state.throttled += 1
+                        state.bucket.pause(self.throttle_pause)
+                    if not retry:
+                        state.failed += 1
+                if retry:
+                    if throttled:
+                        logger.warning(f"Send for {account} throttled, pausing the account for {self.throttle_pause:g}s")
+                    else:
+                        logger.warning(f"Send for {account} could not connect ({e}), retrying")
+                    continue
+                raise
+            latency = time.monotonic() - started
+            observe_stage("graph_send", latency)
+            with self._lock:
+                state.sent += 1
+                state.latencies.append(latency)
+            return result
+
+    def try_send(self, account: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call `func` only if the account can send right now without delaying
+        anything else; otherwise drop it. Meant for typing indicators and
+        other sends that are worthless when late. Failures are logged, not raised.
+
+        Returns:
+            Whatever `func` returns, or None if it was dropped or failed.
+        """
+        with self._lock:
+            state = self._account(account)
+            if state.waiters or state.bucket.wait_time(time.monotonic()) > 0:
+                state.dropped += 1
+                return None
+            state.bucket.take()
+        try:
+            with http_client.retry_limit(0):
+                return func(*args, **kwargs)
+        except Exception as e:
+            if _is_throttle_error(e):
+                with self._lock:
+                    state.throttled += 1
+                    state.bucket.pause(self.throttle_pause)
+            logger.warning(f"Best-effort send for {account} failed: {e}")
+            return None
+
+    def track(self, account: str):
+        """
+        Count a queued job that will send on the account, until `untrack` is called for it.
+        """
+        with self._lock:
+            self._account(account).pending += 1
+
+    def untrack(self, account: str):
+        """
+        Stop counting a job passed to `track`, once it finished or was dropped.
+        """
+        with self._lock:
+            state = self._account(account)
+            state.pending = max(0, state.pending - 1)
+
+    def backlog(self, account: str) -> float:
+        """
+        Estimated seconds until a new send for the account would go out: any
+        throttle pause, plus the sends of every queued job at the account's rate.
+        """
+        with self._lock:
+            state = self._accounts.get(account)
+            if state is None:
+                return 0.0
+            now = time.monotonic()
+            queued = max(state.pending, len(state.waiters))
+            return max(0.0, state.bucket.paused_until - now) + queued / self.rate
+
+    def accepting(self, account: str, priority: int = PRIORITY_DM) -> bool:
+        """
+        Whether intake should take more work that will send on this account.
+        DM work is always taken; comment work is refused while the backlog is long.
+        """
+        if priority == PRIORITY_DM or self.backlog(account) <= self.max_backlog:
+            return True
+        self.refused += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-account queue depth, wait and send latencies, throttle events and failures.
+        """
+        with self._lock:
+            accounts = {
+                account: {
+                    "queue_depth": len(state.waiters),
+                    "max_queue_depth": state.max_depth,
+                    "pending_jobs": state.pending,
+                    "sent": state.sent,
+                    "failed": state.failed,
+                    "throttled": state.throttled,
+                    "dropped": state.dropped,
+                    "timeouts": state.timeouts,
+                    "paused": state.bucket.paused_until > time.monotonic(),
+                    "wait_ms_p95": _percentile(state.wait_times, 0.95),
+                    "send_ms_p50": _percentile(state.latencies, 0.5),
+                    "send_ms_p95": _percentile(state.latencies, 0.95),
+                }
+                for account, state in self._accounts.items()
+            }
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "queue_depth": sum(account["queue_depth"] for account in accounts.values()),
+            "pending_jobs": sum(account["pending_jobs"] for account in accounts.values()),
+            "throttled": sum(account["throttled"] for account in accounts.values()),
+            "refused_intake": self.refused,
+            "accounts": accounts,
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    A bounded pool of async workers that executes queued jobs in the background.
+
+    Jobs are plain callables. Coroutine functions are awaited on the event loop,
+    while regular (blocking) functions run on a dedicated thread pool so that the
+    OpenAI SDK and HTTP calls never block the uvicorn event loop.
+    """
+
+    def __init__(self, num_workers: int = 8, max_queue_size: int = 1000, name: str = "worker"):
+        """
+        Initialize the worker pool.
+
+        Args:
+            num_workers: Number of concurrent workers.
+            max_queue_size: Maximum number of jobs waiting in the queue.
+            name: Name used in log messages and thread names.
+        """
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self.name = name
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._busy = 0
+        self._wait_times = deque(maxlen=1024)
+        self._max_wait = 0.0
+
+    async def start(self):
+        """
+        Start the workers. Must be called from within the running event loop.
+        """
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix=self.name)
+        self._workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.num_workers)
+        ]
+        logger.info(f"Started {self.num_workers} {self.name} workers (queue size {self.max_queue_size})")
+
+    async def stop(self, timeout: float = 30.0):
+        """
+        Wait for queued jobs to finish and stop the workers.
+
+        Args:
+            timeout: Maximum number of seconds to wait for the queue to drain.
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name} pool stopped with {self._queue.qsize()} jobs still queued")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._executor.shutdown(wait=False)
+
+    def submit(self, func: Callable, *args, **kwargs):
+        """
+        Queue a job without waiting for it to run.
+
+        Args:
+            func: The function or coroutine function to execute.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Raises:
+            RuntimeError: If the pool has not been started.
+            asyncio.QueueFull: If the queue is at capacity.
+        """
+        if self._queue is None:
+            raise RuntimeError(f"{self.name} pool has not been started")
+        try:
+            self._queue.put_nowait((time.monotonic(), func, args, kwargs))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise
+        self._submitted += 1
+
+    async def run_job(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Execute a job on the pool's executor (or the event loop for coroutines).
+
+        Args:
+            func: The function or coroutine function to execute.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            The return value of the job.
+        """
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def _worker(self, index: int):
+        """
+        Pull jobs off the queue and execute them until cancelled.
+        """
+        while True:
+            enqueued_at, func, args, kwargs = await self._queue.get()
+            wait = time.monotonic() - enqueued_at
+            self._wait_times.append(wait)
+            self._max_wait = max(self._max_wait, wait)
+            self._busy += 1
+            try:
+                await self.run_job(func, *args, **kwargs)
+                self._completed += 1
+            except Exception:
+                self._failed += 1
+                logger.exception(f"{self.name} worker {index} failed running {getattr(func, '__name__', func)}")
+            finally:
+                self._busy -= 1
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the pool's metrics.
+
+        Returns:
+            Dictionary with queue depth, worker utilisation, job counters and wait times (ms).
+        """
+        waits = sorted(self._wait_times)
+        return {
+            "workers": self.num_workers,
+            "busy_workers": self._busy,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "wait_ms_avg": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+            "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+            "wait_ms_max": round(1000 * self._max_wait, 2),
+        }
@@ -0,0 +1,3 @@
+from .timing import StartupTimer, startup_timer
+from .lazy import Lazy
+from .disk_cache import DiskCache, startup_cache
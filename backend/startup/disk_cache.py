@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTUP_CACHE_PATH = os.getenv("STARTUP_CACHE_PATH", "startup_cache.json")
+STARTUP_CACHE_TTL = float(os.getenv("STARTUP_CACHE_TTL", 24 * 3600))
+
+
+class DiskCache:
+    """
+    A small JSON file cache with per-entry expiry, used to persist values that
+    are expensive to fetch at startup (tool definitions, resolved ids, ...).
+    """
+
+    def __init__(self, path: str = STARTUP_CACHE_PATH, ttl: float = STARTUP_CACHE_TTL):
+        """
+        Initialize the cache.
+
+        Args:
+            path: Path of the JSON cache file.
+            ttl: Default number of seconds an entry stays valid.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable cache file {self.path}: {e}")
+            return {}
+
+    def _write(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a cached value, or the default if it is missing or expired.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read()
+            entry = self._entries.get(key)
+        if entry is None or entry["expires_at"] <= time.time():
+            return default
+        return entry["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Store a JSON-serialisable value and persist the cache file.
+
+        Args:
+            key: Cache key.
+            value: Value to store.
+            ttl: Override of the default TTL for this entry.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            # Merge with what other processes may have written since we loaded
+            self._entries = self._read()
+            self._entries[key] = {"value": value, "expires_at": time.time() + ttl}
+            try:
+                self._write()
+            except OSError as e:
+                logger.warning(f"Could not write cache file {self.path}: {e}")
+
+    def delete(self, key: str):
+        """
+        Remove a key from the cache file.
+        """
+        with self._lock:
+            self._entries = self._read()
+            if self._entries.pop(key, None) is not None:
+                self._write()
+
+
+startup_cache = DiskCache()
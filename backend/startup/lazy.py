@@ -0,0 +1,58 @@
+import threading
+from typing import Any, Callable, Optional
+
+from .timing import StartupTimer, startup_timer
+
+
+class Lazy:
+    """
+    A value that is computed on first use, exactly once, even when several
+    threads ask for it at the same time. The time it takes is recorded as a
+    startup phase.
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: Optional[str] = None,
+                 timer: StartupTimer = startup_timer):
+        """
+        Initialize the lazy value.
+
+        Args:
+            factory: Zero-argument callable that produces the value.
+            name: Phase name used in the startup timing report.
+            timer: Timer that records how long the factory took.
+        """
+        self.factory = factory
+        self.name = name or getattr(factory, "__name__", "lazy")
+        self.timer = timer
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._value = None
+
+    def get(self) -> Any:
+        """
+        Get the value, computing it if this is the first call.
+
+        Raises:
+            Exception: Whatever the factory raises. Failures are not cached, so
+                the next call retries.
+        """
+        if self._initialized:
+            return self._value
+        with self._lock:
+            if not self._initialized:
+                with self.timer.phase(self.name):
+                    self._value = self.factory()
+                self._initialized = True
+        return self._value
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def reset(self):
+        """
+        Drop the computed value so the next `get` recomputes it.
+        """
+        with self._lock:
+            self._initialized = False
+            self._value = None
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase took, relative to process start.
+    """
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self._phases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self) -> float:
+        return round(1000 * (time.monotonic() - self._started), 2)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Time a block of startup work.
+
+        Args:
+            name: Name of the phase, e.g. "calendar_functions".
+        """
+        start_ms = self._elapsed_ms()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases[name] = {
+                    "start_ms": start_ms,
+                    "duration_ms": round(self._elapsed_ms() - start_ms, 2),
+                }
+
+    def mark(self, name: str):
+        """
+        Record a milestone (e.g. "imports_done") as the time since process start.
+        """
+        with self._lock:
+            self._phases[name] = {"start_ms": 0.0, "duration_ms": self._elapsed_ms()}
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get the per-phase timing breakdown, ordered by start time.
+        """
+        with self._lock:
+            phases = dict(sorted(self._phases.items(), key=lambda item: item[1]["start_ms"]))
+        return {"uptime_ms": self._elapsed_ms(), "phases": phases}
+
+    def log_report(self):
+        """
+        Log the timing breakdown, one line per phase.
+        """
+        for name, phase in self.report()["phases"].items():
+            logger.info(f"startup phase {name}: +{phase['start_ms']}ms took {phase['duration_ms']}ms")
+
+
+startup_timer = StartupTimer()
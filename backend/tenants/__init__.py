@@ -0,0 +1,3 @@
+from .config import TenantConfig, load_tenant_configs, default_tenant_config, DEFAULT_TENANT_ID, TENANTS_PATH
+from .tenant import Tenant
+from .registry import TenantRegistry
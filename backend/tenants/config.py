@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from ai_agent.openai_assistants import VECTOR_STORE_NAME
+from helper.ig_helper import IG_TOKEN_PATH
+from tools.availability import CALENDAR_ID, RESTAURANT_TABLES, RESTAURANT_TIMEZONE
+from vector_database import KNOWLEDGE_DIR
+
+logger = logging.getLogger(__name__)
+
+TENANTS_PATH = os.getenv("TENANTS_PATH", "tenants.json")
+DEFAULT_TENANT_ID = "default"
+
+
+class TenantConfig(NamedTuple):
+    tenant_id: str
+    # Facebook page ids and Instagram account ids whose webhook entries belong to the tenant
+    account_ids: List[str]
+    restaurant_name: str
+    user_name: Optional[str]
+    vector_store_name: str
+    knowledge_dir: str
+    ig_token_path: Optional[str]
+    ig_access_token: Optional[str]
+    facebook_access_token: Optional[str]
+    linked_account_owner_id: Optional[str]
+    calendar_id: str
+    tables: str
+    # IANA zone of the restaurant, which reservation times without an offset are in
+    timezone: str
+    comment_templates: Optional[List[str]]
+
+
+def default_tenant_config() -> TenantConfig:
+    """
+    The tenant configured by environment variables, i.e. the single-restaurant setup.
+    It serves every webhook entry that no configured tenant claims.
+    """
+    return TenantConfig(
+        tenant_id=DEFAULT_TENANT_ID,
+        account_ids=[],
+        restaurant_name="Flatiron Soho",
+        user_name="Jamie",
+        vector_store_name=VECTOR_STORE_NAME,
+        knowledge_dir=KNOWLEDGE_DIR,
+        ig_token_path=IG_TOKEN_PATH,
+        ig_access_token=None,
+        facebook_access_token=os.getenv("FACEBOOK_ACCESS_TOKEN"),
+        linked_account_owner_id=os.getenv("LINKED_ACCOUNT_OWNER_ID"),
+        calendar_id=CALENDAR_ID,
+        tables=RESTAURANT_TABLES,
+        timezone=RESTAURANT_TIMEZONE,
+        comment_templates=None,
+    )
+
+
+def tenant_config_from_dict(data: Dict[str, Any], defaults: TenantConfig) -> TenantConfig:
+    """
+    Build a tenant's config from its JSON object. Missing fields fall back to `defaults`,
+    except the ones that must not be shared between restaurants.
+
+    Raises:
+        ValueError: If the object has no `tenant_id` or no `facebook_access_token`.
+    """
+    tenant_id = data.get("tenant_id")
+    if not tenant_id:
+        raise ValueError(f"Tenant without tenant_id: {data}")
+    if not data.get("facebook_access_token"):
+        # Falling back to the default page's token would send as another restaurant
+        raise ValueError(f"Tenant {tenant_id} has no facebook_access_token")
+    return TenantConfig(
+        tenant_id=str(tenant_id),
+        account_ids=[str(account_id) for account_id in data.get("account_ids", [])],
+        restaurant_name=data.get("restaurant_name", tenant_id),
+        user_name=data.get("user_name"),
+        vector_store_name=data.get("vector_store_name", f"{tenant_id}_restaurant"),
+        knowledge_dir=data.get("knowledge_dir", defaults.knowledge_dir),
+        ig_token_path=data.get("ig_token_path"),
+        ig_access_token=data.get("ig_access_token"),
+        facebook_access_token=data.get("facebook_access_token"),
+        linked_account_owner_id=data.get("linked_account_owner_id", defaults.linked_account_owner_id),
+        calendar_id=data.get("calendar_id", defaults.calendar_id),
+        tables=data.get("tables", defaults.tables),
+        timezone=data.get("timezone", defaults.timezone),
+        comment_templates=data.get("comment_templates"),
+    )
+
+
+def load_tenant_configs(path: str = TENANTS_PATH) -> List[TenantConfig]:
+    """
+    Load the configured tenants from a JSON file: a list of tenant objects, or
+    an object with a "tenants" list. A missing file means single-tenant mode.
+
+    Returns:
+        list: The default tenant first, then the configured ones.
+    """
+    defaults = default_tenant_config()
+    if not os.path.exists(path):
+        return [defaults]
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("tenants", []) if isinstance(data, dict) else data
+    configs = [tenant_config_from_dict(entry, defaults) for entry in entries]
+    logger.info(f"Loaded {len(configs)} tenants from {path}")
+    return [defaults] + [config for config in configs if config.tenant_id != DEFAULT_TENANT_ID]
@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from helper import LRUCache
+from tools import AvailabilityIndex
+
+from .config import DEFAULT_TENANT_ID, TenantConfig
+from .tenant import Tenant
+
+logger = logging.getLogger(__name__)
+
+TENANT_MAX_ACTIVE = int(os.getenv("TENANT_MAX_ACTIVE", 200))
+TENANT_IDLE_TTL = float(os.getenv("TENANT_IDLE_TTL", 3600))
+
+
+class TenantRegistry:
+    """
+    Routes webhook entries to tenants by the page or Instagram account id of the entry.
+
+    Tenants are built on first use and kept in an LRU cache; a tenant that served
+    no event for `idle_ttl` seconds, or the least recently used one once
+    `max_active` are active, is dropped and rebuilt on its next event. Its
+    assistants, vector store id and threads survive in the startup cache and
+    thread store, so a rebuild costs no API calls. Its availability index is
+    kept by the registry and handed to the rebuilt tenant, so holds taken by
+    jobs still running on the evicted instance keep guarding their tables. The
+    default tenant is never evicted and serves every entry that no configured
+    tenant claims.
+    """
+
+    def __init__(self, configs: List[TenantConfig], factory: Callable[[TenantConfig], Tenant],
+                 max_active: int = TENANT_MAX_ACTIVE, idle_ttl: Optional[float] = TENANT_IDLE_TTL):
+        """
+        Initialize the registry.
+
+        Args:
+            configs: The tenant configs, including the default tenant's.
+            factory: Builds a tenant from its config.
+            max_active: Maximum number of non-default tenants kept in memory.
+            idle_ttl: Seconds an unused tenant is kept in memory. None keeps it until evicted by size.
+        """
+        self.factory = factory
+        self.configs: Dict[str, TenantConfig] = {config.tenant_id: config for config in configs}
+        self._by_account: Dict[str, str] = {}
+        for config in configs:
+            for account_id in config.account_ids:
+                if account_id in self._by_account:
+                    logger.warning(f"Account {account_id} is claimed by {self._by_account[account_id]} and {config.tenant_id}")
+                self._by_account[account_id] = config.tenant_id
+
+        self.default = factory(self.configs[DEFAULT_TENANT_ID])
+        self._active = LRUCache(max_size=max_active, ttl=idle_ttl)
+        # One per configured tenant that has been active, bounded by the tenants file
+        self._availability: Dict[str, AvailabilityIndex] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.unrouted = 0
+
+    def get(self, tenant_id: str) -> Tenant:
+        """
+        Get a tenant by id, building it if it is not active.
+
+        Raises:
+            KeyError: If no tenant has this id.
+        """
+        if tenant_id == DEFAULT_TENANT_ID:
+            return self.default
+        config = self.configs[tenant_id]
+        with self._lock:
+            for expired_id, _ in self._active.expire():
+                logger.info(f"Deactivated idle tenant {expired_id}")
+            tenant = self._active.get(tenant_id)
+            if tenant is None:
+                tenant = self.factory(config)
+                tenant.availability = self._availability.setdefault(tenant_id, tenant.availability)
+                self.created += 1
+                logger.info(f"Activated tenant {tenant_id}")
+            # Re-setting restarts the idle timer
+            self._active.set(tenant_id, tenant)
+        return tenant
+
+    def resolve(self, account_id: Optional[str]) -> Tenant:
+        """
+        Get the tenant a webhook entry belongs to.
+
+        Args:
+            account_id: The `id` of the webhook entry (page or Instagram account id).
+
+        Returns:
+            Tenant: The owning tenant, or the default tenant if none claims the account.
+        """
+        tenant_id = self._by_account.get(str(account_id)) if account_id is not None else None
+        if tenant_id is None:
+            if len(self.configs) > 1:
+                self.unrouted += 1
+            return self.default
+        return self.get(tenant_id)
+
+    def active(self) -> List[Tenant]:
+        """
+        Get the tenants currently in memory, the default one first.
+        """
+        return [self.default] + [tenant for _, tenant in self._active.items()]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get routing and eviction counters and the metrics of every active tenant.
+        """
+        cache = self._active.stats()
+        return {
+            "configured": len(self.configs),
+            "active": len(self._active) + 1,
+            "max_active": self._active.max_size,
+            "created": self.created,
+            "evictions": cache["evictions"],
+            "expirations": cache["expirations"],
+            "unrouted_entries": self.unrouted,
+            "tenants": {tenant.id: tenant.stats() for tenant in self.active()},
+        }
@@ -0,0 +1,286 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from ai_agent import CommentFilter, FastPathAnswerer, create_assistant, comment_reply_assistant, forget_assistant
+from ai_agent.openai_assistants import rag as default_rag, vector_store_id as default_vector_store_id
+from helper import (
+    stage, FacebookApiClient, LRUCache, reply_to_instagram_comment, send_instagram_message,
+    send_instagram_sender_action, token_manager
+)
+from pipeline import OutboundScheduler, PRIORITY_COMMENT, PRIORITY_DM
+from startup import Lazy, StartupTimer, startup_timer
+from tools import (
+    AvailabilityIndex, CALENDAR_FUNCTIONS, ToolDispatcher, ToolRegistry, calendar_event_fetcher, event_window,
+    format_time, parse_tables, parse_time, with_party_size
+)
+from tools.dispatcher import TOOL_CALL_WORKERS
+from vector_database import KnowledgeTables, LocalIndex, RAGSystem, directory_fingerprint
+
+from .config import DEFAULT_TENANT_ID, TenantConfig
+
+logger = logging.getLogger(__name__)
+
+# Tool calls of every tenant share one set of threads
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix="tool")
+
+
+class Tenant:
+    """
+    Everything that belongs to one restaurant: its assistants, vector store,
+    knowledge, caches, availability index, tools and access tokens.
+
+    Construction makes no network calls; every remote resource is created on
+    first use, so an idle tenant costs a few small objects. Conversation keys
+    are namespaced by tenant id, except for the default tenant, whose keys stay
+    the plain sender ids used before multi-tenant mode.
+    """
+
+    def __init__(self, config: TenantConfig, openai_client, aci: Lazy,
+                 answer_cache_factory: Callable[[Callable[[], Any]], Any], outbound: OutboundScheduler):
+        """
+        Initialize the tenant.
+
+        Args:
+            config: The tenant's configuration.
+            openai_client: The shared OpenAI client.
+            aci: The shared, lazily created ACI client.
+            answer_cache_factory: Creates an answer cache given its knowledge version function.
+            outbound: Rate limits the tenant's sends, per account, together with every other tenant's.
+
+        Raises:
+            ValueError: If a non-default tenant has no page access token.
+        """
+        if config.tenant_id != DEFAULT_TENANT_ID and not config.facebook_access_token:
+            raise ValueError(f"Tenant {config.tenant_id} has no facebook_access_token")
+        self.config = config
+        self.id = config.tenant_id
+        self.is_default = config.tenant_id == DEFAULT_TENANT_ID
+        self.aci = aci
+        self.outbound = outbound
+        # The default tenant's startup shows in the process startup report; others keep their own
+        self.timer = startup_timer if self.is_default else StartupTimer()
+        suffix = "" if self.is_default else f":{self.id}"
+
+        if self.is_default:
+            self.rag, self.vector_store_id = default_rag, default_vector_store_id
+        else:
+            self.rag = RAGSystem(vector_store_name=config.vector_store_name, client=openai_client)
+            self.vector_store_id = Lazy(self.rag.get_vector_store_id, "vector_store", self.timer)
+
+        self.assistant_id = Lazy(partial(
+            self._create_assistant, create_assistant, config.restaurant_name, config.user_name,
+            cache_key=f"restaurant_concierge{suffix}"
+        ), "concierge_assistant", self.timer)
+        self.comment_assistant_id = Lazy(partial(
+            self._create_assistant, comment_reply_assistant, cache_key=f"instagram_comment_concierge{suffix}"
+        ), "comment_assistant", self.timer)
+        self._assistant_cache_keys = {
+            self.assistant_id: f"restaurant_concierge{suffix}",
+            self.comment_assistant_id: f"instagram_comment_concierge{suffix}",
+        }
+        self.knowledge_index = Lazy(partial(LocalIndex.from_directory, config.knowledge_dir), "knowledge_index", self.timer)
+
+        self.fast_path = FastPathAnswerer(
+            loader=partial(KnowledgeTables.from_directory, config.knowledge_dir),
+            version_fn=partial(directory_fingerprint, config.knowledge_dir),
+        )
+        self.answer_cache = answer_cache_factory(self.knowledge_version)
+        self.comment_filter = CommentFilter(templates=config.comment_templates)
+        self.timezone = ZoneInfo(config.timezone)
+        self.availability = AvailabilityIndex(
+            tables=parse_tables(config.tables),
+            fetch_events=calendar_event_fetcher(aci.get, config.linked_account_owner_id, config.calendar_id),
+            timezone=self.timezone,
+        )
+        # Party size of each conversation's latest check_availability, which its reservation holds a table for
+        self.checked_party_sizes = LRUCache(max_size=10000, ttl=24 * 3600)
+        self.tool_dispatcher = ToolDispatcher(self._tool_registry(), executor=tool_executor)
+
+        # Tokens live in the process-wide token manager, which refreshes file-backed ones
+        self.instagram_account = f"{self.id}:instagram"
+        self.messenger_account = f"{self.id}:messenger"
+        if config.ig_access_token:
+            token_manager.register(self.instagram_account, config.ig_access_token)
+        elif config.ig_token_path:
+            token_manager.register_file(self.instagram_account, config.ig_token_path)
+        self.messenger = Lazy(partial(FacebookApiClient, config.facebook_access_token), "messenger_client", self.timer)
+
+    def _create_assistant(self, factory, *args, **kwargs) -> str:
+        return factory(*args, vector_store_ids=[self.vector_store_id.get()], **kwargs)
+
+    def assistant_missing(self, assistant: Lazy):
+        """
+        Forget one of the tenant's assistants (`assistant_id` or `comment_assistant_id`)
+        after it was found deleted remotely, so its next use finds or recreates it.
+        """
+        forget_assistant(self._assistant_cache_keys[assistant])
+        assistant.reset()
+
+    def knowledge_version(self):
+        """
+        Fingerprint of the knowledge answers are based on: the local files and the vector store files.
+        """
+        return directory_fingerprint(self.config.knowledge_dir), self.rag.files_fingerprint()
+
+    def thread_key(self, sender_id: str) -> str:
+        """
+        The key a sender's thread is stored and ordered under.
+        """
+        return sender_id if self.is_default else f"{self.id}:{sender_id}"
+
+    @property
+    def lazies(self) -> List[Lazy]:
+        """
+        The tenant's lazily created resources, for warm-up.
+        """
+        return [self.assistant_id, self.comment_assistant_id, self.knowledge_index]
+
+    # Messaging -------------------------------------------------------------
+    # Replies wait for their account's rate limit and raise if they can't be sent;
+    # typing indicators are dropped rather than delayed.
+
+    def send_messenger_message(self, recipient_id: str, text: str):
+        return self.outbound.send(
+            self.messenger_account, self.messenger.get().send_message, recipient_id, text,
+            priority=PRIORITY_DM, raise_errors=True
+        )
+
+    def send_messenger_typing(self, recipient_id: str):
+        return self.outbound.try_send(self.messenger_account, self.messenger.get().send_sender_action, recipient_id)
+
+    def send_instagram_message(self, recipient_id: str, text: str):
+        return self.outbound.send(
+            self.instagram_account, send_instagram_message, token_manager.get(self.instagram_account), recipient_id, text,
+            priority=PRIORITY_DM
+        )
+
+    def send_instagram_typing(self, recipient_id: str):
+        return self.outbound.try_send(
+            self.instagram_account, send_instagram_sender_action, token_manager.get(self.instagram_account), recipient_id
+        )
+
+    def reply_to_comment(self, comment_id: str, text: str):
+        return self.outbound.send(
+            self.instagram_account, reply_to_instagram_comment, comment_id, text, self.config.facebook_access_token,
+            priority=PRIORITY_COMMENT
+        )
+
+    # Tools -----------------------------------------------------------------
+
+    def _tool_registry(self) -> ToolRegistry:
+        # Every function the assistant is created with has a handler
+        registry = ToolRegistry()
+        for name, function_name in CALENDAR_FUNCTIONS.items():
+            if name == "reserve_event":
+                # Inserts hold their table in the availability index first
+                registry.register(
+                    function_name, partial(self.reserve_event, function_name), side_effects=True, takes_conversation=True
+                )
+            else:
+                registry.register(function_name, partial(self.execute_calendar_function, function_name), side_effects=True)
+        registry.register("check_availability", self.check_availability, timeout=10, takes_conversation=True)
+        return registry
+
+    def _alternatives(self, start: float, party_size: int) -> List[str]:
+        return [format_time(t, self.timezone) for t in self.availability.alternatives(start, party_size)]
+
+    def check_availability(self, arguments: Dict[str, Any], conversation: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a check_availability tool call from the local availability index.
+
+        Args:
+            arguments: The tool call arguments.
+            conversation: Key of the conversation the check was made in.
+
+        Returns:
+            dict: Whether the slot is free, and nearby free times if it is not.
+        """
+        start = parse_time(arguments["start"], self.timezone)
+        party_size = int(arguments["party_size"])
+        if conversation:
+            self.checked_party_sizes.set(conversation, party_size)
+        if self.availability.is_available(start, party_size):
+            return {"available": True}
+        return {"available": False, "alternatives": self._alternatives(start, party_size)}
+
+    def reserve_event(self, function_name: str, arguments: Dict[str, Any], conversation: Optional[str] = None) -> str:
+        """
+        Insert a reservation through ACI, holding its table locally for the duration of the
+        insert so concurrent requests for the last free table can't both succeed.
+
+        The table is held for the party size the conversation last checked, unless the
+        event itself names a larger one; the event is inserted with that size noted so
+        later syncs seat it the same way.
+
+        Returns:
+            str: The tool output.
+        """
+        window = event_window(arguments, self.timezone)
+        hold = None
+        if window is not None:
+            start, end, party_size = window
+            checked = self.checked_party_sizes.get(conversation) if conversation else None
+            if checked is not None:
+                party_size = max(party_size, checked)
+            arguments = with_party_size(arguments, party_size)
+            hold = self.availability.hold(start, party_size, end)
+            if hold is None:
+                return json.dumps({
+                    "success": False,
+                    "error": "This slot is no longer available.",
+                    "alternatives": self._alternatives(start, party_size),
+                })
+
+        try:
+            with stage("aci_call"):
+                aci_result = self.aci.get().functions.execute(
+                    function_name,
+                    arguments,
+                    linked_account_owner_id=self.config.linked_account_owner_id
+                )
+        except Exception:
+            if hold:
+                self.availability.release(hold.hold_id)
+            raise
+
+        if hold:
+            if aci_result.success:
+                self.availability.confirm(hold.hold_id, (aci_result.data or {}).get("id"))
+            else:
+                self.availability.release(hold.hold_id)
+        return aci_result.model_dump_json()
+
+    def execute_calendar_function(self, function_name: str, arguments: Dict[str, Any]) -> str:
+        """
+        Execute a Google Calendar function through ACI.
+
+        Returns:
+            str: The tool output.
+        """
+        with stage("aci_call"):
+            aci_result = self.aci.get().functions.execute(
+                function_name,
+                arguments,
+                linked_account_owner_id=self.config.linked_account_owner_id
+            )
+        if aci_result.success:
+            # An update or delete may have freed or moved a table
+            self.availability.invalidate()
+        return aci_result.model_dump_json()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the tenant's cache, filter, availability and tool metrics.
+        """
+        return {
+            "answer_cache": self.answer_cache.stats(),
+            "fast_path": self.fast_path.stats(),
+            "comment_filter": self.comment_filter.stats(),
+            "availability": self.availability.stats(),
+            "tools": self.tool_dispatcher.stats(),
+            "startup": None if self.is_default else self.timer.report(),
+        }
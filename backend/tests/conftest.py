@@ -0,0 +1,11 @@
+import os
+
+# Importing the packages builds module-level OpenAI clients, stores and tenants, and
+# reads their settings once; keep them offline, in memory and out of the working directory
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("THREAD_STORE_BACKEND", "memory")
+os.environ.setdefault("DEDUP_BACKEND", "memory")
+os.environ.setdefault("INBOX_ENABLED", "false")
+os.environ.setdefault("TENANTS_PATH", os.path.join(os.path.dirname(__file__), "missing-tenants.json"))
+os.environ.setdefault("FACEBOOK_ACCESS_TOKEN", "test")
+os.environ.setdefault("LINKED_ACCOUNT_OWNER_ID", "test")
@@ -0,0 +1,65 @@
+from ai_agent.answer_cache import SemanticAnswerCache, is_cacheable
+from vector_database import HashingEmbedder
+
+
+def remember(cache, question, answer):
+    """
+    Store an answer the way `reply_to_message` does for a first message without tool calls.
+    """
+    if is_cacheable(question, answer):
+        cache.store(question, answer)
+
+
+def test_standalone_question_is_served_to_other_senders():
+    cache = SemanticAnswerCache(threshold=0.8)
+    remember(cache, "Do you have any vegetarian dishes?", "Yes, the halloumi and the aubergine.")
+
+    assert cache.lookup("do you have any vegetarian dishes") == "Yes, the halloumi and the aubergine."
+
+
+def test_personal_question_is_never_returned_to_another_sender():
+    cache = SemanticAnswerCache(threshold=0.5)
+    question = "What time is my booking?"
+    answer = "Your booking is at 7pm on Friday, Jamie."
+
+    assert not is_cacheable(question, answer)
+    remember(cache, question, answer)
+    # Even a direct store must not make the answer visible to anyone else
+    cache.store(question, answer)
+
+    for other_question in [question, "what time is my booking", "When is our booking?", "What time is the booking?"]:
+        assert cache.lookup(other_question) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_personal_question_does_not_match_a_shared_answer():
+    cache = SemanticAnswerCache(threshold=0.5)
+    remember(cache, "What time do you stop taking bookings?", "We take the last booking at 10pm.")
+
+    assert cache.lookup("What time is my booking?") is None
+
+
+def test_version_check_and_embedding_run_without_the_lock():
+    cache = None
+    versions = iter([1, 2])
+
+    class Embedder:
+        def __init__(self):
+            self.inner = HashingEmbedder()
+
+        def embed(self, texts):
+            assert not cache._lock.locked()
+            return self.inner.embed(texts)
+
+    def version_fn():
+        assert not cache._lock.locked()
+        return next(versions)
+
+    cache = SemanticAnswerCache(embedder=Embedder(), threshold=0.7, version_fn=version_fn, version_check_interval=0)
+    remember(cache, "Do you have any vegetarian dishes?", "Yes, the halloumi and the aubergine.")
+    assert cache.lookup("Do you have vegetarian dishes?") == "Yes, the halloumi and the aubergine."
+    assert cache.stats()["invalidations"] == 0
+
+    # The second version check sees new knowledge and drops the cached answer
+    assert cache.lookup("Do you have any vegetarian dishes?") is None
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,117 @@
+import json
+import types
+
+import httpx
+import pytest
+from openai import NotFoundError
+
+import main
+from ai_agent.assistant_cache import forget_assistant, get_or_update_assistant
+from startup import Lazy
+
+DEFINITION = {"name": "Restaurant Concierge", "model": "gpt-4o-mini", "instructions": "Book tables."}
+
+
+def not_found(assistant_id):
+    request = httpx.Request("POST", "https://api.openai.com/v1/threads/runs")
+    return NotFoundError(f"No assistant found with id '{assistant_id}'.", response=httpx.Response(404, request=request),
+                         body=None)
+
+
+class FakeAssistants:
+    def __init__(self):
+        self.assistants = {}
+        self.calls = []
+        self.created = 0
+
+    def create(self, metadata, **definition):
+        self.calls.append("create")
+        self.created += 1
+        assistant = types.SimpleNamespace(id=f"asst_{self.created}", metadata=metadata)
+        self.assistants[assistant.id] = assistant
+        return assistant
+
+    def retrieve(self, assistant_id):
+        self.calls.append("retrieve")
+        if assistant_id not in self.assistants:
+            raise not_found(assistant_id)
+        return self.assistants[assistant_id]
+
+    def list(self, limit):
+        self.calls.append("list")
+        return list(self.assistants.values())
+
+    def update(self, assistant_id, metadata, **definition):
+        self.calls.append("update")
+        raise not_found(assistant_id)
+
+
+@pytest.fixture
+def assistants():
+    return FakeAssistants()
+
+
+@pytest.fixture
+def client(assistants):
+    return types.SimpleNamespace(beta=types.SimpleNamespace(assistants=assistants))
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "assistant_cache.json")
+
+
+def test_unchanged_definition_makes_no_api_call(client, assistants, cache_path):
+    assistant_id = get_or_update_assistant(client, "concierge", DEFINITION, cache_path)
+    assistants.calls.clear()
+
+    assert get_or_update_assistant(client, "concierge", DEFINITION, cache_path) == assistant_id
+    assert assistants.calls == []
+
+
+def test_deleted_assistant_is_recreated_once_its_entry_is_due_for_a_check(client, assistants, cache_path):
+    assistant_id = get_or_update_assistant(client, "concierge", DEFINITION, cache_path)
+    del assistants.assistants[assistant_id]
+
+    # Within the verify interval the cached id is trusted
+    assert get_or_update_assistant(client, "concierge", DEFINITION, cache_path) == assistant_id
+
+    recreated = get_or_update_assistant(client, "concierge", DEFINITION, cache_path, verify_interval=0)
+    assert recreated != assistant_id
+    with open(cache_path) as f:
+        assert json.load(f)["concierge"]["id"] == recreated
+
+
+def test_existing_assistant_is_verified_and_kept(client, assistants, cache_path):
+    assistant_id = get_or_update_assistant(client, "concierge", DEFINITION, cache_path)
+    assistants.calls.clear()
+
+    assert get_or_update_assistant(client, "concierge", DEFINITION, cache_path, verify_interval=0) == assistant_id
+    assert assistants.calls == ["retrieve"]
+
+
+def test_forgotten_assistant_is_found_again_by_its_metadata(client, assistants, cache_path):
+    assistant_id = get_or_update_assistant(client, "concierge", DEFINITION, cache_path)
+    forget_assistant("concierge", cache_path)
+    assistants.calls.clear()
+
+    assert get_or_update_assistant(client, "concierge", DEFINITION, cache_path) == assistant_id
+    assert assistants.calls == ["list"]
+
+
+def test_run_on_a_deleted_assistant_recreates_it_and_runs_once_more():
+    ids = iter(["asst_deleted", "asst_new"])
+    assistant = Lazy(lambda: next(ids))
+    missing = []
+    tenant = types.SimpleNamespace(assistant_missing=lambda lazy: (missing.append(lazy), lazy.reset()))
+    runs = []
+
+    def runner(client, thread_id, assistant_id, content, add_message=True):
+        runs.append((assistant_id, add_message))
+        if assistant_id == "asst_deleted":
+            raise not_found(assistant_id)
+        return "reply"
+
+    assert main.run_on_assistant(tenant, assistant, runner, "thread", "hi") == "reply"
+    assert runs == [("asst_deleted", True), ("asst_new", False)]
+    assert missing == [assistant]
@@ -0,0 +1,62 @@
+import datetime
+
+from zoneinfo import ZoneInfo
+
+from tools.availability import AvailabilityIndex, event_window, format_time, parse_time, with_party_size
+
+DAY = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+
+
+def at(hour, minute=0):
+    return (DAY + datetime.timedelta(hours=hour, minutes=minute)).isoformat()
+
+
+def event(event_id, start, end, summary="Table for 2"):
+    return {"id": event_id, "summary": summary, "start": {"dateTime": start}, "end": {"dateTime": end}}
+
+
+def test_overlapping_calendar_events_keep_the_table_busy():
+    events = [event("long", at(18), at(22)), event("short", at(18, 30), at(19))]
+    index = AvailabilityIndex(tables=[2], fetch_events=lambda start, end: events)
+
+    # Only the short event starts right before 21:00; the long one still covers the slot
+    slot = parse_time(at(19, 30))
+    assert not index.is_available(slot, 2, slot + 90 * 60)
+    assert index.stats()["bookings"] == 1
+
+
+def test_hold_uses_the_party_size_it_is_given():
+    index = AvailabilityIndex(tables=[2, 6])
+    start = parse_time(at(19))
+
+    hold = index.hold(start, 6)
+
+    assert hold.party_size == 6
+    assert not index.is_available(start, 5)
+    assert index.is_available(start, 2)
+
+
+def test_party_size_is_noted_on_the_inserted_event():
+    arguments = {"path": {"calendarId": "primary"}, "body": event("new", at(19), at(20, 30), summary="Dinner - Sam")}
+
+    annotated = with_party_size(arguments, 6)
+
+    assert event_window(annotated)[2] == 6
+    assert with_party_size(annotated, 4) == annotated
+
+
+def test_naive_times_are_in_the_restaurant_time_zone():
+    london = ZoneInfo("Europe/London")
+    # 19:00 in London during BST is 18:00 UTC, whatever the server's zone
+    assert parse_time("2025-07-01T19:00:00", london) == parse_time("2025-07-01T18:00:00Z")
+    assert parse_time("2025-01-15T19:00:00", london) == parse_time("2025-01-15T19:00:00+00:00")
+    assert format_time(parse_time("2025-07-01T18:00:00Z"), london) == "2025-07-01T19:00"
+
+
+def test_calendar_event_time_zone_wins_over_the_default():
+    window = event_window({
+        "start": {"dateTime": "2025-07-01T19:00:00", "timeZone": "Europe/Paris"},
+        "end": {"dateTime": "2025-07-01T20:30:00+02:00"},
+    }, ZoneInfo("Europe/London"))
+
+    assert window[:2] == (parse_time("2025-07-01T17:00:00Z"), parse_time("2025-07-01T18:30:00Z"))
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import time
+
+from pipeline import KeyedScheduler, WebhookBatch, WorkerPool
+
+
+async def run_batch(batch, jobs, num_workers=8):
+    """
+    Submit `jobs` ((key, func) pairs) as one delivery and wait until every job ran.
+    """
+    pool = WorkerPool(num_workers=num_workers, max_queue_size=100)
+    await pool.start()
+    scheduler = KeyedScheduler(pool)
+    for key, func in jobs:
+        scheduler.submit(key, batch.track(func), gate=batch.gate)
+    batch.seal()
+    while scheduler.stats()["active_keys"]:
+        await asyncio.sleep(0.01)
+    await pool.stop()
+
+
+def test_batch_fans_out_no_wider_than_its_limit():
+    batch = WebhookBatch("instagram", max_concurrency=2)
+    jobs = [(f"sender-{n}", lambda: time.sleep(0.02)) for n in range(6)]
+
+    asyncio.run(run_batch(batch, jobs))
+
+    stats = batch.stats()
+    assert stats["events"] == 6 and stats["failed"] == 0
+    assert stats["max_concurrency"] == 2
+    assert batch.gate.active == 0
+
+
+def test_batch_counts_failures_and_logs_once_all_events_finished(caplog):
+    def fail():
+        raise RuntimeError("boom")
+
+    batch = WebhookBatch("messenger", max_concurrency=4)
+    with caplog.at_level(logging.INFO, logger="pipeline.batch"):
+        asyncio.run(run_batch(batch, [("alice", fail), ("bob", lambda: None)]))
+
+    assert batch.stats()["failed"] == 1
+    summaries = [r.message for r in caplog.records if r.message.startswith(f"Webhook batch {batch.id}")]
+    assert len(summaries) == 1
+    assert "2 events, 1 failed" in summaries[0]
+
+
+def test_untracked_event_does_not_hold_the_batch_open(caplog):
+    batch = WebhookBatch("messenger")
+    handler = batch.track(lambda: None)
+    batch.track(lambda: None)
+    # The second event could not be queued
+    batch.untrack()
+    batch.seal()
+
+    with caplog.at_level(logging.INFO, logger="pipeline.batch"):
+        handler()
+
+    assert batch.stats()["events"] == 1
+    assert any("1 events, 0 failed" in r.message for r in caplog.records)
@@ -0,0 +1,69 @@
+import types
+
+from benchmark import SCENARIOS, compare, generate_events, percentiles
+from benchmark.runner import stage_latencies, stage_totals, summarize
+from helper import MetricsRegistry
+
+
+def test_percentiles_are_in_milliseconds():
+    assert percentiles([0.001 * n for n in range(1, 101)]) == {"p50": 51.0, "p95": 96.0, "p99": 100.0, "max": 100.0}
+    assert percentiles([]) == {"p50": None, "p95": None, "p99": None, "max": None}
+
+
+def test_events_are_repeatable_and_come_from_new_senders():
+    scenario = SCENARIOS["mixed"]._replace(rate=10, duration=2)
+
+    first = list(generate_events(scenario, "run1", seed=7))
+    second = list(generate_events(scenario, "run1", seed=7))
+
+    assert len(first) == 20
+    assert [kind for kind, _ in first] == [kind for kind, _ in second]
+    assert len({event.reply_key for _, event in first}) == 20
+    assert {event.path for _, event in first} <= {"/webhook", "/fb_webhook"}
+
+
+def test_stage_latencies_are_read_from_the_backends_metrics():
+    registry = MetricsRegistry()
+    latency = registry.histogram(
+        "stage_latency_seconds", "Latency.", ("stage", "channel", "assistant", "outcome")
+    )
+    latency.observe(0.5, stage="run", channel="instagram", assistant="concierge", outcome="ok")
+    before = stage_totals(registry.render())
+    latency.observe(1.0, stage="run", channel="instagram", assistant="concierge", outcome="ok")
+    latency.observe(2.0, stage="run", channel="messenger", assistant="concierge", outcome="error")
+    latency.observe(0.1, stage="send", channel="messenger", assistant="concierge", outcome="ok")
+
+    assert stage_latencies(before, stage_totals(registry.render())) == {
+        "run": {"count": 2, "mean_ms": 1500.0},
+        "send": {"count": 1, "mean_ms": 100.0},
+    }
+
+
+def test_summary_counts_rejections_errors_and_missing_replies():
+    scenario = SCENARIOS["dm_assistant"]
+    records = [
+        {"kind": "ig_dm", "reply_key": "a", "sent_at": 10.0, "status": 200, "ack_latency": 0.01},
+        {"kind": "ig_dm", "reply_key": "b", "sent_at": 11.0, "status": 200, "ack_latency": 0.02},
+        {"kind": "ig_dm", "reply_key": "c", "sent_at": 12.0, "status": 503, "ack_latency": 0.01},
+        {"kind": "ig_dm", "reply_key": "d", "sent_at": 13.0, "status": 200, "ack_latency": 0.01},
+    ]
+    fakes = types.SimpleNamespace(deliveries={"a": [12.0], "b": [14.0]}, requests={"send": 2})
+
+    result = summarize(scenario, records, fakes)
+
+    assert (result["replies"], result["rejected"], result["errors"], result["missing_replies"]) == (2, 1, 0, 1)
+    assert result["error_rate"] == 0.5
+    assert result["throughput"] == 0.5
+    assert result["reply_ms"]["max"] == 3000.0
+
+
+def test_compare_reports_the_change_of_each_metric():
+    def results(commit, p50):
+        metrics = {"reply_ms": {"p50": p50, "p95": p50, "p99": p50}, "ack_ms": {"p99": 5.0},
+                   "throughput": 4.0, "error_rate": 0.0}
+        return {"git": {"commit": commit}, "scenarios": {"dm_assistant": metrics}}
+
+    report = compare(results("abc", 200.0), results("def", 150.0))
+
+    assert report.splitlines()[0] == "abc -> def"
+    assert "reply p50 ms        200.0 ->      150.0  -25.0%" in report
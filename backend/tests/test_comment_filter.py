@@ -0,0 +1,29 @@
+import pytest
+
+from ai_agent.comment_filter import CANNED, IGNORE, NEEDS_LLM, CommentFilter
+
+
+@pytest.fixture
+def comment_filter():
+    return CommentFilter(templates=["Thank you!"])
+
+
+@pytest.mark.parametrize("text", ["not amazing at all", "amazing... not", "Wasn't amazing tbh", "never so good before"])
+def test_negated_praise_goes_to_the_assistant(comment_filter, text):
+    assert comment_filter.classify(text).action == NEEDS_LLM
+
+
+@pytest.mark.parametrize("text", ["sooooooo good", "Loveeeeeeee this", "Amazing!!!!!!!"])
+def test_enthusiastic_comments_are_not_spam(comment_filter, text):
+    assert comment_filter.classify(text).action != IGNORE
+
+
+@pytest.mark.parametrize("text", ["aaaaaaaaaaaa", "$$$$$$$ cash"])
+def test_keyboard_noise_is_ignored(comment_filter, text):
+    assert comment_filter.classify(text).action == IGNORE
+
+
+def test_plain_praise_gets_a_canned_reply(comment_filter):
+    decision = comment_filter.classify("looks so good 😍")
+    assert decision.action == CANNED
+    assert decision.reply == "Thank you!"
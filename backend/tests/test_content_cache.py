@@ -0,0 +1,79 @@
+import os
+import types
+
+import pytest
+
+from startup import Lazy
+from vector_database import ContentCache, RAGSystem
+from vector_database import rag as rag_module
+
+
+def add(cache, file_id, content):
+    temp_path = cache.temp_path(file_id)
+    with open(temp_path, "w") as f:
+        f.write(content)
+    return cache.commit(file_id, temp_path)
+
+
+def test_least_recently_used_files_are_evicted_past_the_cap(tmp_path):
+    cache = ContentCache(directory=str(tmp_path), max_bytes=10)
+    add(cache, "file_a", "aaaa")
+    add(cache, "file_b", "bbbb")
+    assert cache.read_text("file_a") == "aaaa"
+
+    add(cache, "file_c", "cccc")
+
+    assert cache.get("file_b") is None
+    assert not os.path.exists(cache.path("file_b"))
+    assert cache.read_text("file_a") == "aaaa"
+    assert cache.stats()["bytes"] == 8 and cache.stats()["evictions"] == 1
+
+
+def test_cache_is_reloaded_from_disk_without_partial_downloads(tmp_path):
+    cache = ContentCache(directory=str(tmp_path))
+    add(cache, "file_a", "menu")
+    with open(cache.temp_path("file_b"), "w") as f:
+        f.write("interrupted")
+
+    reloaded = ContentCache(directory=str(tmp_path))
+
+    assert reloaded.read_text("file_a") == "menu"
+    assert reloaded.stats()["files"] == 1
+    assert os.listdir(tmp_path) == ["file_a"]
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    cache = ContentCache(directory=str(tmp_path / "cache"))
+    monkeypatch.setattr(rag_module, "content_cache", Lazy(lambda: cache))
+    client = types.SimpleNamespace(api_key="test", base_url="https://api.openai.com/v1/")
+    rag = RAGSystem("soho", client=client)
+    rag._vector_store_id = "vs_1"
+    return rag
+
+
+def test_fetch_downloads_only_files_not_cached(rag, monkeypatch):
+    downloads = []
+
+    def download(url, path, headers):
+        file_id = url.split("/")[-2]
+        if file_id == "file_broken":
+            raise RuntimeError("404")
+        downloads.append(url)
+        with open(path, "w") as f:
+            f.write(f"content of {file_id}")
+        return 20
+
+    monkeypatch.setattr(rag_module.http_client, "download", download)
+    assert rag.retrieve_vector_store_file_content("vs_1", "file_a") == "content of file_a"
+
+    report = rag.fetch_vector_store_files(["file_a", "file_b", "file_broken"])
+
+    assert downloads == [
+        "https://api.openai.com/v1/vector_stores/vs_1/files/file_a/content",
+        "https://api.openai.com/v1/vector_stores/vs_1/files/file_b/content",
+    ]
+    assert report.cache_hits == 1 and report.bytes_downloaded == 20
+    assert set(report.paths) == {"file_a", "file_b"}
+    assert list(report.errors) == ["file_broken"]
+    assert not [name for name in os.listdir(rag_module.content_cache.get().directory) if name.endswith(".tmp")]
@@ -0,0 +1,137 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from pipeline import DedupStore, event_key
+
+
+def test_repeat_is_suppressed_until_forgotten():
+    store = DedupStore()
+    assert store.check_and_mark("message:m1")
+    assert not store.check_and_mark("message:m1")
+
+    store.forget("message:m1")
+    assert store.check_and_mark("message:m1")
+    assert store.stats()["suppressed_duplicates"] == 1
+
+
+def test_memory_keys_are_bounded_and_expire():
+    store = DedupStore(retention=0.05, max_size=2)
+    for key in ("a", "b", "c"):
+        assert store.check_and_mark(key)
+    assert store.stats()["memory_keys"] == 2
+    # "a" was evicted, so with no SQLite table behind it it looks new again
+    assert store.check_and_mark("a")
+
+    time.sleep(0.1)
+    assert store.check_and_mark("c")
+
+
+def test_sqlite_survives_a_restart(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    assert DedupStore(path=path).check_and_mark("message:m1")
+
+    restarted = DedupStore(path=path)
+    assert not restarted.check_and_mark("message:m1")
+    assert restarted.check_and_mark("message:m2")
+
+
+def test_sqlite_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    first, second = DedupStore(path=path), DedupStore(path=path)
+    assert first.check_and_mark("comment:c1")
+    assert not second.check_and_mark("comment:c1")
+
+    first.forget("comment:c1")
+    assert DedupStore(path=path).check_and_mark("comment:c1")
+
+
+def test_sqlite_key_is_accepted_again_after_retention(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    assert DedupStore(retention=0.05, path=path).check_and_mark("message:m1")
+    time.sleep(0.1)
+    assert DedupStore(retention=0.05, path=path).check_and_mark("message:m1")
+
+
+def test_event_key_is_stable_across_redeliveries():
+    entry = {"id": "page", "time": 1}
+    assert event_key("message", entry, {"message": {"mid": "m1"}}) == "message:m1"
+    assert event_key("comment", entry, {"id": "c1", "text": "hi"}) == "comment:c1"
+
+    messaging = {"sender": {"id": "u1"}, "timestamp": 5, "read": {}}
+    assert event_key("message", entry, messaging) == event_key("message", dict(entry), dict(messaging))
+    assert event_key("message", entry, messaging) != event_key("message", entry, {**messaging, "timestamp": 6})
+
+
+def test_repeats_in_a_delivery_are_answered_by_the_front(tmp_path):
+    store = DedupStore(path=str(tmp_path / "dedup.db"))
+    assert asyncio.run(store.check_and_mark_many(["m1", "m2", "m1"])) == [True, True, False]
+    commits = store.commits
+
+    # A redelivery is answered from memory, without a SQLite write
+    assert asyncio.run(store.check_and_mark_many(["m1", "m2"])) == [False, False]
+    assert store.commits == commits
+    assert store.stats()["front_hits"] == 3
+    store.close()
+
+
+def test_sqlite_writes_are_batched_off_the_event_loop(tmp_path, monkeypatch):
+    store = DedupStore(path=str(tmp_path / "dedup.db"))
+    write_mark = store._write_mark
+
+    def slow_write_mark(keys, now):
+        time.sleep(0.05)
+        return write_mark(keys, now)
+
+    monkeypatch.setattr(store, "_write_mark", slow_write_mark)
+
+    async def deliveries():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        results = await asyncio.gather(*(store.check_and_mark_many([f"m{n}", "shared"]) for n in range(20)))
+        ticker.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(deliveries())
+
+    assert all(result[0] for result in results)
+    assert sum(result[1] for result in results) == 1
+    # The loop kept running while the writer thread committed, and deliveries shared commits
+    assert ticks > 10
+    assert store.commits < 20
+    store.close()
+
+
+def test_forget_is_committed_before_a_redelivery(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    store = DedupStore(path=path)
+    assert asyncio.run(store.check_and_mark_many(["m1"])) == [True]
+    store.forget("m1")
+    assert asyncio.run(store.check_and_mark_many(["m1"])) == [True]
+    store.close()
+
+    assert not DedupStore(path=path).check_and_mark("m1")
+
+
+def test_failed_write_remembers_nothing(tmp_path, monkeypatch):
+    store = DedupStore(path=str(tmp_path / "dedup.db"))
+
+    def broken(keys, now):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(store, "_write_mark", broken)
+    with pytest.raises(sqlite3.Error):
+        asyncio.run(store.check_and_mark_many(["m1"]))
+
+    monkeypatch.undo()
+    assert asyncio.run(store.check_and_mark_many(["m1"])) == [True]
+    store.close()
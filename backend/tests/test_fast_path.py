@@ -0,0 +1,91 @@
+import pytest
+
+from ai_agent.fast_path import FastPathAnswerer
+from vector_database.knowledge_tables import KnowledgeTables, parse_menu, parse_operations
+
+MENU = """
+SIDES:
+- Green Salad: £3.5
+- Roast Aubergine (Tomato, basil, mozzarella): £4.5 (*Also available as a main dish for £9.0)
+
+DRINKS:
+- Freedom Four Lager (4.0%): £4.8
+- Lucky Saint Unfiltered Lager (0.5%): £5.0
+- HOUSE FIZZES: £3.5 each (Lime & Mint / Apple & Rhubarb / Rose Lemonade)
+"""
+
+
+@pytest.fixture
+def answerer():
+    tables = KnowledgeTables(parse_menu(MENU), {}, [])
+    return FastPathAnswerer(loader=lambda: tables, version_fn=lambda: 1)
+
+
+@pytest.mark.parametrize("question", [
+    "How much is the sunday roast?",
+    "How much is the house wine?",
+    "How much is a bottle of the house red?",
+    "How much is a house salad?",
+    "How much is the lager?",
+])
+def test_price_question_with_uncovered_words_goes_to_the_assistant(answerer, question):
+    assert answerer.answer(question) is None
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("How much is the roast aubergine?", "Roast Aubergine is £4.50 / £9.00 (main dish)."),
+    ("How much is a Freedom Four Lager?", "Freedom Four Lager is £4.80."),
+    ("What's the price of the green salad?", "Green Salad is £3.50."),
+])
+def test_price_question_naming_one_item_is_answered(answerer, question, answer):
+    assert answerer.answer(question) == answer
+
+
+OPERATIONS = """
+Location/Address:
+Flat Iron Soho
+17 Beak Street
+London W1F 9RW
+
+Opening Hours:
+- Sunday – Tuesday: 12:00 PM – 10:00 PM (12:00 – 22:00)
+- Wednesday – Thursday: 12:00 PM – 11:00 PM (12:00 – 23:00)
+- Friday – Saturday: 12:00 PM – 11:30 PM (12:00 – 23:30)
+"""
+
+
+@pytest.fixture
+def operations_answerer():
+    tables = KnowledgeTables([], *parse_operations(OPERATIONS))
+    return FastPathAnswerer(loader=lambda: tables, version_fn=lambda: 1)
+
+
+@pytest.mark.parametrize("question", [
+    "What time is it?",
+    "Is it open now?",
+    "Are you still open?",
+    "What time is last orders on sunday?",
+    "When does the kitchen close on Friday?",
+    "Where is your other location in Manchester?",
+    "What's the address of the branch near Covent Garden?",
+    "Are you open in Shoreditch?",
+])
+def test_questions_the_tables_cannot_answer_go_to_the_assistant(operations_answerer, question):
+    assert operations_answerer.answer(question) is None
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("What time do you close on Sunday?", "We close at 10:00 PM on Sunday."),
+    ("What time do you open on Friday?", "We open at 12:00 PM on Friday."),
+    ("What's your address?", "You'll find us at Flat Iron Soho, 17 Beak Street, London W1F 9RW."),
+    ("What's your location?", "You'll find us at Flat Iron Soho, 17 Beak Street, London W1F 9RW."),
+])
+def test_hours_and_address_lookups_are_answered(operations_answerer, question, answer):
+    assert operations_answerer.answer(question) == answer
+
+
+def test_weekly_hours_are_summarised(operations_answerer):
+    assert operations_answerer.answer("What are your opening hours?") == (
+        "Our opening hours are Sunday–Tuesday: 12:00 PM – 10:00 PM; Wednesday–Thursday: 12:00 PM – 11:00 PM; "
+        "Friday–Saturday: 12:00 PM – 11:30 PM."
+    )
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+
+from helper import ig_helper
+from helper.http_client import HttpClient
+
+URL = "https://graph.facebook.com/v21.0/me/messages"
+
+
+def client_with(responses):
+    """
+    An HttpClient whose requests are answered (or raised) from `responses`, in order.
+    """
+    calls = []
+
+    def handle(request):
+        calls.append(request.method)
+        outcome = responses[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    client = HttpClient(max_retries=3, backoff_base=0)
+    client._sync_client = httpx.Client(transport=httpx.MockTransport(handle))
+    return client, calls
+
+
+@pytest.mark.parametrize("failure", [httpx.Response(503), httpx.ReadTimeout("read timed out")])
+def test_send_that_may_have_been_processed_is_not_retried(failure):
+    client, calls = client_with([failure, httpx.Response(200)])
+
+    if isinstance(failure, Exception):
+        with pytest.raises(httpx.ReadTimeout):
+            client.request("POST", URL, json={})
+    else:
+        assert client.request("POST", URL, json={}).status_code == 503
+    assert calls == ["POST"]
+
+
+@pytest.mark.parametrize("failure", [httpx.Response(429), httpx.ConnectError("connection refused")])
+def test_send_that_was_not_processed_is_retried(failure):
+    client, calls = client_with([failure, httpx.Response(200)])
+
+    assert client.request("POST", URL, json={}).status_code == 200
+    assert calls == ["POST", "POST"]
+
+
+def test_read_is_retried_on_server_errors():
+    client, calls = client_with([httpx.Response(502), httpx.Response(200)])
+
+    assert client.request("GET", URL).status_code == 200
+    assert calls == ["GET", "GET"]
+
+
+def test_send_error_with_html_body_raises_the_http_error(monkeypatch):
+    client, _ = client_with([httpx.Response(502, text="<html>Bad Gateway</html>")])
+    monkeypatch.setattr(ig_helper, "http_client", client)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        ig_helper.send_instagram_message("token", "user", "hello")
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline import WebhookInbox
+from pipeline.inbox import DONE, FAILED, LEASED
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "inbox.db")
+
+
+@pytest.fixture
+def open_inbox(path):
+    opened = []
+
+    def open_inbox(**kwargs):
+        inbox = WebhookInbox(path=path, **kwargs)
+        opened.append(inbox)
+        return inbox
+
+    yield open_inbox
+    for inbox in opened:
+        inbox.close()
+
+
+def append(inbox, *keys):
+    return asyncio.run(inbox.append([(key, "facebook", "default", {"key": key}) for key in keys]))
+
+
+def test_database_is_created_on_first_use(tmp_path, path, open_inbox):
+    inbox = open_inbox()
+    assert list(tmp_path.iterdir()) == []
+
+    append(inbox, "message:m1")
+    assert (tmp_path / "inbox.db").exists()
+
+
+def test_event_keys_are_appended_once(open_inbox):
+    inbox = open_inbox()
+    first, duplicate = append(inbox, "message:m1", "message:m1")
+    assert first is not None and duplicate is None
+
+    # Another process, or this one after a restart, sees the same row
+    assert append(open_inbox(), "message:m1", "message:m2")[0] is None
+    assert inbox.stats()["duplicates"] == 1
+
+
+def test_discarded_event_is_appended_again(open_inbox):
+    inbox = open_inbox()
+    [event_id] = append(inbox, "message:m1")
+    inbox.discard(event_id).result()
+    assert append(inbox, "message:m1")[0] is not None
+
+
+def test_crashed_process_events_are_reclaimed(open_inbox):
+    crashed = open_inbox(lease_seconds=0.05)
+    [event_id] = append(crashed, "message:m1")
+    survivor = open_inbox(lease_seconds=60)
+    assert survivor.reclaim() == []
+
+    # The crashed process never renews, so its lease runs out
+    time.sleep(0.1)
+    [event] = survivor.reclaim()
+    assert (event.id, event.payload, event.status, event.attempts) == (event_id, {"key": "message:m1"}, LEASED, 2)
+    assert survivor.reclaim() == []
+
+    survivor.complete(event.id).result()
+    assert survivor.get(event.id).status == DONE
+
+
+def test_renewed_lease_is_not_reclaimed(open_inbox):
+    live = open_inbox(lease_seconds=0.2)
+    append(live, "message:m1")
+    time.sleep(0.15)
+    assert live.renew() == 1
+    time.sleep(0.1)
+    assert open_inbox().reclaim() == []
+
+
+def test_event_fails_after_max_attempts(open_inbox):
+    inbox = open_inbox(lease_seconds=0.01, max_attempts=2)
+    [event_id] = append(inbox, "message:m1")
+    time.sleep(0.02)
+    assert len(inbox.reclaim()) == 1
+    time.sleep(0.02)
+    assert inbox.reclaim() == []
+
+    event = inbox.get(event_id)
+    assert event.status == FAILED
+    assert event.error == "Lease expired 2 times"
+
+
+def test_released_event_is_reclaimed_without_counting_an_attempt(open_inbox):
+    inbox = open_inbox(lease_seconds=60)
+    [event_id] = append(inbox, "message:m1")
+    inbox.release(event_id).result()
+
+    [event] = inbox.reclaim()
+    assert (event.id, event.attempts) == (event_id, 1)
+
+
+def test_prune_deletes_finished_events_after_retention(open_inbox):
+    inbox = open_inbox(retention=0)
+    done, failed, running = append(inbox, "message:m1", "message:m2", "message:m3")
+    inbox.complete(done)
+    inbox.fail(failed, "boom").result()
+    time.sleep(0.01)
+
+    assert inbox.prune() == 2
+    assert [event.id for event in inbox.events()] == [running]
+
+
+def test_concurrent_writes_are_group_committed(open_inbox):
+    inbox = open_inbox()
+    [event_id] = append(inbox, "message:m1")
+    commits = inbox.commits
+
+    # Hold the writer back so the writes queue up behind the commit it is waiting on
+    with inbox._lock:
+        futures = [inbox.complete(event_id) for _ in range(20)]
+        time.sleep(0.05)
+    for future in futures:
+        future.result()
+
+    assert inbox.commits - commits <= 2
+    assert inbox.max_commit_size >= 19
@@ -0,0 +1,71 @@
+import asyncio
+import random
+import time
+
+from pipeline import BatchGate, KeyedScheduler, WorkerPool
+
+
+async def run_jobs(submit_all, num_workers=4, max_queue_size=100):
+    """
+    Start a pool, let `submit_all(scheduler)` queue jobs, and wait until every job ran.
+    """
+    pool = WorkerPool(num_workers=num_workers, max_queue_size=max_queue_size)
+    await pool.start()
+    scheduler = KeyedScheduler(pool)
+    submit_all(scheduler)
+    while scheduler.stats()["active_keys"]:
+        await asyncio.sleep(0.01)
+    await pool.stop()
+    return scheduler
+
+
+def test_jobs_for_one_key_run_in_submission_order():
+    done = []
+
+    def job(key, n):
+        time.sleep(random.uniform(0, 0.01))
+        done.append((key, n))
+
+    def submit_all(scheduler):
+        for n in range(10):
+            for key in ("alice", "bob", "carol"):
+                scheduler.submit(key, job, key, n)
+
+    scheduler = asyncio.run(run_jobs(submit_all))
+
+    for key in ("alice", "bob", "carol"):
+        assert [n for k, n in done if k == key] == list(range(10))
+    assert scheduler.stats()["max_key_depth"] > 1
+
+
+def test_keys_run_in_parallel():
+    def submit_all(scheduler):
+        for key in range(4):
+            scheduler.submit(key, time.sleep, 0.2)
+
+    started = time.monotonic()
+    asyncio.run(run_jobs(submit_all))
+    assert time.monotonic() - started < 0.6
+
+
+def test_gated_drain_resumes_once_a_slot_frees_up():
+    gate = BatchGate(limit=1)
+    done = []
+
+    def job(key):
+        assert gate.active == 1
+        time.sleep(0.01)
+        done.append(key)
+
+    def submit_all(scheduler):
+        for key in ("alice", "bob", "carol"):
+            scheduler.submit(key, job, key, gate=gate)
+        # Queued behind alice's drain, which is still waiting for its first job
+        scheduler.submit("alice", job, "alice again", gate=gate)
+
+    asyncio.run(run_jobs(submit_all))
+
+    assert sorted(done) == ["alice", "alice again", "bob", "carol"]
+    assert done.index("alice") < done.index("alice again")
+    assert gate.max_active == 1 and gate.active == 0
+
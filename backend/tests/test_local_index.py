@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from vector_database import (
+    Chunk, HashingEmbedder, LocalIndex, chunk_text, content_tokens, directory_fingerprint, tokenize,
+)
+
+CHUNKS = [
+    Chunk("Opening Hours:\n\nMonday to Sunday 12:00 to 23:00.", "operations.txt"),
+    Chunk("The Flat Iron steak costs £15.0 and comes with a side of your choice.", "menu.txt"),
+    Chunk("Dogs are welcome in the bar area but not in the dining room.", "operations.txt"),
+    Chunk("Our beef is dry-aged for at least 21 days on our own farm.", "beef.txt"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LocalIndex(CHUNKS)
+
+
+def test_prices_and_times_are_single_tokens():
+    assert tokenize("Steak £15.0 at 12:00") == ["steak", "£15.0", "at", "12:00"]
+    assert content_tokens("What time do you open?") == ["time", "open"]
+
+
+def test_headings_stay_with_the_paragraph_that_follows():
+    text = "Opening Hours:\n\nDaily 12:00 to 23:00.\n\n" + "Menu\n\n" + "x" * 50
+    chunks = chunk_text(text, "ops.txt", max_chars=40)
+
+    assert chunks[0] == Chunk("Opening Hours:\n\nDaily 12:00 to 23:00.", "ops.txt")
+    assert all(chunk.source == "ops.txt" for chunk in chunks)
+    assert len(chunks) == 3
+
+
+@pytest.mark.parametrize("mode", ["bm25", "vector", "hybrid"])
+def test_search_ranks_the_matching_chunk_first(index, mode):
+    results = index.search("are dogs allowed in the dining room", k=2, mode=mode)
+
+    assert len(results) == 2
+    assert results[0].text.startswith("Dogs are welcome")
+    assert results[0].score >= results[1].score
+
+
+def test_bm25_scores_unknown_terms_zero(index):
+    assert not index.bm25_scores("zzz qqq").any()
+    assert index.search("zzz qqq", mode="bm25", min_score=0.01) == []
+
+
+def test_hashing_embedder_rows_are_unit_length():
+    embeddings = HashingEmbedder(dim=64).embed(["steak and chips", "", "dogs"])
+
+    assert embeddings.shape == (3, 64)
+    np.testing.assert_allclose(np.linalg.norm(embeddings[[0, 2]], axis=1), 1.0, rtol=1e-5)
+    assert not embeddings[1].any()
+
+
+def test_empty_index_and_unknown_mode():
+    assert LocalIndex([]).search("anything") == []
+    with pytest.raises(ValueError):
+        LocalIndex(CHUNKS[:1]).search("hours", mode="semantic")
+
+
+def test_directory_fingerprint_changes_when_a_file_changes(tmp_path):
+    path = tmp_path / "menu.txt"
+    path.write_text("Steak £15.0")
+    before = directory_fingerprint(str(tmp_path))
+    index = LocalIndex.from_directory(str(tmp_path))
+
+    path.write_text("Steak £16.0 and chips")
+    os.utime(path, ns=(1, 1))
+
+    assert directory_fingerprint(str(tmp_path)) != before
+    assert index.chunks == [Chunk("Steak £15.0", "menu.txt")]
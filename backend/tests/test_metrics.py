@@ -0,0 +1,86 @@
+import logging
+import threading
+
+import pytest
+
+from helper import MetricsRegistry, bind, current_trace_id, stage, TraceIdFilter
+from helper.metrics import STAGE_LATENCY
+
+
+def test_counter_and_gauge_render_in_prometheus_text_format():
+    registry = MetricsRegistry(namespace="test")
+    sent = registry.counter("replies_total", "Replies sent.", ("channel",))
+    sent.inc(channel="instagram")
+    sent.inc(2, channel='say "hi"\n')
+    registry.gauge("queue_depth", "Jobs waiting.", lambda: {("outbound",): 3}, ("queue",))
+    registry.gauge("broken", "Fails to read.", lambda: 1 / 0)
+
+    assert registry.render() == (
+        "# HELP test_replies_total Replies sent.\n"
+        "# TYPE test_replies_total counter\n"
+        'test_replies_total{channel="instagram"} 1.0\n'
+        'test_replies_total{channel="say \\"hi\\"\\n"} 2.0\n'
+        "# HELP test_queue_depth Jobs waiting.\n"
+        "# TYPE test_queue_depth gauge\n"
+        'test_queue_depth{queue="outbound"} 3.0\n'
+        "# HELP test_broken Fails to read.\n"
+        "# TYPE test_broken gauge\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry(namespace="test")
+    latency = registry.histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(seconds, stage="run")
+
+    assert registry.render().splitlines()[2:] == [
+        'test_latency_seconds_bucket{stage="run",le="0.1"} 2',
+        'test_latency_seconds_bucket{stage="run",le="1.0"} 3',
+        'test_latency_seconds_bucket{stage="run",le="+Inf"} 4',
+        'test_latency_seconds_sum{stage="run"} 3.65',
+        'test_latency_seconds_count{stage="run"} 4',
+    ]
+
+
+def test_registering_a_metric_twice_returns_the_first():
+    registry = MetricsRegistry(namespace="test")
+    assert registry.counter("a_total", "A.") is registry.counter("a_total", "A.")
+
+
+def stage_count(**labels):
+    key = tuple(labels[name] for name in STAGE_LATENCY.labelnames)
+    counts, _ = STAGE_LATENCY._values.get(key, ([0], [0.0]))
+    return sum(counts)
+
+
+def test_stage_is_labeled_from_the_bound_trace_context():
+    labels = dict(stage="test_stage", channel="messenger", assistant="concierge")
+    before_ok, before_error = stage_count(**labels, outcome="ok"), stage_count(**labels, outcome="error")
+
+    def handle(fail):
+        with stage("test_stage"):
+            if fail:
+                raise RuntimeError("boom")
+        return current_trace_id()
+
+    traced = bind(handle, trace_id="abc123", channel="messenger", assistant="concierge")
+    results = []
+    worker = threading.Thread(target=lambda: results.append(traced(False)))
+    worker.start()
+    worker.join()
+    with pytest.raises(RuntimeError):
+        traced(True)
+
+    assert results == ["abc123"]
+    assert current_trace_id() is None
+    assert stage_count(**labels, outcome="ok") == before_ok + 1
+    assert stage_count(**labels, outcome="error") == before_error + 1
+
+
+def test_log_records_are_prefixed_with_the_trace_id():
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "Sent reply", None, None)
+    bind(TraceIdFilter().filter, trace_id="abc123")(record)
+
+    assert record.getMessage() == "[abc123] Sent reply"
+    assert record.trace_id == "abc123"
@@ -0,0 +1,38 @@
+import httpx
+
+from helper.http_client import max_retries_override
+from pipeline.outbound import OutboundScheduler, PRIORITY_COMMENT, PRIORITY_DM
+
+
+def throttled_error():
+    request = httpx.Request("POST", "https://graph.facebook.com/v21.0/me/messages")
+    return httpx.HTTPStatusError("throttled", request=request, response=httpx.Response(429, request=request))
+
+
+def test_scheduler_owns_retries_of_throttled_sends():
+    outbound = OutboundScheduler(rate=1000, burst=10, max_attempts=3, throttle_pause=0)
+    calls = []
+
+    def send():
+        # The shared HTTP client must not retry underneath the scheduler
+        calls.append(max_retries_override.get())
+        if len(calls) < 3:
+            raise throttled_error()
+        return "sent"
+
+    assert outbound.send("page", send) == "sent"
+    assert calls == [0, 0, 0]
+    assert outbound.stats()["accounts"]["page"]["throttled"] == 2
+
+
+def test_queued_jobs_push_back_comment_intake():
+    outbound = OutboundScheduler(rate=10, max_backlog=10)
+    for _ in range(101):
+        outbound.track("instagram")
+
+    assert not outbound.accepting("instagram", PRIORITY_COMMENT)
+    assert outbound.accepting("instagram", PRIORITY_DM)
+
+    for _ in range(101):
+        outbound.untrack("instagram")
+    assert outbound.accepting("instagram", PRIORITY_COMMENT)
@@ -0,0 +1,115 @@
+import types
+
+import pytest
+
+from startup import DiskCache
+from vector_database import RAGSystem
+from vector_database import rag as rag_module
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.uploads = {}
+        self.deleted = []
+        self.batches = []
+        self.batch_status = "completed"
+        self.files = types.SimpleNamespace(create=self._upload, delete=self.deleted.append)
+        self.vector_stores = types.SimpleNamespace(
+            file_batches=types.SimpleNamespace(create_and_poll=self._create_batch),
+            files=types.SimpleNamespace(delete=lambda vector_store_id, file_id: None, list=self._list_files),
+        )
+
+    def _upload(self, file, purpose):
+        file_id = f"file_{len(self.uploads) + 1}"
+        self.uploads[file_id] = file.read()
+        return types.SimpleNamespace(id=file_id)
+
+    def _create_batch(self, vector_store_id, file_ids):
+        self.batches.append(file_ids)
+        return types.SimpleNamespace(id=f"batch_{len(self.batches)}", status=self.batch_status, file_counts={})
+
+    def _list_files(self, vector_store_id):
+        return [types.SimpleNamespace(id=file_id) for file_id in self.uploads if file_id not in self.deleted]
+
+
+@pytest.fixture
+def client():
+    return FakeOpenAI()
+
+
+@pytest.fixture
+def rag(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_module, "sync_manifest", DiskCache(path=str(tmp_path / "rag_manifest.json")))
+    rag = RAGSystem("soho", client=client)
+    rag._vector_store_id = "vs_1"
+    return rag
+
+
+@pytest.fixture
+def knowledge(tmp_path):
+    directory = tmp_path / "knowledge"
+    directory.mkdir()
+    (directory / "menu.txt").write_text("Flat Iron steak £15")
+    (directory / "hours.txt").write_text("Open daily 12:00 to 23:00")
+    return directory
+
+
+def test_unchanged_files_are_skipped_on_the_next_sync(rag, client, knowledge):
+    first = rag.sync_directory(str(knowledge))
+    assert first.uploaded == ["hours.txt", "menu.txt"]
+    assert len(client.batches) == 1
+
+    second = rag.sync_directory(str(knowledge))
+
+    assert second.uploaded == [] and second.deleted == []
+    assert sorted(second.unchanged) == ["hours.txt", "menu.txt"]
+    assert second.bytes_skipped == first.bytes_uploaded
+    assert len(client.batches) == 1
+
+
+def test_changed_file_is_uploaded_again_and_its_old_version_deleted(rag, client, knowledge):
+    rag.sync_directory(str(knowledge))
+    old_menu = rag_module.sync_manifest.get("manifest:soho")["files"]["menu.txt"]["file_id"]
+    (knowledge / "menu.txt").write_text("Flat Iron steak £16")
+
+    report = rag.sync_directory(str(knowledge))
+
+    assert report.uploaded == ["menu.txt"] and report.unchanged == ["hours.txt"]
+    assert report.deleted == [old_menu]
+    assert client.deleted == [old_menu]
+    new_menu = rag_module.sync_manifest.get("manifest:soho")["files"]["menu.txt"]["file_id"]
+    assert client.uploads[new_menu] == b"Flat Iron steak \xc2\xa316"
+
+
+def test_removed_file_is_deleted_from_the_store(rag, client, knowledge):
+    rag.sync_directory(str(knowledge))
+    (knowledge / "hours.txt").unlink()
+
+    report = rag.sync_directory(str(knowledge))
+
+    assert len(report.deleted) == 1
+    assert set(rag_module.sync_manifest.get("manifest:soho")["files"]) == {"menu.txt"}
+
+
+def test_failed_batch_leaves_the_manifest_for_a_retry(rag, client, knowledge):
+    rag.sync_directory(str(knowledge))
+    (knowledge / "menu.txt").write_text("Flat Iron steak £16")
+    client.batch_status = "failed"
+
+    with pytest.raises(RuntimeError):
+        rag.sync_directory(str(knowledge))
+    # Only the new upload was cleaned up, the indexed version is kept
+    assert client.deleted == ["file_3"]
+
+    client.batch_status = "completed"
+    assert rag.sync_directory(str(knowledge)).uploaded == ["menu.txt"]
+
+
+def test_manifest_of_a_recreated_store_is_ignored(rag, client, knowledge):
+    rag.sync_directory(str(knowledge))
+    rag._vector_store_id = "vs_2"
+
+    report = rag.sync_directory(str(knowledge))
+
+    assert report.uploaded == ["hours.txt", "menu.txt"]
+    assert report.deleted == []
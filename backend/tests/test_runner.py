@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+
+from ai_agent.runner import MAX_TOOL_ROUNDS, run_assistant, stream_assistant
+
+
+def tool_call(call_id="call-1"):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name="check_availability", arguments="{}"))
+
+
+def run(status, run_id="run-1"):
+    action = SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[tool_call()]))
+    return SimpleNamespace(id=run_id, status=status, required_action=action if status == "requires_action" else None)
+
+
+def message(text):
+    return SimpleNamespace(role="assistant", content=[SimpleNamespace(type="text", text=SimpleNamespace(value=text))])
+
+
+class Stream:
+    def __init__(self, events):
+        self.events = events
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self.events)
+
+
+class FakeRuns:
+    """
+    Runs that ask for tools on every step until `tool_rounds` outputs were submitted.
+    """
+
+    def __init__(self, tool_rounds):
+        self.tool_rounds = tool_rounds
+        self.submitted = 0
+        self.cancelled = []
+
+    def _step(self):
+        if self.submitted < self.tool_rounds:
+            return run("requires_action")
+        return run("completed")
+
+    def _events(self):
+        current = self._step()
+        if current.status == "requires_action":
+            return Stream([SimpleNamespace(event="thread.run.requires_action", data=current)])
+        return Stream([
+            SimpleNamespace(event="thread.message.completed", data=message("Table booked.")),
+            SimpleNamespace(event="thread.run.completed", data=current),
+        ])
+
+    def create(self, stream=False, **kwargs):
+        return self._events()
+
+    def create_and_poll(self, **kwargs):
+        return self._step()
+
+    def submit_tool_outputs(self, stream=False, **kwargs):
+        self.submitted += 1
+        return self._events()
+
+    def submit_tool_outputs_and_poll(self, **kwargs):
+        self.submitted += 1
+        return self._step()
+
+    def cancel(self, thread_id, run_id):
+        self.cancelled.append(run_id)
+
+
+def client(runs):
+    messages = SimpleNamespace(
+        create=lambda **kwargs: None,
+        list=lambda **kwargs: SimpleNamespace(data=[message("Table booked.")]),
+    )
+    return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs, messages=messages)))
+
+
+def handler(call):
+    return {"tool_call_id": call.id, "output": "{}"}
+
+
+def test_stream_completes_after_tool_rounds():
+    runs = FakeRuns(tool_rounds=2)
+    sent = []
+    result = stream_assistant(client(runs), "thread", "assistant", "Book a table", handler, on_message=sent.append)
+
+    assert (result.reply, result.tool_calls, runs.submitted) == ("Table booked.", 2, 2)
+    assert sent == ["Table booked."]
+    assert runs.cancelled == []
+
+
+def test_stream_gives_up_and_cancels_an_endless_tool_loop():
+    runs = FakeRuns(tool_rounds=1000)
+    result = stream_assistant(client(runs), "thread", "assistant", "Book a table", handler)
+
+    assert result.reply is None
+    assert runs.submitted == MAX_TOOL_ROUNDS
+    assert runs.cancelled == ["run-1"]
+
+
+def test_stream_cancels_the_run_when_there_are_no_tool_outputs():
+    runs = FakeRuns(tool_rounds=1)
+    result = stream_assistant(client(runs), "thread", "assistant", "Book a table", lambda call: None)
+
+    assert result.reply is None
+    assert (runs.submitted, runs.cancelled) == (0, ["run-1"])
+
+
+def test_polling_run_gives_up_and_cancels_an_endless_tool_loop():
+    runs = FakeRuns(tool_rounds=1000)
+    result = run_assistant(client(runs), "thread", "assistant", "Book a table", handler)
+
+    assert result.reply is None
+    assert runs.submitted == MAX_TOOL_ROUNDS
+    assert runs.cancelled == ["run-1"]
+
+
+def test_polling_run_completes_after_tool_rounds():
+    runs = FakeRuns(tool_rounds=2)
+    result = run_assistant(client(runs), "thread", "assistant", "Book a table", handler)
+
+    assert (result.reply, result.tool_calls, runs.cancelled) == ("Table booked.", 2, [])
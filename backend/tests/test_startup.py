@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+
+import pytest
+
+from startup import DiskCache, Lazy, StartupTimer
+
+
+def test_lazy_computes_once_across_threads_and_records_the_phase():
+    calls = []
+    timer = StartupTimer()
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    lazy = Lazy(factory, name="tool_definitions", timer=timer)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lazy.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert timer.report()["phases"]["tool_definitions"]["duration_ms"] >= 50
+
+
+def test_lazy_retries_after_a_failure_and_recomputes_after_reset():
+    values = iter([RuntimeError("down"), "first", "second"])
+
+    def factory():
+        value = next(values)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    lazy = Lazy(factory, timer=StartupTimer())
+    with pytest.raises(RuntimeError):
+        lazy.get()
+    assert not lazy.initialized
+
+    assert lazy.get() == "first"
+    assert lazy.get() == "first"
+    lazy.reset()
+    assert lazy.get() == "second"
+
+
+def test_disk_cache_persists_entries_across_instances(tmp_path):
+    path = str(tmp_path / "startup_cache.json")
+    DiskCache(path=path).set("vector_store_id", "vs_123")
+
+    assert DiskCache(path=path).get("vector_store_id") == "vs_123"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_disk_cache_expires_and_deletes_entries(tmp_path):
+    path = str(tmp_path / "startup_cache.json")
+    cache = DiskCache(path=path, ttl=60)
+    cache.set("expired", "old", ttl=-1)
+    cache.set("kept", "new")
+
+    assert cache.get("expired", "default") == "default"
+    cache.delete("kept")
+    assert DiskCache(path=path).get("kept") is None
+
+
+def test_disk_cache_keeps_entries_written_by_another_process(tmp_path):
+    path = str(tmp_path / "startup_cache.json")
+    cache = DiskCache(path=path)
+    cache.set("ours", 1)
+    other = DiskCache(path=path)
+    other.set("theirs", 2)
+
+    cache.set("ours", 3)
+
+    with open(path) as f:
+        assert set(json.load(f)) == {"ours", "theirs"}
+
+
+def test_unreadable_disk_cache_is_ignored(tmp_path):
+    path = tmp_path / "startup_cache.json"
+    path.write_text("{not json")
+
+    assert DiskCache(path=str(path)).get("anything", "default") == "default"
@@ -0,0 +1,74 @@
+import datetime
+import json
+import types
+
+import pytest
+
+from pipeline import OutboundScheduler
+from startup import Lazy
+from tenants import Tenant, TenantRegistry, default_tenant_config
+from tenants.config import tenant_config_from_dict
+from tools import CALENDAR_FUNCTIONS, AvailabilityIndex, parse_time
+
+
+def test_tenant_without_page_token_is_rejected():
+    with pytest.raises(ValueError):
+        tenant_config_from_dict({"tenant_id": "soho", "account_ids": ["1"]}, default_tenant_config())
+
+
+def test_rebuilt_tenant_keeps_its_availability_index():
+    config = tenant_config_from_dict(
+        {"tenant_id": "soho", "account_ids": ["1"], "facebook_access_token": "soho-token"}, default_tenant_config()
+    )
+    factory = lambda config: types.SimpleNamespace(id=config.tenant_id, availability=object())
+    registry = TenantRegistry([default_tenant_config(), config], factory, idle_ttl=0)
+
+    first = registry.get("soho")
+    # idle_ttl=0 expires it, so this is a new instance
+    second = registry.get("soho")
+
+    assert second is not first
+    assert second.availability is first.availability
+
+
+class FakeAci:
+    def __init__(self):
+        self.calls = []
+        self.functions = self
+
+    def execute(self, function_name, arguments, linked_account_owner_id=None):
+        self.calls.append((function_name, arguments))
+        return types.SimpleNamespace(success=True, data={"id": f"event-{len(self.calls)}"},
+                                     model_dump_json=lambda: json.dumps({"success": True}))
+
+
+@pytest.fixture
+def tenant():
+    aci = FakeAci()
+    tenant = Tenant(default_tenant_config(), None, Lazy(lambda: aci), lambda version_fn: None, OutboundScheduler())
+    tenant.availability = AvailabilityIndex(tables=[2, 6], timezone=tenant.timezone)
+    tenant.aci_client = aci
+    return tenant
+
+
+def dispatch(tenant, conversation, name, arguments):
+    call = types.SimpleNamespace(id="call", function=types.SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+    [output] = tenant.tool_dispatcher.for_conversation(conversation).dispatch([call])
+    return json.loads(output["output"])
+
+
+def test_reservation_holds_a_table_for_the_party_size_checked_in_its_conversation(tenant):
+    start = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    insert = {"body": {"summary": "Dinner - Sam", "start": {"dateTime": f"{start}T19:00:00"},
+                       "end": {"dateTime": f"{start}T20:30:00"}}}
+
+    assert dispatch(tenant, "u1", "check_availability", {"start": f"{start}T19:00:00", "party_size": 6}) == {"available": True}
+    # Another conversation's check doesn't change what u1 books
+    dispatch(tenant, "u2", "check_availability", {"start": f"{start}T19:00:00", "party_size": 2})
+    assert dispatch(tenant, "u1", CALENDAR_FUNCTIONS["reserve_event"], insert) == {"success": True}
+
+    [(function_name, arguments)] = tenant.aci_client.calls
+    assert function_name == CALENDAR_FUNCTIONS["reserve_event"]
+    assert arguments["body"]["description"] == "Party of 6"
+    assert not tenant.availability.is_available(parse_time(f"{start}T19:00:00", tenant.timezone), 5)
+    assert tenant.availability.is_available(parse_time(f"{start}T19:00:00", tenant.timezone), 2)
@@ -0,0 +1,103 @@
+import types
+
+import pytest
+
+from ai_agent import ThreadCompactor
+from ai_agent.thread_store import MemoryThreadStore
+
+
+def text_message(role, text):
+    content = [types.SimpleNamespace(type="text", text=types.SimpleNamespace(value=text))]
+    return types.SimpleNamespace(role=role, content=content)
+
+
+class FakeOpenAI:
+    def __init__(self, messages):
+        self.messages = messages
+        self.created = []
+        self.summary_requests = []
+        self.beta = types.SimpleNamespace(threads=types.SimpleNamespace(
+            create=self._create_thread,
+            messages=types.SimpleNamespace(list=self._list_messages),
+        ))
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._complete))
+
+    def _list_messages(self, thread_id, order, limit):
+        assert order == "desc"
+        return types.SimpleNamespace(data=list(reversed(self.messages))[:limit])
+
+    def _complete(self, model, messages, temperature):
+        self.summary_requests.append(messages[-1]["content"])
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(
+            message=types.SimpleNamespace(content="- Sam booked a table for 4 on Friday at 19:00"),
+        )])
+
+    def _create_thread(self, messages):
+        self.created.append(messages)
+        return types.SimpleNamespace(id=f"thread_{len(self.created) + 1}")
+
+
+def run_with_usage(prompt_tokens):
+    return types.SimpleNamespace(usage=types.SimpleNamespace(prompt_tokens=prompt_tokens))
+
+
+@pytest.fixture
+def client():
+    return FakeOpenAI([
+        text_message("user", "A table for 4 on Friday at 7pm please, it's Sam"),
+        text_message("assistant", "Booked, see you Friday at 19:00!"),
+    ])
+
+
+@pytest.fixture
+def store():
+    return MemoryThreadStore()
+
+
+def test_thread_under_the_limits_is_kept(client, store):
+    compactor = ThreadCompactor(client, store, max_messages=4, max_tokens=1000)
+    compactor.record_run("thread_1", run_with_usage(500))
+
+    assert compactor.maybe_compact("sam", "thread_1") == "thread_1"
+    assert client.created == []
+
+
+def test_long_thread_is_replaced_by_a_summary_seeded_thread(client, store):
+    compactor = ThreadCompactor(client, store, max_messages=4, max_tokens=0)
+    compactor.record_messages("thread_1")
+    compactor.record_run("thread_1", None)
+    compactor.record_run("thread_1", None)
+
+    new_thread_id = compactor.maybe_compact("sam", "thread_1")
+
+    assert new_thread_id == "thread_2"
+    assert store.get("sam") == "thread_2"
+    assert client.summary_requests == [
+        "user: A table for 4 on Friday at 7pm please, it's Sam\nassistant: Booked, see you Friday at 19:00!"
+    ]
+    [seed] = client.created[0]
+    assert seed["role"] == "assistant" and "Friday at 19:00" in seed["content"]
+    assert not compactor.should_compact("thread_2")
+    assert compactor.stats()["compactions"] == 1
+
+
+def test_prompt_tokens_of_the_latest_run_trigger_compaction(client, store):
+    compactor = ThreadCompactor(client, store, max_messages=0, max_tokens=1000)
+    compactor.record_run("thread_1", run_with_usage(1200))
+    assert compactor.should_compact("thread_1")
+
+    compactor.record_run("thread_1", run_with_usage(300))
+    assert not compactor.should_compact("thread_1")
+
+
+def test_failed_compaction_keeps_the_old_thread(client, store):
+    def fail(**kwargs):
+        raise RuntimeError("rate limited")
+
+    client.chat.completions.create = fail
+    compactor = ThreadCompactor(client, store, max_messages=1)
+    compactor.record_messages("thread_1")
+
+    assert compactor.maybe_compact("sam", "thread_1") == "thread_1"
+    assert store.get("sam") is None
+    assert compactor.stats()["failures"] == 1
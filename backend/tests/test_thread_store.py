@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+from ai_agent.thread_store import MemoryThreadStore, SQLiteThreadStore, ThreadStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryThreadStore(ttl=0.3)
+    # No front cache, so every lookup reads (and touches) the row
+    return SQLiteThreadStore(path=str(tmp_path / "threads.db"), ttl=0.3, cache_ttl=0)
+
+
+def test_thread_store_is_abstract():
+    with pytest.raises(TypeError):
+        ThreadStore()
+
+
+def test_ttl_counts_from_last_use(store):
+    store.set("sender", "thread_1")
+    for _ in range(3):
+        time.sleep(0.15)
+        assert store.get("sender") == "thread_1"
+
+    time.sleep(0.4)
+    assert store.get("sender") is None
+
+
+def test_setdefault_keeps_the_first_thread(store):
+    assert store.setdefault("sender", "thread_1") == "thread_1"
+    assert store.setdefault("sender", "thread_2") == "thread_1"
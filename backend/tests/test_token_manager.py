@@ -0,0 +1,111 @@
+import importlib
+import json
+import os
+import time
+
+import pytest
+
+from helper.token_manager import TokenManager, read_token_file, write_token_file
+
+# `helper.token_manager` is shadowed by the shared manager instance
+token_module = importlib.import_module("helper.token_manager")
+
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def token_path(tmp_path):
+    path = str(tmp_path / "ig_token.json")
+    write_token_file(path, "old-token", time.time() + 5 * DAY)
+    return path
+
+
+def make_manager(refreshed):
+    def refresh_fn(token):
+        refreshed.append(token)
+        return f"new-{token}", time.time() + 60 * DAY
+
+    return TokenManager(refresh_margin=10 * DAY, refresh_fn=refresh_fn)
+
+
+def test_token_file_round_trips_its_expiry(tmp_path):
+    path = str(tmp_path / "token.json")
+    expires_at = time.time() + DAY
+    write_token_file(path, "abc", expires_at)
+
+    token, read_expires_at = read_token_file(path)
+
+    assert token == "abc"
+    assert read_expires_at == pytest.approx(expires_at, abs=1e-3)
+    assert os.listdir(tmp_path) == ["token.json"]
+
+
+def test_failed_write_leaves_the_previous_token_file_intact(token_path, monkeypatch):
+    def crash(data, f, **kwargs):
+        f.write('{"access_token": "half')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(token_module.json, "dump", crash)
+    with pytest.raises(OSError):
+        write_token_file(token_path, "new-token", time.time() + 60 * DAY)
+    monkeypatch.undo()
+
+    assert read_token_file(token_path)[0] == "old-token"
+
+
+def test_token_close_to_expiry_is_refreshed_and_written_back(token_path):
+    refreshed = []
+    manager = make_manager(refreshed)
+    manager.register_file("ig", token_path)
+    assert manager.get("ig") == "old-token"
+
+    manager.check()
+
+    assert refreshed == ["old-token"]
+    assert manager.get("ig") == "new-old-token"
+    token, expires_at = read_token_file(token_path)
+    assert token == "new-old-token" and expires_at > time.time() + 59 * DAY
+    assert manager.stats()["ig"]["refreshes"] == 1
+
+    # The rewritten file is not picked up as an outside change, and the fresh token is kept
+    manager.check()
+    assert refreshed == ["old-token"]
+
+
+def test_token_file_changed_by_another_process_is_reloaded(token_path):
+    manager = make_manager([])
+    manager.register_file("ig", token_path)
+    manager.get("ig")
+
+    with open(token_path, "w") as f:
+        json.dump({"access_token": "reauthorized"}, f)
+    os.utime(token_path, (time.time() + 10, time.time() + 10))
+    manager.check()
+
+    assert manager.get("ig") == "reauthorized"
+
+
+def test_failed_refresh_keeps_the_token_and_is_counted(token_path):
+    def refresh_fn(token):
+        raise RuntimeError("Instagram token refresh failed")
+
+    manager = TokenManager(refresh_margin=10 * DAY, refresh_fn=refresh_fn)
+    manager.register_file("ig", token_path)
+
+    manager.check()
+
+    assert manager.get("ig") == "old-token"
+    assert manager.stats()["ig"]["failures"] == 1
+
+
+def test_fixed_tokens_are_never_refreshed():
+    refreshed = []
+    manager = make_manager(refreshed)
+    manager.register("page", "page-token", expires_at=time.time() + DAY)
+
+    manager.check()
+
+    assert manager.get("page") == "page-token"
+    assert refreshed == []
+    with pytest.raises(KeyError):
+        manager.get("unknown")
@@ -0,0 +1,26 @@
+import json
+import threading
+import types
+
+from tools.dispatcher import ToolDispatcher, ToolRegistry
+
+
+def tool_call(call_id, name, arguments="{}"):
+    return types.SimpleNamespace(id=call_id, function=types.SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_timed_out_side_effecting_call_reports_unknown_outcome():
+    release = threading.Event()
+    registry = ToolRegistry()
+    registry.register("insert", lambda arguments: release.wait(5) and "inserted", timeout=0.05, side_effects=True)
+    registry.register("lookup", lambda arguments: release.wait(5) and "found", timeout=0.05)
+    dispatcher = ToolDispatcher(registry)
+
+    try:
+        insert, lookup = dispatcher.dispatch([tool_call("1", "insert"), tool_call("2", "lookup")])
+    finally:
+        release.set()
+
+    assert json.loads(insert["output"])["outcome"] == "unknown"
+    assert "outcome" not in json.loads(lookup["output"])
+    assert dispatcher.stats()["tools"]["insert"]["timeouts"] == 1
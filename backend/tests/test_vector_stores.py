@@ -0,0 +1,79 @@
+import types
+
+import httpx
+import pytest
+from openai import NotFoundError
+
+from startup import DiskCache
+from vector_database import RAGSystem, VectorStoreResolver
+from vector_database import rag as rag_module
+
+
+def not_found(what):
+    request = httpx.Request("GET", "https://api.openai.com/v1/vector_stores")
+    return NotFoundError(f"No {what} found", response=httpx.Response(404, request=request), body=None)
+
+
+class FakeVectorStores:
+    def __init__(self):
+        self.stores = {}
+        self.files = types.SimpleNamespace(list=self.list_files)
+        self.created = 0
+
+    def create(self, name):
+        self.created += 1
+        store = types.SimpleNamespace(id=f"vs_{self.created}", name=name)
+        self.stores[store.id] = store
+        return store
+
+    def list(self, limit, order):
+        return list(reversed(list(self.stores.values())))
+
+    def retrieve(self, store_id):
+        if store_id not in self.stores:
+            raise not_found(f"vector store with id '{store_id}'")
+        return self.stores[store_id]
+
+    def list_files(self, vector_store_id, limit=None):
+        self.retrieve(vector_store_id)
+        return [types.SimpleNamespace(id=f"file_in_{vector_store_id}", created_at=1)]
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    stores = FakeVectorStores()
+    resolver = VectorStoreResolver(disk_cache=DiskCache(path=str(tmp_path / "startup_cache.json")))
+    monkeypatch.setattr(rag_module, "vector_store_resolver", resolver)
+    stores.resolver = resolver
+    return stores
+
+
+def test_deleted_store_is_resolved_again(stores):
+    client = types.SimpleNamespace(vector_stores=stores)
+    old = stores.create("soho")
+    rag = RAGSystem("soho", client=client)
+    first = rag.files_fingerprint()
+    assert rag.get_vector_store_id() == old.id
+
+    del stores.stores[old.id]
+    second = rag.files_fingerprint()
+
+    assert rag.get_vector_store_id() == "vs_2"
+    assert second != first
+    assert stores.resolver.stats()["revalidations"] == 1
+    # The new id replaced the deleted one in the persistent cache too
+    assert stores.resolver.disk_cache.get("vector_store:soho") == "vs_2"
+
+
+def test_other_not_found_errors_are_raised(stores):
+    client = types.SimpleNamespace(vector_stores=stores)
+    stores.create("soho")
+    rag = RAGSystem("soho", client=client)
+
+    def missing_file(vector_store_id):
+        raise not_found("file")
+
+    with pytest.raises(NotFoundError):
+        rag._with_vector_store(missing_file)
+    assert rag.get_vector_store_id() == "vs_1"
+    assert stores.resolver.stats()["revalidations"] == 0
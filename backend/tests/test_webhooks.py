@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from pipeline import DedupStore, OutboundScheduler, WebhookInbox
+
+
+def delivery(mid):
+    return {"entry": [{"id": "page", "time": 1, "messaging": [
+        {"sender": {"id": "u1"}, "recipient": {"id": "page"}, "timestamp": 1, "message": {"mid": mid, "text": "hi"}}
+    ]}]}
+
+
+@pytest.fixture
+def inbox(tmp_path):
+    inbox = WebhookInbox(path=str(tmp_path / "inbox.db"))
+    yield inbox
+    inbox.close()
+
+
+@pytest.fixture
+def client(tmp_path, inbox, monkeypatch):
+    # Fresh stores per test, so events seen by an earlier test or run aren't dropped as duplicates
+    dedup_store = DedupStore(path=str(tmp_path / "dedup.db"))
+    monkeypatch.setattr(main, "dedup_store", dedup_store)
+    monkeypatch.setattr(main, "inbox", inbox)
+    monkeypatch.setattr(main, "outbound", OutboundScheduler())
+    # Without a `with` block the lifespan (warm-up, workers) never starts
+    yield TestClient(main.app)
+    dedup_store.close()
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(main.scheduler, "submit", lambda key, func, *args, **kwargs: calls.append(key))
+    return calls
+
+
+def test_full_queue_returns_503_and_the_redelivery_is_accepted(client, submitted, inbox, monkeypatch):
+    def queue_full(*args, **kwargs):
+        raise asyncio.QueueFull
+
+    with monkeypatch.context() as patch:
+        patch.setattr(main.scheduler, "submit", queue_full)
+        response = client.post("/fb_webhook", json=delivery("m-full"))
+    assert response.status_code == 503
+    assert response.json() == {"status": "busy"}
+    inbox.flush()
+    assert inbox.events() == []
+
+    # The rejected event was forgotten, so Meta's retry is processed
+    response = client.post("/fb_webhook", json=delivery("m-full"))
+    assert response.status_code == 200
+    assert len(submitted) == 1
+    assert [event.event_key for event in inbox.events()] == ["message:m-full"]
+
+
+def test_redelivered_event_is_queued_once(client, submitted, inbox):
+    for _ in range(3):
+        assert client.post("/fb_webhook", json=delivery("m-dup")).status_code == 200
+    assert len(submitted) == 1
+    assert inbox.stats()["appended"] == 1
+
+
+def comment(comment_id, text):
+    return {"entry": [{"id": "page", "time": 1, "changes": [{"field": "comments", "value": {
+        "id": comment_id, "text": text, "from": {"id": "u1"}, "media": {"media_product_type": "FEED"},
+    }}]}]}
+
+
+def pending_jobs():
+    return main.outbound.stats()["pending_jobs"]
+
+
+def test_only_jobs_that_send_count_towards_the_outbound_backlog(client, submitted, monkeypatch):
+    monkeypatch.setattr(main, "REPLY_TO_COMMENTS", False)
+    assert client.post("/webhook", json=comment("c1", "Amazing steak!")).status_code == 200
+    assert client.post("/fb_webhook", json={"entry": [{"id": "page", "time": 1, "messaging": [
+        {"sender": {"id": "u1"}, "timestamp": 2, "read": {"watermark": 1}}
+    ]}]}).status_code == 200
+    assert len(submitted) == 2
+    assert pending_jobs() == 0
+
+    monkeypatch.setattr(main, "REPLY_TO_COMMENTS", True)
+    assert client.post("/webhook", json=comment("c2", "Check out http://spam.example")).status_code == 200
+    assert pending_jobs() == 0
+    assert client.post("/webhook", json=comment("c3", "Amazing steak!")).status_code == 200
+    assert client.post("/fb_webhook", json=delivery("m-text")).status_code == 200
+    assert pending_jobs() == 2
+
+
+def test_comments_that_wont_send_are_not_deferred_by_the_backlog(client, submitted, monkeypatch):
+    monkeypatch.setattr(main, "REPLY_TO_COMMENTS", False)
+    monkeypatch.setattr(main.outbound, "accepting", lambda *args: False)
+    assert client.post("/webhook", json=comment("c1", "Amazing steak!")).status_code == 200
+    assert len(submitted) == 1
@@ -1 +1,5 @@
-from .tools import get_calendar_functions
\ No newline at end of file
+from .tools import get_calendar_functions, CALENDAR_FUNCTIONS
+from .availability import (
+    AvailabilityIndex, Hold, CHECK_AVAILABILITY_TOOL, calendar_event_fetcher, event_window, with_party_size, parse_time, format_time, parse_tables
+)
+from .dispatcher import ToolRegistry, ToolDispatcher, ConversationDispatcher, RegisteredTool
@@ -0,0 +1,442 @@
+import bisect
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from helper.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# "capacity:count" pairs, e.g. six 2-tops, six 4-tops and two 6-tops
+RESTAURANT_TABLES = os.getenv("RESTAURANT_TABLES", "2:6,4:6,6:2")
+SEATING_MINUTES = int(os.getenv("SEATING_MINUTES", 90))
+AVAILABILITY_SYNC_INTERVAL = float(os.getenv("AVAILABILITY_SYNC_INTERVAL", 300))
+AVAILABILITY_HORIZON_DAYS = int(os.getenv("AVAILABILITY_HORIZON_DAYS", 30))
+RESERVATION_HOLD_SECONDS = float(os.getenv("RESERVATION_HOLD_SECONDS", 60))
+CALENDAR_ID = os.getenv("CALENDAR_ID", "primary")
+# Times without an offset (from the assistant or the calendar) are in the restaurant's time zone, not the server's
+RESTAURANT_TIMEZONE = os.getenv("RESTAURANT_TIMEZONE", "Europe/London")
+
+PARTY_SIZE_PATTERN = re.compile(
+    r"(?:party of|table for|booking for|reservation for)\s+(\d{1,2})\b(?![:.]\d)|\b(\d{1,2})\s*(?:guests?|people|persons?|pax|covers)\b", re.IGNORECASE
+)
+DEFAULT_PARTY_SIZE = 2
+
+CHECK_AVAILABILITY_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "check_availability",
+        "description": "Check whether a table is free for a party at a given date and time. "
+                       "Returns nearby free times when it is not.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "start": {"type": "string", "description": "Reservation start as ISO 8601, e.g. 2025-05-02T19:00:00"},
+                "party_size": {"type": "integer", "description": "Number of guests"},
+            },
+            "required": ["start", "party_size"],
+        },
+    },
+}
+
+
+def parse_tables(spec: str) -> List[int]:
+    """
+    Parse a "capacity:count,..." table spec into a list of table capacities, smallest first.
+    """
+    capacities = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        capacity, _, count = part.partition(":")
+        capacities.extend([int(capacity)] * int(count or 1))
+    return sorted(capacities)
+
+
+def parse_time(value: str, timezone: Optional[datetime.tzinfo] = None) -> float:
+    """
+    Parse an ISO 8601 date-time into epoch seconds.
+
+    Args:
+        value: The date-time.
+        timezone: Zone of values without an offset. Defaults to RESTAURANT_TIMEZONE.
+    """
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone or ZoneInfo(RESTAURANT_TIMEZONE))
+    return parsed.timestamp()
+
+
+def format_time(timestamp: float, timezone: Optional[datetime.tzinfo] = None) -> str:
+    """
+    Format epoch seconds as an ISO 8601 date-time to the minute, in the restaurant's
+    time zone (RESTAURANT_TIMEZONE unless `timezone` is given) without an offset.
+    """
+    local = datetime.datetime.fromtimestamp(timestamp, timezone or ZoneInfo(RESTAURANT_TIMEZONE))
+    return local.replace(tzinfo=None).isoformat(timespec="minutes")
+
+
+def party_size_from_text(*texts: Optional[str]) -> Optional[int]:
+    """
+    Find a party size ("table for 4", "6 guests") in event texts.
+    """
+    for text in texts:
+        match = PARTY_SIZE_PATTERN.search(text or "")
+        if match:
+            return int(match.group(1) or match.group(2))
+    return None
+
+
+def _find(value: Any, key: str) -> Any:
+    """
+    Find the first value for `key` in nested dicts, since tool arguments may wrap the event body.
+    """
+    if isinstance(value, dict):
+        if key in value:
+            return value[key]
+        for child in value.values():
+            found = _find(child, key)
+            if found is not None:
+                return found
+    return None
+
+
+def with_party_size(event: Dict[str, Any], party_size: int) -> Dict[str, Any]:
+    """
+    Copy a calendar event (or EVENTS_INSERT arguments) with the party size noted in its
+    description, unless its texts already state one, so a later sync reads it back.
+    """
+    if isinstance(event, dict):
+        if "start" in event:
+            if party_size_from_text(event.get("summary"), event.get("description")) is not None:
+                return event
+            description = event.get("description")
+            note = f"Party of {party_size}"
+            return {**event, "description": f"{description}\n{note}" if description else note}
+        return {key: with_party_size(value, party_size) for key, value in event.items()}
+    return event
+
+
+def _event_time(value: Dict[str, Any], timezone: Optional[datetime.tzinfo]) -> float:
+    zone = value.get("timeZone")
+    return parse_time(value["dateTime"], ZoneInfo(zone) if zone else timezone)
+
+
+def event_window(event: Dict[str, Any], timezone: Optional[datetime.tzinfo] = None) -> Optional[Tuple[float, float, int]]:
+    """
+    Get the start, end and party size of a calendar event (or EVENTS_INSERT arguments).
+    A date-time without an offset is in the event's `timeZone`, else in `timezone`.
+
+    Returns:
+        tuple: (start, end, party_size) with times in epoch seconds, or None for
+        all-day events and events without a start time.
+    """
+    start = _find(event, "start")
+    start_time = start.get("dateTime") if isinstance(start, dict) else None
+    if not start_time:
+        return None
+    end = _find(event, "end")
+    end_time = end.get("dateTime") if isinstance(end, dict) else None
+
+    start_ts = _event_time(start, timezone)
+    end_ts = _event_time(end, timezone) if end_time else start_ts + SEATING_MINUTES * 60
+    size = party_size_from_text(_find(event, "summary"), _find(event, "description")) or DEFAULT_PARTY_SIZE
+    return start_ts, end_ts, size
+
+
+class Booking(NamedTuple):
+    start: float
+    end: float
+    booking_id: str
+
+
+class Hold(NamedTuple):
+    hold_id: str
+    table: int
+    start: float
+    end: float
+    party_size: int
+    expires_at: float
+
+
+class AvailabilityIndex:
+    """
+    A local index of reserved slots per table, synced from the reservation calendar.
+
+    Each table keeps its bookings as a sorted list of non-overlapping intervals,
+    so a conflict check is a binary search; bookings that overlap on a table
+    (e.g. overbooked calendar events) are merged into one interval. A party is
+    seated at the smallest free table that fits it.
+
+    Bookings go through an optimistic hold: `hold` atomically claims a table for
+    the slot before the calendar insert, `confirm` turns the hold into a booking
+    once the insert succeeded, and `release` frees it if the insert failed.
+    Concurrent requests for the last table therefore can't both succeed.
+    """
+
+    def __init__(self, tables: Optional[List[int]] = None, seating_minutes: int = SEATING_MINUTES,
+                 fetch_events: Optional[Callable[[float, float], Iterable[Dict[str, Any]]]] = None,
+                 sync_interval: float = AVAILABILITY_SYNC_INTERVAL, horizon_days: int = AVAILABILITY_HORIZON_DAYS,
+                 hold_seconds: float = RESERVATION_HOLD_SECONDS, timezone: Optional[datetime.tzinfo] = None):
+        """
+        Initialize the index. Events are fetched on the first check.
+
+        Args:
+            tables: Table capacities. Defaults to RESTAURANT_TABLES.
+            seating_minutes: Length of a reservation without an explicit end.
+            fetch_events: Returns the calendar events between two epoch times.
+            sync_interval: Seconds after which the index is re-synced from the calendar.
+            horizon_days: How many days ahead are synced.
+            hold_seconds: Seconds a hold stays valid without being confirmed.
+            timezone: Zone of calendar times without an offset. Defaults to RESTAURANT_TIMEZONE.
+        """
+        self.capacities = sorted(tables or parse_tables(RESTAURANT_TABLES))
+        self.seating = seating_minutes * 60
+        self.fetch_events = fetch_events
+        self.sync_interval = sync_interval
+        self.horizon_days = horizon_days
+        self.hold_seconds = hold_seconds
+        self.timezone = timezone
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._bookings: List[List[Booking]] = [[] for _ in self.capacities]
+        self._holds: Dict[str, Hold] = {}
+        # Bookings confirmed locally that the calendar may not return yet
+        self._local_bookings: Dict[str, Tuple[int, Booking]] = {}
+        self._synced_at = 0.0
+
+        self.checks = 0
+        self.holds_granted = 0
+        self.holds_rejected = 0
+        self.syncs = 0
+        self.sync_errors = 0
+
+    def _is_free(self, table: int, start: float, end: float) -> bool:
+        """
+        Check a table for overlapping bookings and holds. Caller holds the lock.
+        """
+        bookings = self._bookings[table]
+        position = bisect.bisect_left(bookings, (end,))
+        # Only the booking starting right before `end` can overlap, as intervals are disjoint
+        if position and bookings[position - 1].end > start:
+            return False
+        return not any(
+            hold.table == table and hold.start < end and start < hold.end for hold in self._holds.values()
+        )
+
+    def _free_table(self, start: float, end: float, party_size: int) -> Optional[int]:
+        for table, capacity in enumerate(self.capacities):
+            if capacity >= party_size and self._is_free(table, start, end):
+                return table
+        return None
+
+    def _expire_holds(self):
+        now = time.monotonic()
+        for hold_id in [hold_id for hold_id, hold in self._holds.items() if hold.expires_at <= now]:
+            del self._holds[hold_id]
+
+    def _insert(self, table: int, booking: Booking):
+        """
+        Add a booking to a table, merging it with the bookings it overlaps so the
+        table's intervals stay disjoint. Caller holds the lock.
+        """
+        bookings = self._bookings[table]
+        first = bisect.bisect_left(bookings, (booking.start,))
+        if first and bookings[first - 1].end > booking.start:
+            first -= 1
+        start, end, booking_id = booking
+        last = first
+        while last < len(bookings) and bookings[last].start < end:
+            start, end = min(start, bookings[last].start), max(end, bookings[last].end)
+            last += 1
+        bookings[first:last] = [Booking(start, end, booking_id)]
+
+    def sync(self, force: bool = False):
+        """
+        Rebuild the index from the calendar if it is stale.
+
+        Args:
+            force: Sync even if the last sync is recent.
+        """
+        if self.fetch_events is None:
+            return
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        with self._sync_lock:
+            if not force and time.monotonic() - self._synced_at < self.sync_interval:
+                return
+            now = time.time()
+            try:
+                events = list(self.fetch_events(now - 24 * 3600, now + self.horizon_days * 24 * 3600))
+            except Exception as e:
+                self.sync_errors += 1
+                # Retry on the next check rather than every call
+                self._synced_at = time.monotonic()
+                logger.warning(f"Could not sync reservations from the calendar: {e}")
+                return
+
+            windows = []
+            for event in events:
+                window = event_window(event, self.timezone)
+                if window is not None:
+                    windows.append((window, event.get("id") or uuid.uuid4().hex))
+            windows.sort()
+
+            with self._lock:
+                self._bookings = [[] for _ in self.capacities]
+                event_ids = set()
+                for (start, end, party_size), event_id in windows:
+                    event_ids.add(event_id)
+                    table = self._free_table(start, end, party_size)
+                    if table is None:
+                        # Overbooked in the calendar; seat it anyway so the slot reads as taken
+                        table = next((t for t, c in enumerate(self.capacities) if c >= party_size), len(self.capacities) - 1)
+                    self._insert(table, Booking(start, end, event_id))
+                for booking_id in list(self._local_bookings):
+                    if booking_id in event_ids:
+                        del self._local_bookings[booking_id]
+                    else:
+                        self._insert(*self._local_bookings[booking_id])
+                self._synced_at = time.monotonic()
+                self.syncs += 1
+
+    def invalidate(self):
+        """
+        Mark the index stale so the next check re-syncs from the calendar.
+        """
+        self._synced_at = 0.0
+
+    def is_available(self, start: float, party_size: int, end: Optional[float] = None) -> bool:
+        """
+        Check whether a table fits the party for the slot.
+        """
+        self.sync()
+        end = end or start + self.seating
+        with self._lock:
+            self.checks += 1
+            self._expire_holds()
+            return self._free_table(start, end, party_size) is not None
+
+    def alternatives(self, start: float, party_size: int, step_minutes: int = 15, window_minutes: int = 120,
+                     limit: int = 3) -> List[float]:
+        """
+        Find the free start times closest to `start` within `window_minutes` either side.
+        """
+        self.sync()
+        found = []
+        with self._lock:
+            self._expire_holds()
+            for offset in range(step_minutes, window_minutes + 1, step_minutes):
+                for candidate in (start - offset * 60, start + offset * 60):
+                    if candidate > time.time() and self._free_table(candidate, candidate + self.seating, party_size) is not None:
+                        found.append(candidate)
+                if len(found) >= limit:
+                    break
+        return found[:limit]
+
+    def hold(self, start: float, party_size: int, end: Optional[float] = None) -> Optional[Hold]:
+        """
+        Atomically claim a table for the slot.
+
+        Returns:
+            Hold: The hold, or None if no table is free.
+        """
+        self.sync()
+        end = end or start + self.seating
+        with self._lock:
+            self._expire_holds()
+            table = self._free_table(start, end, party_size)
+            if table is None:
+                self.holds_rejected += 1
+                return None
+            hold = Hold(uuid.uuid4().hex, table, start, end, party_size, time.monotonic() + self.hold_seconds)
+            self._holds[hold.hold_id] = hold
+            self.holds_granted += 1
+            return hold
+
+    def confirm(self, hold_id: str, booking_id: Optional[str] = None):
+        """
+        Turn a hold into a booking after the calendar insert succeeded.
+
+        Args:
+            hold_id: The hold to confirm.
+            booking_id: The calendar event id, if known.
+        """
+        with self._lock:
+            hold = self._holds.pop(hold_id, None)
+            if hold is None:
+                return
+            booking = Booking(hold.start, hold.end, booking_id or hold_id)
+            self._insert(hold.table, booking)
+            self._local_bookings[booking.booking_id] = (hold.table, booking)
+
+    def release(self, hold_id: str):
+        """
+        Drop a hold, e.g. because the calendar insert failed.
+        """
+        with self._lock:
+            self._holds.pop(hold_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get index size and hold counters.
+        """
+        return {
+            "tables": len(self.capacities),
+            "bookings": sum(len(bookings) for bookings in self._bookings),
+            "active_holds": len(self._holds),
+            "checks": self.checks,
+            "holds_granted": self.holds_granted,
+            "holds_rejected": self.holds_rejected,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+        }
+
+
+def calendar_event_fetcher(aci, linked_account_owner_id: str, calendar_id: str = CALENDAR_ID):
+    """
+    Build a `fetch_events` function that lists calendar events through ACI.
+
+    Args:
+        aci: The ACI client (or a callable returning it).
+        linked_account_owner_id: The ACI linked account that owns the calendar.
+        calendar_id: The reservation calendar.
+
+    Returns:
+        callable: `fetch_events(start, end) -> list of event dicts`.
+    """
+    def fetch_events(start: float, end: float) -> List[Dict[str, Any]]:
+        client = aci() if callable(aci) else aci
+        events, page_token = [], None
+        while True:
+            query = {
+                "timeMin": datetime.datetime.fromtimestamp(start, datetime.timezone.utc).isoformat(),
+                "timeMax": datetime.datetime.fromtimestamp(end, datetime.timezone.utc).isoformat(),
+                "singleEvents": True,
+                "orderBy": "startTime",
+                "maxResults": 2500,
+            }
+            if page_token:
+                query["pageToken"] = page_token
+            with stage("aci_call"):
+                result = client.functions.execute(
+                    "GOOGLE_CALENDAR__EVENTS_LIST",
+                    {"path": {"calendarId": calendar_id}, "query": query},
+                    linked_account_owner_id=linked_account_owner_id
+                )
+            if not result.success:
+                raise RuntimeError(result.error)
+            data = result.data or {}
+            events.extend(event for event in data.get("items", []) if event.get("status") != "cancelled")
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                return events
+
+    return fetch_events
@@ -0,0 +1,200 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", 20))
+TOOL_CALL_WORKERS = int(os.getenv("TOOL_CALL_WORKERS", 16))
+
+
+class RegisteredTool(NamedTuple):
+    handler: Callable[[Dict[str, Any]], Any]
+    timeout: Optional[float]
+    # Whether the call changes something outside the process (e.g. inserts a calendar event)
+    side_effects: bool = False
+    # Whether the handler also takes the key of the conversation the call was made in
+    takes_conversation: bool = False
+
+
+class ToolRegistry:
+    """
+    Maps tool (function) names to the handlers that execute them.
+
+    A handler takes the parsed arguments of a call and returns its output,
+    either a string or a JSON-serializable value.
+    """
+
+    def __init__(self):
+        self._tools: Dict[str, RegisteredTool] = {}
+
+    def register(self, name: str, handler: Callable[..., Any], timeout: Optional[float] = None,
+                 side_effects: bool = False, takes_conversation: bool = False):
+        """
+        Register (or replace) the handler of a tool.
+
+        Args:
+            name: The function name the assistant calls.
+            handler: Executes the call.
+            timeout: Seconds the call may take. Defaults to the dispatcher's timeout.
+            side_effects: Whether the call changes external state. A timed-out call keeps
+                running, so such calls report an unknown outcome instead of a retryable error.
+            takes_conversation: Call the handler with `(arguments, conversation)`, where
+                conversation is the key passed to `dispatch` (None if there was none).
+        """
+        self._tools[name] = RegisteredTool(handler, timeout, side_effects, takes_conversation)
+
+    def get(self, name: str) -> Optional[RegisteredTool]:
+        return self._tools.get(name)
+
+    def names(self) -> List[str]:
+        return sorted(self._tools)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+
+class ToolDispatcher:
+    """
+    Executes all tool calls of a `requires_action` step concurrently.
+
+    Every call gets an output, even if its tool is unknown, its arguments are
+    invalid, it raises or it times out, so a run never stalls waiting for a
+    missing output. A timed-out call is not cancelled, so a side-effecting one
+    (e.g. a calendar insert) may still succeed; its output says the outcome is
+    unknown and that it must not be retried, rather than that it failed.
+    Latency, errors and timeouts are recorded per tool.
+    """
+
+    def __init__(self, registry: ToolRegistry, timeout: float = TOOL_CALL_TIMEOUT,
+                 max_workers: int = TOOL_CALL_WORKERS, executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            registry: The tools that can be called.
+            timeout: Default seconds a call may take.
+            max_workers: Maximum number of calls running at once across all runs.
+            executor: Executor to share with other dispatchers instead of creating one.
+        """
+        self.registry = registry
+        self.timeout = timeout
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    def _record(self, name: str, latency: float, error: Optional[str], timed_out: bool = False):
+        with self._lock:
+            metrics = self._metrics.setdefault(name, {
+                "calls": 0, "errors": 0, "timeouts": 0, "latencies": deque(maxlen=256), "last_error": None,
+            })
+            metrics["calls"] += 1
+            metrics["latencies"].append(latency)
+            if error is not None:
+                metrics["errors"] += 1
+                metrics["last_error"] = error
+            if timed_out:
+                metrics["timeouts"] += 1
+
+    def _execute(self, tool: RegisteredTool, arguments: Dict[str, Any], conversation: Optional[str]) -> Tuple[str, float]:
+        started = time.monotonic()
+        output = tool.handler(arguments, conversation) if tool.takes_conversation else tool.handler(arguments)
+        return output if isinstance(output, str) else json.dumps(output), time.monotonic() - started
+
+    def for_conversation(self, conversation: str) -> "ConversationDispatcher":
+        """
+        Bind the dispatcher to a conversation, for a run's `tool_handler`.
+        """
+        return ConversationDispatcher(self, conversation)
+
+    def dispatch(self, tool_calls: List[Any], conversation: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Run tool calls concurrently and collect their outputs.
+
+        Args:
+            tool_calls: The `tool_calls` of a run's `submit_tool_outputs` action.
+            conversation: Key of the conversation the calls were made in, for tools that take it.
+
+        Returns:
+            list: One `{"tool_call_id", "output"}` dict per call, in call order.
+        """
+        started = time.monotonic()
+        pending = []
+        outputs: Dict[str, str] = {}
+        for call in tool_calls:
+            name = call.function.name
+            tool = self.registry.get(name)
+            if tool is None:
+                outputs[call.id] = json.dumps({"error": f"Unknown tool {name}"})
+                self._record(name, 0.0, "unknown tool")
+                continue
+            try:
+                arguments = json.loads(call.function.arguments or "{}")
+            except ValueError as e:
+                outputs[call.id] = json.dumps({"error": f"Invalid arguments: {e}"})
+                self._record(name, 0.0, "invalid arguments")
+                continue
+            # Run in a copy of the caller's context so the call is traced with its event
+            context = contextvars.copy_context()
+            pending.append((call, tool, self._executor.submit(context.run, self._execute, tool, arguments, conversation)))
+
+        for call, tool, future in pending:
+            name = call.function.name
+            timeout = tool.timeout if tool.timeout is not None else self.timeout
+            # Calls run in parallel, so each one's deadline counts from the dispatch start
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                outputs[call.id], latency = future.result(timeout=remaining)
+                self._record(name, latency, None)
+            except FutureTimeoutError:
+                if tool.side_effects:
+                    outputs[call.id] = json.dumps({
+                        "outcome": "unknown",
+                        "error": f"{name} did not finish within {timeout:.0f}s and may still succeed. "
+                                 "Do not retry it; tell the customer it is still being confirmed.",
+                    })
+                else:
+                    outputs[call.id] = json.dumps({"error": f"{name} timed out after {timeout:.0f}s"})
+                self._record(name, time.monotonic() - started, "timeout", timed_out=True)
+                logger.warning(f"Tool call {name} timed out after {timeout:.0f}s")
+            except Exception as e:
+                outputs[call.id] = json.dumps({"error": str(e)})
+                self._record(name, time.monotonic() - started, str(e))
+                logger.warning(f"Tool call {name} failed: {e}")
+
+        return [{"tool_call_id": call.id, "output": outputs[call.id]} for call in tool_calls]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-tool call counts, errors, timeouts and latencies.
+        """
+        with self._lock:
+            result = {}
+            for name, metrics in self._metrics.items():
+                latencies = sorted(metrics["latencies"])
+                result[name] = {
+                    "calls": metrics["calls"],
+                    "errors": metrics["errors"],
+                    "timeouts": metrics["timeouts"],
+                    "last_error": metrics["last_error"],
+                    "latency_ms_avg": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                    "latency_ms_p95": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+                }
+            return {"registered": self.registry.names(), "tools": result}
+
+
+class ConversationDispatcher(NamedTuple):
+    """
+    A ToolDispatcher bound to the conversation its tool calls are made in.
+    """
+    dispatcher: ToolDispatcher
+    conversation: str
+
+    def dispatch(self, tool_calls: List[Any]) -> List[Dict[str, str]]:
+        return self.dispatcher.dispatch(tool_calls, conversation=self.conversation)
@@ -1,24 +1,45 @@
 from aipolabs import ACI
 from aipolabs.types.functions import FunctionExecutionResult, FunctionDefinitionFormat
+from concurrent.futures import ThreadPoolExecutor
 import os
 
-def get_calendar_functions():
+from startup import startup_cache
+
+CALENDAR_FUNCTIONS = {
+    "update_event": "GOOGLE_CALENDAR__EVENTS_UPDATE",
+    "reserve_event": "GOOGLE_CALENDAR__EVENTS_INSERT",
+    "delete_event": "GOOGLE_CALENDAR__EVENTS_DELETE",
+}
+CALENDAR_FUNCTIONS_CACHE_KEY = "aci_calendar_functions"
+
+def get_calendar_functions(use_cache=True):
     """
     Retrieves Google Calendar function definitions from AipoLabs API.
+
+    Definitions are fetched concurrently and persisted in the startup cache, so
+    warm starts make no ACI calls until the cache entry expires.
     
+    Args:
+        use_cache (bool): Whether to read and write the startup cache.
+
     Returns:
         dict: Dictionary containing calendar function definitions for update, reserve, and delete operations.
     """
+    if use_cache:
+        cached = startup_cache.get(CALENDAR_FUNCTIONS_CACHE_KEY)
+        if cached is not None:
+            return cached
+
     ACI_CLIENT = ACI(api_key=os.getenv("AIPOLABS_ACI_API_KEY"))
     
-    UPDATE = ACI_CLIENT.functions.get_definition("GOOGLE_CALENDAR__EVENTS_UPDATE")
-    RESERVE = ACI_CLIENT.functions.get_definition("GOOGLE_CALENDAR__EVENTS_INSERT")
-    DELETE = ACI_CLIENT.functions.get_definition("GOOGLE_CALENDAR__EVENTS_DELETE")
-    
-    # Return a dictionary of the calendar function definitions
-    return {
-        "update_event": UPDATE,
-        "reserve_event": RESERVE,
-        "delete_event": DELETE
-    }
+    with ThreadPoolExecutor(max_workers=len(CALENDAR_FUNCTIONS)) as executor:
+        futures = {
+            key: executor.submit(ACI_CLIENT.functions.get_definition, function_name)
+            for key, function_name in CALENDAR_FUNCTIONS.items()
+        }
+        # Return a dictionary of the calendar function definitions
+        definitions = {key: future.result() for key, future in futures.items()}
 
+    if use_cache:
+        startup_cache.set(CALENDAR_FUNCTIONS_CACHE_KEY, definitions)
+    return definitions
@@ -1 +1,6 @@
-from .rag import RAGSystem
+from .rag import RAGSystem, SyncReport, FetchReport
+from .vector_stores import VectorStoreResolver, vector_store_resolver
+from .content_cache import ContentCache
+from .local_index import LocalIndex, Chunk, SearchResult, chunk_text, directory_fingerprint, KNOWLEDGE_DIR
+from .embeddings import HashingEmbedder, OpenAIEmbedder, tokenize, content_tokens
+from .knowledge_tables import KnowledgeTables, MenuItem, Price, OpeningHours, parse_menu, parse_operations
@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FILE_CACHE_DIR = os.getenv("VECTOR_FILE_CACHE_DIR", "vector_file_cache")
+VECTOR_FILE_CACHE_MAX_BYTES = int(os.getenv("VECTOR_FILE_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+
+class ContentCache:
+    """
+    A size-capped disk cache of vector store file contents, keyed by file id.
+
+    File ids never change content, so entries don't expire; the least recently
+    used are evicted once the total size passes `max_bytes`. Recency is kept in
+    the files' modification times, so the LRU order survives restarts. Entries
+    are written to a temporary file and renamed into place, so readers never see
+    a partial download.
+    """
+
+    def __init__(self, directory: str = VECTOR_FILE_CACHE_DIR, max_bytes: int = VECTOR_FILE_CACHE_MAX_BYTES):
+        """
+        Initialize the cache, indexing the files already in `directory`.
+
+        Args:
+            directory: Directory the contents are stored in.
+            max_bytes: Total size above which the least recently used files are evicted.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                # Left behind by an interrupted download
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, file_id, size in sorted(entries):
+            self._sizes[file_id] = size
+            self.total_bytes += size
+
+    def path(self, file_id: str) -> str:
+        return os.path.join(self.directory, file_id)
+
+    def temp_path(self, file_id: str) -> str:
+        """
+        A path to download a file's content to before `commit` moves it into the cache.
+        """
+        return os.path.join(self.directory, f"{file_id}.{threading.get_ident()}.tmp")
+
+    def get(self, file_id: str) -> Optional[str]:
+        """
+        Get the path of a cached file's content and mark it as recently used.
+
+        Returns:
+            str: The path, or None if the file isn't cached.
+        """
+        with self._lock:
+            if file_id not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(file_id)
+            self.hits += 1
+        path = self.path(file_id)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Removed behind our back
+            with self._lock:
+                self.total_bytes -= self._sizes.pop(file_id, 0)
+            return None
+        return path
+
+    def commit(self, file_id: str, temp_path: str) -> str:
+        """
+        Move a finished download into the cache, evicting old entries to stay under the size cap.
+
+        Returns:
+            str: The cached path.
+        """
+        size = os.path.getsize(temp_path)
+        path = self.path(file_id)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.total_bytes += size - self._sizes.pop(file_id, 0)
+            self._sizes[file_id] = size
+            # Never evict the entry just added, even if it alone passes the cap
+            while self.total_bytes > self.max_bytes and len(self._sizes) > 1:
+                old_id, old_size = self._sizes.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self.path(old_id))
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def read_text(self, file_id: str) -> Optional[str]:
+        """
+        Get a cached file's content as text, or None if it isn't cached.
+        """
+        path = self.get(file_id)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache's size and hit counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "files": len(self._sizes),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,98 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9£]+(?:[.:'][a-z0-9]+)*")
+
+STOP_WORDS = frozenset("""
+a an and are as at be by can could do does for from have how i if in is it me my
+of on or our please so that the their there this to was we what when where which
+who will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase a text and split it into word tokens. Prices ("£15.0") and
+    times ("12:00") are kept as single tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def content_tokens(text: str) -> List[str]:
+    """
+    Tokenize a text and drop common stop words that carry no retrieval signal.
+    """
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """
+    A local, dependency-free embedder: unigrams and bigrams are hashed into a
+    fixed number of signed buckets and L2-normalised. No network calls and no
+    model files, at the cost of purely lexical similarity.
+    """
+
+    def __init__(self, dim: int = 1024):
+        """
+        Args:
+            dim: Number of hash buckets (embedding dimensions).
+        """
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), dim) with unit-length rows.
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = content_tokens(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 1 else -1.0
+                matrix[row, (digest >> 1) % self.dim] += sign
+        # Sublinear term frequency, so repeated words don't dominate
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return _normalize_rows(matrix)
+
+
+class OpenAIEmbedder:
+    """
+    Embeds texts with the OpenAI embeddings API for semantic (not just lexical) similarity.
+    """
+
+    def __init__(self, client, model: str = "text-embedding-3-small", batch_size: int = 256):
+        """
+        Args:
+            client: The OpenAI client.
+            model: Embedding model name.
+            batch_size: Maximum number of texts sent per API call.
+        """
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Returns:
+            np.ndarray: float32 matrix with unit-length rows.
+        """
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in response.data)
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
@@ -0,0 +1,221 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .embeddings import content_tokens
+from .local_index import KNOWLEDGE_DIR
+
+MENU_FILE = "flat_iron_menu.txt"
+OPERATIONS_FILE = "flat_iron_operations.txt"
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+PRICE_PATTERN = re.compile(r"£(\d+(?:\.\d+)?)(?:\s*\(([^()]*)\))?")
+PRICED_NOTE_PATTERN = re.compile(r"\(([^()]*£[^()]*)\)")
+SECTION_PRICE_PATTERN = re.compile(r"\(£(\d+(?:\.\d+)?) each[^)]*\)")
+SIZE_LABEL_PATTERN = re.compile(r"\d+\s*ml|bottle|glass|magnum", re.IGNORECASE)
+LABEL_NOISE_PATTERN = re.compile(r"[^A-Za-z ]|\b(also|available|as|a|for)\b", re.IGNORECASE)
+HOURS_PATTERN = re.compile(
+    r"^-\s*(\w+)(?:\s*[–-]\s*(\w+))?:\s*(.+?)\s*\((\d{1,2}:\d{2})\s*[–-]\s*(\d{1,2}:\d{2})\)"
+)
+
+
+class Price(NamedTuple):
+    amount: float
+    label: Optional[str] = None
+
+    def format(self) -> str:
+        text = "free" if self.amount == 0 else f"£{self.amount:.2f}"
+        return f"{text} ({self.label})" if self.label else text
+
+
+class MenuItem(NamedTuple):
+    name: str
+    section: str
+    prices: List[Price]
+    description: Optional[str] = None
+
+    @property
+    def match_name(self) -> str:
+        # "Freedom Four Lager (4.0%)" is asked about as "Freedom Four Lager"
+        return re.sub(r"\([^)]*\)", "", self.name).strip()
+
+
+class OpeningHours(NamedTuple):
+    day: str
+    opens: str
+    closes: str
+    display: str
+
+
+def _parse_price_note(line: str) -> List[str]:
+    """
+    Read size labels from a note like "(Prices shown for 175ml / 375ml / 750ml bottle unless stated otherwise)".
+    """
+    match = re.search(r"prices shown for (.+?)(?: unless|\))", line, re.IGNORECASE)
+    if not match:
+        return []
+    return [label.strip() for label in match.group(1).split("/")]
+
+
+def _parse_item(line: str, section: str, section_price: Optional[float], size_labels: List[str]) -> MenuItem:
+    name, _, rest = line.lstrip("- ").partition(":")
+    rest = rest.strip()
+    prices = []
+
+    # Extra prices in parentheses, e.g. "(Magnum available: £55.0)"
+    for note in PRICED_NOTE_PATTERN.findall(rest):
+        amount = float(PRICE_PATTERN.search(note).group(1))
+        label = " ".join(LABEL_NOISE_PATTERN.sub(" ", note.split("£")[0]).split())
+        prices.append(Price(amount, label or None))
+    rest = PRICED_NOTE_PATTERN.sub("", rest)
+
+    main_prices, notes = [], []
+    for match in PRICE_PATTERN.finditer(rest):
+        note = match.group(2)
+        if note and SIZE_LABEL_PATTERN.search(note):
+            main_prices.append(Price(float(match.group(1)), note.strip()))
+        else:
+            main_prices.append(Price(float(match.group(1))))
+            if note:
+                notes.append(note.strip())
+    if size_labels and len(main_prices) == len(size_labels) and not any(p.label for p in main_prices):
+        main_prices = [Price(p.amount, label) for p, label in zip(main_prices, size_labels)]
+
+    description = PRICE_PATTERN.sub("", rest).strip(" /")
+    if not main_prices:
+        lowered = rest.lower()
+        if "free" in lowered or "on us" in lowered:
+            main_prices = [Price(0.0)]
+            description = re.sub(r"on us|\(free\)", "", description, flags=re.IGNORECASE).strip()
+        elif section_price is not None:
+            main_prices = [Price(section_price)]
+    description = "; ".join(part for part in [description] + notes if part) or None
+    return MenuItem(name.strip(), section, main_prices + prices, description)
+
+
+def parse_menu(text: str) -> List[MenuItem]:
+    """
+    Parse the menu file into items with typed prices.
+
+    Sections are lines ending with ":"; an uppercase section (e.g. "RED WINES:")
+    is a sub-section and keeps the size labels of its parent. Items are "- " lines.
+    """
+    items = []
+    section, section_price, size_labels = "", None, []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("- "):
+            items.append(_parse_item(line, section, section_price, size_labels))
+        elif line.endswith(":"):
+            title = line[:-1]
+            if not title.isupper():
+                size_labels = []
+            match = SECTION_PRICE_PATTERN.search(title)
+            section_price = float(match.group(1)) if match else None
+            section = re.sub(r"\([^)]*\)", "", title).strip()
+        elif line.lower().startswith("(prices shown"):
+            size_labels = _parse_price_note(line)
+    return items
+
+
+def _day_range(first: str, last: Optional[str]) -> List[str]:
+    start = WEEKDAYS.index(first.lower())
+    end = WEEKDAYS.index((last or first).lower())
+    return [WEEKDAYS[(start + offset) % 7] for offset in range((end - start) % 7 + 1)]
+
+
+def parse_operations(text: str) -> Tuple[Dict[str, OpeningHours], List[str]]:
+    """
+    Parse opening hours and the address out of the operations file.
+
+    Returns:
+        tuple: Opening hours by lowercase weekday, and the address lines.
+    """
+    hours, address = {}, []
+    section = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            if section == "address" and address:
+                section = None
+            continue
+        if line.endswith(":") and not line.startswith("-"):
+            title = line[:-1].lower()
+            section = "hours" if "opening hours" in title else "address" if "address" in title else None
+            continue
+        if section == "hours":
+            match = HOURS_PATTERN.match(line)
+            if match and match.group(1).lower() in WEEKDAYS:
+                first, last, display, opens, closes = match.groups()
+                for day in _day_range(first, last):
+                    hours[day] = OpeningHours(day, opens, closes, display)
+        elif section == "address":
+            address.append(line)
+    return hours, address
+
+
+class KnowledgeTables:
+    """
+    Typed tables of the structured facts in the knowledge files: menu items
+    and prices, opening hours per weekday and the address. Menu items are
+    indexed by the content tokens of their names.
+    """
+
+    def __init__(self, menu: List[MenuItem], hours: Dict[str, OpeningHours], address: List[str]):
+        self.menu = menu
+        self.hours = hours
+        self.address = address
+        self.menu_index: Dict[str, List[int]] = defaultdict(list)
+        for position, item in enumerate(menu):
+            for token in set(content_tokens(item.match_name)):
+                self.menu_index[token].append(position)
+
+    @classmethod
+    def from_directory(cls, directory: str = KNOWLEDGE_DIR, menu_file: str = MENU_FILE,
+                       operations_file: str = OPERATIONS_FILE) -> "KnowledgeTables":
+        """
+        Load the tables from the menu and operations files. Missing files give empty tables.
+        """
+        def read(name):
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                return ""
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+
+        hours, address = parse_operations(read(operations_file))
+        return cls(parse_menu(read(menu_file)), hours, address)
+
+    def find_items(self, tokens: List[str]) -> List[MenuItem]:
+        """
+        Find the menu items whose names best match the given tokens.
+
+        An item matches only if every token is in its name or names one of its
+        sizes (e.g. "bottle"), and the tokens cover at least half of its name or
+        include one that appears in no other item name. A query with any token
+        left uncovered matches nothing. Only the best-scoring items are returned.
+        """
+        query = set(tokens)
+        overlap = defaultdict(set)
+        for token in query:
+            for position in self.menu_index.get(token, ()):
+                overlap[position].add(token)
+
+        scored = []
+        for position, matched in overlap.items():
+            item = self.menu[position]
+            name_tokens = set(content_tokens(item.match_name))
+            size_tokens = set(content_tokens(" ".join(price.label for price in item.prices if price.label)))
+            if query - name_tokens - size_tokens:
+                continue
+            distinctive = any(len(self.menu_index[token]) == 1 for token in matched)
+            if distinctive or len(matched) * 2 >= len(name_tokens):
+                scored.append((len(matched) / len(name_tokens), len(matched), position))
+        if not scored:
+            return []
+        best = max(scored)[:2]
+        return [self.menu[position] for *score, position in sorted(scored) if tuple(score) == best]
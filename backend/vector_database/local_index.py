@@ -0,0 +1,184 @@
+import glob
+import hashlib
+import os
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from .embeddings import HashingEmbedder, content_tokens
+
+KNOWLEDGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Chunk(NamedTuple):
+    text: str
+    source: str
+
+
+class SearchResult(NamedTuple):
+    text: str
+    source: str
+    score: float
+
+
+def chunk_text(text: str, source: str, max_chars: int = 800) -> List[Chunk]:
+    """
+    Split a document into chunks of whole paragraphs of at most `max_chars`.
+
+    Paragraphs are separated by blank lines. A short heading paragraph (e.g.
+    "Opening Hours:") is kept together with the paragraph that follows it.
+
+    Args:
+        text: The document text.
+        source: Name of the document, stored with every chunk.
+        max_chars: Soft limit on the chunk size.
+
+    Returns:
+        list: The document's chunks, in order.
+    """
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        is_heading = current.endswith(":") and "\n" not in current
+        if current and not is_heading and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(Chunk(current, source))
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(Chunk(current, source))
+    return chunks
+
+
+def directory_fingerprint(directory: str = KNOWLEDGE_DIR, pattern: str = "*.txt") -> str:
+    """
+    Get a cheap fingerprint of the knowledge files in a directory (names, sizes
+    and modification times), without reading their contents.
+
+    Returns:
+        str: SHA-256 hex digest that changes whenever a matching file changes.
+    """
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        stat = os.stat(path)
+        entries.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+class LocalIndex:
+    """
+    An in-process retrieval index over the restaurant knowledge files.
+
+    BM25 is stored as a term-major sparse matrix (CSR arrays) whose per-posting
+    weights are precomputed, so a query only sums a few slices. Vector scoring
+    uses a dense float32 matrix of unit-length chunk embeddings.
+    """
+
+    def __init__(self, chunks: List[Chunk], embedder=None, k1: float = 1.5, b: float = 0.75):
+        """
+        Build the index.
+
+        Args:
+            chunks: The chunks to index.
+            embedder: Object with an `embed(texts) -> np.ndarray` method. Defaults to HashingEmbedder.
+            k1: BM25 term frequency saturation.
+            b: BM25 length normalisation.
+        """
+        self.chunks = chunks
+        self.embedder = embedder or HashingEmbedder()
+        self._build_bm25(k1, b)
+        self.embeddings = self.embedder.embed([chunk.text for chunk in chunks]) if chunks else np.zeros((0, 0), np.float32)
+
+    @classmethod
+    def from_directory(cls, directory: str = KNOWLEDGE_DIR, pattern: str = "*.txt",
+                       max_chars: int = 800, embedder=None) -> "LocalIndex":
+        """
+        Build an index from every file matching `pattern` in `directory`.
+        """
+        chunks = []
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            with open(path, "r", encoding="utf-8") as f:
+                chunks.extend(chunk_text(f.read(), os.path.basename(path), max_chars))
+        return cls(chunks, embedder=embedder)
+
+    def _build_bm25(self, k1: float, b: float):
+        doc_terms = [Counter(content_tokens(chunk.text)) for chunk in self.chunks]
+        self.vocabulary = {}
+        postings = []
+        for doc_id, counts in enumerate(doc_terms):
+            for term, tf in counts.items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                postings.append((term_id, doc_id, tf))
+
+        n_docs = len(doc_terms)
+        doc_len = np.array([sum(counts.values()) for counts in doc_terms], dtype=np.float32)
+        avg_len = float(doc_len.mean()) if n_docs else 0.0
+
+        postings.sort()
+        term_ids = np.array([p[0] for p in postings], dtype=np.int32)
+        self.doc_ids = np.array([p[1] for p in postings], dtype=np.int32)
+        tf = np.array([p[2] for p in postings], dtype=np.float32)
+
+        doc_freq = np.bincount(term_ids, minlength=len(self.vocabulary)).astype(np.float32)
+        self.indptr = np.concatenate(([0], np.cumsum(doc_freq))).astype(np.int32)
+        idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        norm = k1 * (1.0 - b + b * doc_len[self.doc_ids] / avg_len) if n_docs else tf
+        self.weights = (idf[term_ids] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """
+        Score every chunk against the query with BM25.
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(content_tokens(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # Doc ids are unique within a term's postings, so fancy-index add is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def vector_scores(self, query: str) -> np.ndarray:
+        """
+        Score every chunk by cosine similarity to the query embedding.
+        """
+        return self.embeddings @ self.embedder.embed([query])[0]
+
+    def search(self, query: str, k: int = 3, mode: str = "hybrid", alpha: float = 0.5,
+               min_score: Optional[float] = None) -> List[SearchResult]:
+        """
+        Return the top-k chunks for a query.
+
+        Args:
+            query: The user question.
+            k: Number of results.
+            mode: "bm25", "vector" or "hybrid" (max-normalised BM25 blended with cosine).
+            alpha: Weight of BM25 in hybrid mode.
+            min_score: Drop results scoring below this value.
+
+        Returns:
+            list: Results ordered by descending score.
+        """
+        if not self.chunks:
+            return []
+        if mode == "bm25":
+            scores = self.bm25_scores(query)
+        elif mode == "vector":
+            scores = self.vector_scores(query)
+        elif mode == "hybrid":
+            bm25 = self.bm25_scores(query)
+            top = bm25.max()
+            scores = alpha * (bm25 / top if top > 0 else bm25) + (1.0 - alpha) * self.vector_scores(query)
+        else:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        k = min(k, len(scores))
+        top_ids = np.argpartition(-scores, k - 1)[:k]
+        top_ids = top_ids[np.argsort(-scores[top_ids])]
+        return [
+            SearchResult(self.chunks[i].text, self.chunks[i].source, float(scores[i]))
+            for i in top_ids
+            if min_score is None or scores[i] >= min_score
+        ]
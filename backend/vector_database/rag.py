@@ -1,35 +1,112 @@
+import glob
+import hashlib
+import logging
+import math
 import os
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import NotFoundError, OpenAI
+
+from helper import http_client
+from startup import DiskCache, Lazy
+from .content_cache import ContentCache
+from .local_index import KNOWLEDGE_DIR
+from .vector_stores import vector_store_resolver
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+RAG_MANIFEST_PATH = os.getenv("RAG_MANIFEST_PATH", "rag_manifest.json")
+RAG_UPLOAD_CONCURRENCY = int(os.getenv("RAG_UPLOAD_CONCURRENCY", 8))
+VECTOR_FILE_FETCH_CONCURRENCY = int(os.getenv("VECTOR_FILE_FETCH_CONCURRENCY", 8))
+
+# Content hashes of the files uploaded to each vector store; entries never expire
+sync_manifest = DiskCache(path=RAG_MANIFEST_PATH, ttl=10 * 365 * 24 * 3600)
+# Downloaded file contents, shared by every RAGSystem; the directory is created on first use
+content_cache = Lazy(ContentCache, "vector_file_cache")
+
+
+class SyncReport(NamedTuple):
+    uploaded: List[str]
+    unchanged: List[str]
+    deleted: List[str]
+    bytes_uploaded: int
+    bytes_skipped: int
+    seconds: float
+    # Estimated from the measured upload time per file; None before any upload was timed
+    seconds_saved: Optional[float]
+
+    def summary(self) -> str:
+        saved = f"~{self.seconds_saved:.1f}s" if self.seconds_saved is not None else "n/a"
+        return (
+            f"{len(self.uploaded)} uploaded ({self.bytes_uploaded} bytes), "
+            f"{len(self.unchanged)} unchanged ({self.bytes_skipped} bytes skipped, {saved} saved), "
+            f"{len(self.deleted)} deleted in {self.seconds:.2f}s"
+        )
+
+
+class FetchReport(NamedTuple):
+    paths: Dict[str, str]
+    errors: Dict[str, str]
+    cache_hits: int
+    bytes_downloaded: int
+    seconds: float
+
+
+def file_sha256(path: str) -> str:
+    """
+    Hash a file's contents in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 class RAGSystem:
-    def __init__(self, vector_store_name: str):
+    def __init__(self, vector_store_name: str, client: Optional[OpenAI] = None):
         """
         Initialize the RAGSystem with OpenAI client and vector store.
+
+        The vector store is resolved lazily on first use, so construction makes no API calls.
+
+        Args:
+            vector_store_name: Name of the vector store.
+            client: OpenAI client to share, e.g. between tenants. A new one is created if omitted.
         """
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=self.openai_api_key)
-        self.vector_store = self._initialize_vector_store(vector_store_name)
+        self.client = client or OpenAI(api_key=self.openai_api_key)
+        self.vector_store_name = vector_store_name
+        self._vector_store_id = None
 
-    def _initialize_vector_store(self, vector_store_name: str):
+    def get_vector_store_id(self) -> str:
         """
-        Create or retrieve an existing vector store.
+        Retrieve the Vector Store ID, resolving (or creating) it by name on first use.
         """
-        existing_stores = self.client.vector_stores.list()
-        for store in existing_stores.data:
-            if store.name == vector_store_name:
-                return store
-        return self.client.vector_stores.create(name=vector_store_name)
+        if self._vector_store_id is None:
+            self._vector_store_id = vector_store_resolver.resolve(self.client, self.vector_store_name)
+        return self._vector_store_id
 
-    def get_vector_store_id(self) -> str:
+    def _with_vector_store(self, func: Callable[[str], Any]) -> Any:
         """
-        Retrieve the Vector Store ID.
+        Call `func` with the vector store id. If it comes back NotFound because the
+        store was deleted remotely, the name is resolved again and `func` retried once.
         """
-        return self.vector_store.id
+        vector_store_id = self.get_vector_store_id()
+        try:
+            return func(vector_store_id)
+        except NotFoundError:
+            current_id = vector_store_resolver.revalidate(self.client, self.vector_store_name, vector_store_id)
+            if current_id == vector_store_id:
+                # The store exists; something else was not found
+                raise
+            self._vector_store_id = current_id
+            return func(current_id)
 
     def delete_vector_store_file(self, file_id: str):
         """
@@ -51,54 +128,285 @@ class RAGSystem:
         Returns:
             str: The ID of the inserted vector store file.
         """
-        file_response = self.client.files.create(
-            file=open(document_path, "rb"),
-            purpose="assistants"
-        )
-        file_id = file_response.id
+        file_id = self._upload_file(document_path)
 
-        vector_store_file = self.client.vector_stores.files.create(
-            vector_store_id=self.get_vector_store_id(),
-            file_id=file_id
+        vector_store_file = self._with_vector_store(
+            lambda vector_store_id: self.client.vector_stores.files.create(vector_store_id=vector_store_id, file_id=file_id)
         )
         return vector_store_file.id
 
+    def _upload_file(self, document_path: str) -> str:
+        with open(document_path, "rb") as f:
+            return self.client.files.create(file=f, purpose="assistants").id
+
+    def _timed_upload(self, document_path: str):
+        started = time.monotonic()
+        file_id = self._upload_file(document_path)
+        return file_id, time.monotonic() - started
+
+    def _delete_file(self, file_id: str, vector_store_id: str):
+        # Detach from the store and delete the upload itself, so replaced versions don't accumulate
+        try:
+            self.client.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
+        except Exception as e:
+            logger.warning(f"Could not remove file {file_id} from vector store {vector_store_id}: {e}")
+        try:
+            self.client.files.delete(file_id)
+        except Exception as e:
+            logger.warning(f"Could not delete file {file_id}: {e}")
+
+    def sync_directory(self, directory: str = KNOWLEDGE_DIR, pattern: str = "*.txt", delete_missing: bool = True,
+                       prune_untracked: bool = False, max_concurrency: int = RAG_UPLOAD_CONCURRENCY) -> SyncReport:
+        """
+        Bring the vector store in line with the files in a directory, uploading only
+        what changed since the last sync.
+
+        A manifest of content hashes per vector store records which upload holds
+        which version of each file. New and changed files are uploaded concurrently
+        and attached in one file batch; the versions they replace are deleted once
+        the batch is indexed.
+
+        Args:
+            directory: Directory holding the knowledge files.
+            pattern: Glob of the files to sync.
+            delete_missing: Delete vector store files whose source file was removed.
+            prune_untracked: Also delete vector store files the manifest doesn't know,
+                e.g. duplicates uploaded before syncing was used.
+            max_concurrency: Maximum number of uploads running at once.
+
+        Returns:
+            SyncReport: What was uploaded, skipped and deleted, and the bytes and time saved.
+        """
+        return self._with_vector_store(
+            lambda vector_store_id: self._sync_directory(
+                vector_store_id, directory, pattern, delete_missing, prune_untracked, max_concurrency
+            )
+        )
+
+    def _sync_directory(self, vector_store_id: str, directory: str, pattern: str, delete_missing: bool,
+                        prune_untracked: bool, max_concurrency: int) -> SyncReport:
+        started = time.monotonic()
+        manifest_key = f"manifest:{self.vector_store_name}"
+        manifest = sync_manifest.get(manifest_key) or {}
+        if manifest.get("vector_store_id") != vector_store_id:
+            # The store was recreated; nothing recorded for the old one is in it
+            manifest = {"vector_store_id": vector_store_id, "files": {}}
+        tracked: Dict[str, Dict] = manifest["files"]
+
+        changed, unchanged = [], []
+        bytes_skipped = 0
+        current = {}
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            name = os.path.basename(path)
+            entry = {"sha256": file_sha256(path), "size": os.path.getsize(path)}
+            current[name] = entry
+            previous = tracked.get(name)
+            if previous and previous["sha256"] == entry["sha256"]:
+                unchanged.append(name)
+                bytes_skipped += entry["size"]
+            else:
+                changed.append((name, path))
+
+        uploaded_ids: Dict[str, str] = {}
+        if changed:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(changed)))) as executor:
+                uploads = list(executor.map(lambda item: self._timed_upload(item[1]), changed))
+            file_ids = [file_id for file_id, _ in uploads]
+            manifest["upload_seconds"] = sum(seconds for _, seconds in uploads) / len(uploads)
+            uploaded_ids = {name: file_id for (name, _), file_id in zip(changed, file_ids)}
+            try:
+                batch = self.client.vector_stores.file_batches.create_and_poll(
+                    vector_store_id=vector_store_id, file_ids=file_ids
+                )
+            except Exception:
+                for file_id in file_ids:
+                    self._delete_file(file_id, vector_store_id)
+                raise
+            if batch.status != "completed":
+                # Keep the old versions and leave the manifest untouched so the next sync retries
+                logger.warning(f"File batch {batch.id} ended {batch.status}: {batch.file_counts}")
+                for file_id in file_ids:
+                    self._delete_file(file_id, vector_store_id)
+                raise RuntimeError(f"Vector store file batch {batch.id} {batch.status}")
+        bytes_uploaded = sum(current[name]["size"] for name in uploaded_ids)
+
+        superseded = [tracked[name]["file_id"] for name in uploaded_ids if name in tracked]
+        removed = [name for name in tracked if name not in current] if delete_missing else []
+        superseded += [tracked[name]["file_id"] for name in removed]
+        if prune_untracked:
+            known = {entry["file_id"] for entry in tracked.values()} | set(uploaded_ids.values())
+            superseded += [
+                file.id for file in self.client.vector_stores.files.list(vector_store_id=vector_store_id)
+                if file.id not in known
+            ]
+        for file_id in superseded:
+            self._delete_file(file_id, vector_store_id)
+
+        for name, file_id in uploaded_ids.items():
+            tracked[name] = {**current[name], "file_id": file_id}
+        for name in removed:
+            tracked.pop(name, None)
+        sync_manifest.set(manifest_key, manifest)
+
+        # Skipped files would have been uploaded `max_concurrency` at a time
+        upload_seconds = manifest.get("upload_seconds")
+        report = SyncReport(
+            uploaded=sorted(uploaded_ids),
+            unchanged=unchanged,
+            deleted=superseded,
+            bytes_uploaded=bytes_uploaded,
+            bytes_skipped=bytes_skipped,
+            seconds=time.monotonic() - started,
+            seconds_saved=(
+                upload_seconds * math.ceil(len(unchanged) / max(1, max_concurrency))
+                if upload_seconds is not None else None
+            ),
+        )
+        logger.info(f"Synced {directory} to vector store {vector_store_id}: {report.summary()}")
+        return report
+
+    def files_fingerprint(self) -> str:
+        """
+        Get a fingerprint of the files currently in the vector store. It changes
+        whenever a file is added, replaced or removed.
+
+        Returns:
+            str: SHA-256 hex digest of the file ids and creation times.
+        """
+        files = self._with_vector_store(
+            lambda vector_store_id: list(self.client.vector_stores.files.list(vector_store_id=vector_store_id, limit=100))
+        )
+        entries = sorted(f"{file.id}:{file.created_at}" for file in files)
+        return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
     def list_vector_store_files(self):
         """
         List all files in the vector store and print their metadata.
         """
-        vector_store_files = self.client.vector_stores.files.list(
-            vector_store_id=self.get_vector_store_id()
+        vector_store_files = self._with_vector_store(
+            lambda vector_store_id: self.client.vector_stores.files.list(vector_store_id=vector_store_id)
         )
-        
+
         return (vector_store_files)
 
-    def retrieve_vector_store_file_content(self, vector_store_id: str, file_id: str):
+    def _content_url(self, vector_store_id: str, file_id: str) -> str:
+        return f"{str(self.client.base_url).rstrip('/')}/vector_stores/{vector_store_id}/files/{file_id}/content"
+
+    def download_vector_store_file(self, file_id: str, vector_store_id: Optional[str] = None) -> str:
         """
-        retrieve the content of a file stored in a vector store using OpenAI's API.
+        Get a local copy of a vector store file's content, downloading it into the
+        content cache if it isn't there. The body is streamed to disk, so large
+        files are never held in memory.
+
+        Args:
+            file_id (str): The ID of the file inside the vector store.
+            vector_store_id (str, optional): The ID of the vector store. Defaults to this system's store.
+
+        Returns:
+            str: Path of the cached content.
+
+        Raises:
+            httpx.HTTPStatusError: If the API doesn't return the content.
+        """
+        path = content_cache.get().get(file_id)
+        if path is not None:
+            return path
+        return self._download_to_cache(file_id, vector_store_id)[0]
+
+    def _download_to_cache(self, file_id: str, vector_store_id: Optional[str] = None) -> Tuple[str, int]:
+        cache = content_cache.get()
+        temp_path = cache.temp_path(file_id)
+        try:
+            size = http_client.download(
+                self._content_url(vector_store_id or self.get_vector_store_id(), file_id), temp_path,
+                headers={"Authorization": f"Bearer {self.client.api_key}"},
+            )
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return cache.commit(file_id, temp_path), size
+
+    def retrieve_vector_store_file_content(self, vector_store_id: str, file_id: str) -> str:
+        """
+        Retrieve the content of a file stored in a vector store, from the local
+        content cache when it was fetched before.
 
         Args:
             vector_store_id (str): The ID of the vector store.
             file_id (str): The ID of the file inside the vector store.
-            save_path (str, optional): If provided, saves the file content to this path.
 
         Returns:
-            str: The file content as a string (unless saved to disk).
+            str: The file content as a string.
+
+        Raises:
+            httpx.HTTPStatusError: If the API doesn't return the content.
+        """
+        path = self.download_vector_store_file(file_id, vector_store_id)
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def fetch_vector_store_files(self, file_ids: Optional[List[str]] = None, vector_store_id: Optional[str] = None,
+                                 max_concurrency: int = VECTOR_FILE_FETCH_CONCURRENCY) -> FetchReport:
         """
-    
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}"
-        }
+        Download many vector store files into the content cache concurrently, over
+        the shared connection pool. Cached files are not downloaded again. Fetching
+        more than the cache holds evicts the earliest fetched files again.
 
-        url = f"https://api.openai.com/v1/vector_stores/{vector_store_id}/files/{file_id}/content"
+        Args:
+            file_ids (list, optional): The files to fetch. Defaults to every file in the store.
+            vector_store_id (str, optional): The ID of the vector store. Defaults to this system's store.
+            max_concurrency (int): Maximum number of downloads running at once.
+
+        Returns:
+            FetchReport: The cached path of each fetched file and the error of each failed one.
+        """
+        started = time.monotonic()
+        vector_store_id = vector_store_id or self.get_vector_store_id()
+        if file_ids is None:
+            file_ids = [file.id for file in self.client.vector_stores.files.list(vector_store_id=vector_store_id)]
+
+        cache = content_cache.get()
+        paths: Dict[str, str] = {}
+        missing = []
+        for file_id in file_ids:
+            path = cache.get(file_id)
+            if path is not None:
+                paths[file_id] = path
+            else:
+                missing.append(file_id)
+        cache_hits = len(paths)
+
+        errors: Dict[str, str] = {}
+        bytes_downloaded = 0
+        if missing:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(missing)))) as executor:
+                futures = {
+                    file_id: executor.submit(self._download_to_cache, file_id, vector_store_id)
+                    for file_id in missing
+                }
+                for file_id, future in futures.items():
+                    try:
+                        paths[file_id], size = future.result()
+                        bytes_downloaded += size
+                    except Exception as e:
+                        errors[file_id] = str(e)
+                        logger.warning(f"Could not fetch vector store file {file_id}: {e}")
+
+        report = FetchReport(
+            paths=paths,
+            errors=errors,
+            cache_hits=cache_hits,
+            bytes_downloaded=bytes_downloaded,
+            seconds=time.monotonic() - started,
+        )
+        logger.info(
+            f"Fetched {len(file_ids)} vector store files: {cache_hits} cached, "
+            f"{len(missing) - len(errors)} downloaded ({report.bytes_downloaded} bytes), "
+            f"{len(errors)} failed in {report.seconds:.2f}s"
+        )
+        return report
 
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            return response.text
-        else:
-            return(response.status_code)
-    
 
 def main():
     rag = RAGSystem(vector_store_name="flatiron_restaurant")
@@ -106,13 +414,9 @@ def main():
     vector_store_id = rag.get_vector_store_id()
     print("VECTOR_STORE_ID:", vector_store_id)
 
-    # Upload and insert the file into the vector store
-    document_path = "flatiron_restaurant.txt"  # Make sure this file exists in the same directory
-    try:
-        file_id = rag.create_vector_store_file(document_path)
-        print("FILE_ID:", file_id)
-    except FileNotFoundError:
-        print(f"❌ File '{document_path}' not found. Please check the path.")
+    # Upload new and changed knowledge files only; unchanged ones are skipped
+    report = rag.sync_directory(KNOWLEDGE_DIR)
+    print("SYNC:", report.summary())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from openai import NotFoundError
+
+from helper import LRUCache
+from startup import DiskCache, startup_cache
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE_CACHE_TTL = float(os.getenv("VECTOR_STORE_CACHE_TTL", 24 * 3600))
+
+
+class VectorStoreResolver:
+    """
+    Resolves vector store names to ids for every `RAGSystem` in the process.
+
+    Ids are cached in memory and in the startup cache file. On a miss the store
+    list is paged through lazily, newest first, and stops at the first store
+    with the name; every name seen on the way is cached too, so resolving the
+    stores of several tenants costs at most one pass over the list. A name that
+    isn't found on any page gets a new store. Cached ids aren't checked on every
+    use; a caller whose request with an id comes back NotFound calls `revalidate`.
+    """
+
+    def __init__(self, disk_cache: DiskCache = startup_cache, ttl: float = VECTOR_STORE_CACHE_TTL,
+                 max_size: int = 10000):
+        """
+        Initialize the resolver.
+
+        Args:
+            disk_cache: Persists resolved ids across restarts.
+            ttl: Seconds a resolved id is trusted before it is looked up again.
+            max_size: Maximum number of names kept in memory.
+        """
+        self.disk_cache = disk_cache
+        self.ttl = ttl
+        self._ids = LRUCache(max_size=max_size, ttl=ttl)
+        # One lookup at a time, so concurrent first uses of a name can't create two stores
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.scans = 0
+        self.stores_scanned = 0
+        self.created = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def _cache_key(name: str) -> str:
+        return f"vector_store:{name}"
+
+    def resolve(self, client, name: str, create: bool = True) -> Optional[str]:
+        """
+        Get the id of the vector store with the given name.
+
+        Args:
+            client: The OpenAI client.
+            name: Name of the vector store.
+            create: Create the store if no store has this name.
+
+        Returns:
+            str: The store id, or None if it doesn't exist and `create` is False.
+        """
+        store_id = self._ids.get(name)
+        if store_id is not None:
+            return store_id
+
+        with self._lock:
+            store_id = self._ids.get(name)
+            if store_id is not None:
+                return store_id
+
+            store_id = self.disk_cache.get(self._cache_key(name))
+            if store_id is not None:
+                self.disk_hits += 1
+            else:
+                store_id = self._scan(client, name)
+                if store_id is None:
+                    if not create:
+                        return None
+                    store_id = client.vector_stores.create(name=name).id
+                    self.created += 1
+                    logger.info(f"Created vector store {name} ({store_id})")
+                self.disk_cache.set(self._cache_key(name), store_id, ttl=self.ttl)
+            self._ids.set(name, store_id)
+            return store_id
+
+    def _scan(self, client, name: str) -> Optional[str]:
+        # The SDK fetches the next page only when iteration reaches it
+        self.scans += 1
+        seen = set()
+        for store in client.vector_stores.list(limit=100, order="desc"):
+            self.stores_scanned += 1
+            if store.name in seen:
+                # Older duplicate; the newest store with a name wins
+                continue
+            seen.add(store.name)
+            self._ids.set(store.name, store.id)
+            if store.name == name:
+                return store.id
+        return None
+
+    def invalidate(self, name: str):
+        """
+        Forget a name's id, e.g. after its store was deleted.
+        """
+        self._ids.pop(name)
+        self.disk_cache.delete(self._cache_key(name))
+
+    def revalidate(self, client, name: str, store_id: str) -> str:
+        """
+        Check that a resolved store still exists, e.g. after a request with its id
+        came back NotFound. A deleted store's id is forgotten and the name is
+        resolved again, rescanning the list and creating a new store if none has it.
+
+        Args:
+            client: The OpenAI client.
+            name: Name of the vector store.
+            store_id: The id the failed request used.
+
+        Returns:
+            str: The store's current id, `store_id` itself if the store still exists.
+        """
+        try:
+            client.vector_stores.retrieve(store_id)
+            return store_id
+        except NotFoundError:
+            pass
+        with self._lock:
+            # Another caller may already have replaced the id
+            if self._ids.get(name) in (None, store_id):
+                logger.warning(f"Vector store {name} ({store_id}) no longer exists, resolving it again")
+                self.invalidate(name)
+                self.revalidations += 1
+        return self.resolve(client, name)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache hit counters and how many stores lookups had to scan.
+        """
+        return {
+            "memory": self._ids.stats(),
+            "disk_hits": self.disk_hits,
+            "scans": self.scans,
+            "stores_scanned": self.stores_scanned,
+            "created": self.created,
+            "revalidations": self.revalidations,
+        }
+
+
+vector_store_resolver = VectorStoreResolver()